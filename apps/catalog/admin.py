@@ -3,16 +3,37 @@ from django.utils.html import format_html
 from mptt.admin import MPTTModelAdmin
 from parler.admin import TranslatableAdmin
 
+from apps.core.admin import AutocompleteFilter, ScalableAdminMixin
+from apps.core.export import export_actions
+from .exports import ProductExport
 from .models import Category, Product, ProductImage
-from apps.warehouse.models import Stock
+from .search import search_product_ids
+from apps.warehouse.models import Stock, StockSummary
 
 class StockInline(admin.TabularInline):
     model = Stock
     extra = 0
     autocomplete_fields = ['warehouse']
-    readonly_fields = ['available_quantity']
+    # Количество и резерв меняются только движениями журнала
+    readonly_fields = ['quantity', 'reserved', 'available_quantity']
     can_delete = False
 
+class ProductIndexSearchMixin:
+    """
+    Admin search through the catalog search index (every language, exact
+    SKU) instead of icontains JOINs over translations. ``product_lookup`` is
+    the path from the listed model to the product.
+    """
+    product_lookup = 'pk'
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        ids = search_product_ids(search_term)
+        # Фильтр по id — без JOIN, поэтому без дублей строк и без distinct()
+        return queryset.filter(**{f'{self.product_lookup}__in': ids}), False
+
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
     extra = 1
@@ -40,10 +61,15 @@ class CategoryAdmin(TranslatableAdmin, MPTTModelAdmin):
         return "-"
 
 @admin.register(Product)
-class ProductAdmin(TranslatableAdmin):
+class ProductAdmin(ProductIndexSearchMixin, ScalableAdminMixin, TranslatableAdmin):
     list_display = ['sku', 'name', 'price', 'total_stock', 'is_active', 'image_preview']
-    list_filter = ['is_active', 'is_featured', 'category']
+    # Категорий сотни — выбираем поиском, а не списком
+    list_filter = ['is_active', 'is_featured', 'stock_summary__in_stock', ('category', AutocompleteFilter)]
+    list_select_related = ['stock_summary']
+    # Сам поиск идет по индексу (ProductIndexSearchMixin); список нужен для поля поиска и autocomplete
     search_fields = ['sku', 'translations__name']
+    translated_relations = ['']
+    actions = export_actions(ProductExport)
     
     fieldsets = (
         ('Basic Info', {'fields': ('sku', 'category', 'name', 'slug')}),
@@ -62,7 +88,12 @@ class ProductAdmin(TranslatableAdmin):
         return "-"
 
     def total_stock(self, obj):
-        return sum(stock.quantity for stock in obj.stocks.all())
+        # Итоги денормализованы в StockSummary, отдельный запрос на строку не нужен
+        try:
+            return obj.stock_summary.quantity
+        except StockSummary.DoesNotExist:
+            return 0
     total_stock.short_description = 'Total Stock'
+    total_stock.admin_order_field = 'stock_summary__quantity'
 
 admin.site.register(Category, CategoryAdmin)
\ No newline at end of file
@@ -0,0 +1,17 @@
+from apps.core.export import Export
+from .models import Product
+
+
+class ProductExport(Export):
+    model = Product
+    name = 'products'
+    fields = [
+        'id', 'sku', 'category_id', 'price', 'compare_price', 'is_active', 'is_featured',
+        'stock_summary__quantity', 'stock_summary__available', 'created_at', 'updated_at',
+    ]
+    translated_fields = {
+        'name': ('translations', 'name'),
+        'slug': ('translations', 'slug'),
+        'short_description': ('translations', 'short_description'),
+        'description': ('translations', 'description'),
+    }
@@ -0,0 +1,288 @@
+"""
+Bulk catalog import from CSV/XLSX.
+
+Rows are streamed in chunks; every chunk is written with a handful of
+bulk queries instead of Product.save(), which costs a dozen queries per
+product (see BaseTranslatableModel.save). Columns:
+
+    sku, category, price, compare_price, is_active, is_featured,
+    name_<lang>, slug_<lang>, short_description_<lang>, description_<lang>
+
+``category`` is a category id or slug. Per-language columns are optional;
+a language without a name is left untouched. Slugs missing from the file
+are generated from the name (or the SKU); all new slugs are made unique
+within the catalog.
+"""
+import csv
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from apps.core.cache import invalidate
+from apps.core.translations import invalidate_translations
+from .models import CategoryTranslation, Product, ProductTranslation
+from .search import get_search_backend
+from .services import PRODUCTS_TAG, product_tag
+
+PRODUCT_FIELDS = ['category_id', 'price', 'compare_price', 'is_active', 'is_featured']
+TRANSLATED_FIELDS = ['name', 'slug', 'short_description', 'description']
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'да'}
+
+SLUG_MAX_LENGTH = ProductTranslation._meta.get_field('slug').max_length
+
+
+class ImportResult:
+    """
+    Running totals of one import, passed to the progress callback after every chunk.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.translations = 0
+        self.errors = []
+        self.started = time.monotonic()
+
+    @property
+    def skipped(self):
+        return len(self.errors)
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.rows / elapsed if elapsed else 0.0
+
+
+def read_rows(path):
+    """
+    Yield rows of a CSV or XLSX file as dicts with lower-cased keys.
+    """
+    path = Path(path)
+    if path.suffix.lower() in ('.xlsx', '.xlsm'):
+        # openpyxl ставится вместе с django-import-export (tablib[xlsx])
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell or '').strip().lower() for cell in next(rows, ())]
+            for values in rows:
+                yield {key: '' if value is None else str(value) for key, value in zip(header, values)}
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            for row in csv.DictReader(handle):
+                yield {(key or '').strip().lower(): value or '' for key, value in row.items()}
+
+
+class ProductImporter:
+    """
+    Create or update products (matched by SKU) and their translations in bulk.
+    """
+
+    def __init__(self, chunk_size=1000, languages=None, progress=None):
+        self.chunk_size = chunk_size
+        self.languages = languages or [code for code, name in settings.LANGUAGES]
+        self.progress = progress
+        self._categories = None
+
+    def run(self, rows):
+        result = ImportResult()
+        rows = iter(rows)
+        # Первая строка данных в файле — вторая (после заголовка)
+        line = 2
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self._import_chunk(list(enumerate(chunk, start=line)), result)
+            line += len(chunk)
+            if self.progress is not None:
+                self.progress(result)
+        if result.created or result.updated:
+            invalidate(PRODUCTS_TAG)
+        return result
+
+    def _import_chunk(self, numbered_rows, result):
+        parsed = {}
+        for line, row in numbered_rows:
+            result.rows += 1
+            try:
+                sku, values, translations = self._parse(row)
+            except ValueError as error:
+                result.errors.append((line, str(error)))
+                continue
+            # Повтор SKU внутри файла: побеждает последняя строка
+            parsed[sku] = (values, translations)
+        if not parsed:
+            return
+
+        with transaction.atomic():
+            products = self._save_products(parsed, result)
+            self._save_translations(products, parsed, result)
+        product_ids = [product.pk for product in products.values()]
+        get_search_backend().index_products(product_ids)
+        invalidate(*[product_tag(product_id) for product_id in product_ids])
+
+    def _save_products(self, parsed, result):
+        existing = Product.objects.in_bulk(list(parsed), field_name='sku')
+        now = timezone.now()
+        new, changed = [], []
+        for sku, (values, translations) in parsed.items():
+            product = existing.get(sku)
+            if product is None:
+                new.append(Product(sku=sku, **values))
+                continue
+            if any(getattr(product, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(product, field, value)
+                # bulk_update не трогает auto_now
+                product.updated_at = now
+                changed.append(product)
+
+        # bulk_create заполняет pk на PostgreSQL и SQLite 3.35+
+        Product.objects.bulk_create(new, batch_size=self.chunk_size)
+        Product.objects.bulk_update(changed, PRODUCT_FIELDS + ['updated_at'], batch_size=self.chunk_size)
+        result.created += len(new)
+        result.updated += len(changed)
+
+        products = dict(existing)
+        products.update((product.sku, product) for product in new)
+        return products
+
+    def _save_translations(self, products, parsed, result):
+        existing = {
+            (translation.master_id, translation.language_code): translation
+            for translation in ProductTranslation.objects.filter(
+                master_id__in=[product.pk for product in products.values()],
+                language_code__in=self.languages,
+            )
+        }
+
+        new, changed, needs_slug = [], [], []
+        for sku, (values, translations) in parsed.items():
+            product = products[sku]
+            for language, fields in translations.items():
+                translation = existing.get((product.pk, language))
+                if translation is None:
+                    translation = ProductTranslation(master_id=product.pk, language_code=language)
+                    new.append(translation)
+                elif all(getattr(translation, field) == value for field, value in fields.items()):
+                    continue
+                else:
+                    changed.append(translation)
+                slug = fields.pop('slug', None)
+                for field, value in fields.items():
+                    setattr(translation, field, value)
+                if slug and slug != translation.slug or not translation.slug:
+                    needs_slug.append((translation, (slug or _base_slug(fields['name'], sku, language))[:SLUG_MAX_LENGTH - 8]))
+
+        self._assign_slugs(needs_slug)
+        ProductTranslation.objects.bulk_create(new, batch_size=self.chunk_size)
+        ProductTranslation.objects.bulk_update(changed, TRANSLATED_FIELDS, batch_size=self.chunk_size)
+        result.translations += len(new) + len(changed)
+        # bulk_* минуют parler — кэш переводов сбрасываем сами
+        invalidate_translations(ProductTranslation, [product.pk for product in products.values()], self.languages)
+
+    def _assign_slugs(self, pending):
+        """
+        Give every pending translation a unique slug, checking a whole chunk
+        per IN (...) lookup: ``base``, then ``base-2``, ``base-3``...
+        """
+        # Занятыми считаются все slug в БД, и старые slug переименовываемых строк тоже: новые строки
+        # вставляются до обновления измененных, поэтому освобожденный slug в этом же чанке не переиспользуем
+        taken = set()
+        suffix = 1
+        while pending:
+            candidates = [base if suffix == 1 else f'{base}-{suffix}' for translation, base in pending]
+            taken.update(
+                ProductTranslation.objects.filter(slug__in=set(candidates) - taken)
+                .values_list('slug', flat=True)
+            )
+            still_pending = []
+            for (translation, base), slug in zip(pending, candidates):
+                if slug in taken:
+                    still_pending.append((translation, base))
+                else:
+                    translation.slug = slug
+                    taken.add(slug)
+            pending = still_pending
+            suffix += 1
+
+    def _parse(self, row):
+        sku = row.get('sku', '').strip()
+        if not sku:
+            raise ValueError('SKU is required.')
+
+        values = {
+            'category_id': self._category_id(row.get('category', '').strip()),
+            'price': _decimal(row.get('price'), 'price', required=True),
+            'compare_price': _decimal(row.get('compare_price'), 'compare_price'),
+            'is_active': _boolean(row.get('is_active'), default=True),
+            'is_featured': _boolean(row.get('is_featured'), default=False),
+        }
+
+        translations = {}
+        for language in self.languages:
+            name = row.get(f'name_{language}', '').strip()
+            if not name:
+                continue
+            fields = {'name': name}
+            for field in ('short_description', 'description'):
+                column = f'{field}_{language}'
+                if column in row:
+                    fields[field] = row[column].strip()
+            slug = slugify(row.get(f'slug_{language}', '').strip())
+            if slug:
+                fields['slug'] = slug
+            translations[language] = fields
+        if not translations:
+            raise ValueError(f'SKU {sku}: at least one name_<language> column is required.')
+        return sku, values, translations
+
+    def _category_id(self, value):
+        if self._categories is None:
+            # Категорий немного — загружаем соответствие slug/id один раз на импорт
+            self._categories = {}
+            for category_id, slug in CategoryTranslation.objects.values_list('master_id', 'slug'):
+                self._categories[slug] = category_id
+                self._categories[str(category_id)] = category_id
+        try:
+            return self._categories[value]
+        except KeyError:
+            raise ValueError(f'Unknown category "{value}".') from None
+
+
+def _base_slug(name, sku, language):
+    slug = slugify(name)
+    # slugify() без allow_unicode выбрасывает кириллицу — от "Товар 1" остается "1"
+    if not any(char.isalpha() for char in slug):
+        slug = slugify(f'{sku}-{language}')
+    return slug or 'product'
+
+
+def _decimal(value, field, required=False):
+    value = (value or '').strip().replace(',', '.')
+    if not value:
+        if required:
+            raise ValueError(f'{field} is required.')
+        return None
+    try:
+        return Decimal(value).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'Invalid {field} "{value}".') from None
+
+
+def _boolean(value, default):
+    value = (value or '').strip().lower()
+    if not value:
+        return default
+    return value in TRUE_VALUES
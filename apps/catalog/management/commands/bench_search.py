@@ -0,0 +1,51 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import translation
+
+from apps.catalog.models import ProductTranslation
+from apps.catalog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Measure storefront search latency (p50/p95/p99) on queries sampled from product names.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', default='en')
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=24)
+
+    def handle(self, *args, **options):
+        language = options['language']
+        names = list(
+            ProductTranslation.objects.filter(language_code=language)
+            .order_by('?').values_list('name', flat=True)[:options['queries']]
+        )
+        if not names:
+            raise CommandError(f'No product names in language "{language}".')
+
+        # Запросы из одного-двух слов реальных названий, чтобы были и точные, и частичные совпадения
+        queries = []
+        for name in names:
+            words = name.split()
+            queries.append(' '.join(random.sample(words, min(len(words), random.choice([1, 2])))))
+
+        backend = get_search_backend()
+        timings = []
+        hits = 0
+        with translation.override(language):
+            for query in queries:
+                started = time.perf_counter()
+                ids, total = backend.search(query, language, limit=options['page_size'])
+                timings.append((time.perf_counter() - started) * 1000)
+                hits += bool(ids)
+
+        timings.sort()
+        percentile = lambda p: timings[min(len(timings) - 1, int(len(timings) * p))]
+        self.stdout.write(f'{type(backend).__name__}, {len(queries)} queries, {hits} with results')
+        self.stdout.write(
+            f'  mean {statistics.mean(timings):.2f} ms, p50 {percentile(0.50):.2f} ms, '
+            f'p95 {percentile(0.95):.2f} ms, p99 {percentile(0.99):.2f} ms'
+        )
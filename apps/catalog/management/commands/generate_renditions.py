@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from apps.catalog.models import Product, ProductImage
+from apps.catalog.renditions import generate_renditions, is_current
+
+MODELS = {
+    'products': Product,
+    'gallery': ProductImage,
+}
+
+
+class Command(BaseCommand):
+    help = 'Pre-generate thumbnails and responsive WebP/AVIF renditions in a process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODELS), action='append', help='Default: all.')
+        parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count, 0 = in process).')
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument('--force', action='store_true', help='Re-render images whose renditions are current.')
+
+    def handle(self, *args, **options):
+        for name in options['model'] or sorted(MODELS):
+            model = MODELS[name]
+            queryset = model.objects.exclude(image='').exclude(image__isnull=True).only('pk', 'image', 'renditions')
+            rendered = failed = 0
+            chunk = []
+            for instance in queryset.order_by('pk').iterator(chunk_size=options['chunk_size']):
+                if options['force'] or not is_current(instance):
+                    chunk.append(instance)
+                if len(chunk) >= options['chunk_size']:
+                    rendered, failed = self._render(chunk, options['workers'], rendered, failed)
+                    chunk = []
+            if chunk:
+                rendered, failed = self._render(chunk, options['workers'], rendered, failed)
+            self.stdout.write(self.style.SUCCESS(f'{name}: rendered {rendered}, failed {failed}.'))
+
+    def _render(self, chunk, workers, rendered, failed):
+        errors = generate_renditions(chunk, workers=workers)
+        for pk, error in errors.items():
+            self.stderr.write(f'  #{pk}: {error}')
+        self.stdout.write(f'  {rendered + len(chunk)} processed')
+        return rendered + len(chunk) - len(errors), failed + len(errors)
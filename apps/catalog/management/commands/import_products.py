@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.catalog.importers import ProductImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk create or update products and translations from a CSV/XLSX file (matched by SKU).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--languages', help='Comma-separated language codes to import (default: all).')
+
+    def handle(self, *args, **options):
+        languages = options['languages'].split(',') if options['languages'] else None
+        importer = ProductImporter(chunk_size=options['chunk_size'], languages=languages, progress=self._progress)
+        try:
+            result = importer.run(read_rows(options['path']))
+        except FileNotFoundError as error:
+            raise CommandError(error)
+
+        for line, message in result.errors[:50]:
+            self.stderr.write(f'  line {line}: {message}')
+        if result.skipped > 50:
+            self.stderr.write(f'  ... and {result.skipped - 50} more')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.rows} rows: {result.created} created, {result.updated} updated, '
+            f'{result.translations} translations written, {result.skipped} skipped.'
+        ))
+
+    def _progress(self, result):
+        self.stdout.write(f'  {result.rows} rows, {result.rate:.0f} rows/s')
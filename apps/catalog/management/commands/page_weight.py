@@ -0,0 +1,92 @@
+from html.parser import HTMLParser
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+
+class ImageCollector(HTMLParser):
+    """
+    Picks the file a browser would download for every <img>/<picture>:
+    the first <source> (best format first), then the narrowest srcset
+    candidate covering the slot width.
+    """
+
+    def __init__(self, slot_width):
+        super().__init__()
+        self.slot_width = slot_width
+        self.images = []
+        self._source = None
+        self._in_picture = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'picture':
+            self._in_picture, self._source = True, None
+        elif tag == 'source' and self._in_picture and self._source is None:
+            self._source = attrs.get('srcset')
+        elif tag == 'img':
+            srcset = self._source or attrs.get('srcset')
+            url = self._pick(srcset) if srcset else attrs.get('src', '')
+            self.images.append((url, attrs.get('loading') == 'lazy'))
+
+    def handle_endtag(self, tag):
+        if tag == 'picture':
+            self._in_picture, self._source = False, None
+
+    def _pick(self, srcset):
+        candidates = []
+        for candidate in srcset.split(','):
+            url, _, descriptor = candidate.strip().partition(' ')
+            candidates.append((int(descriptor.rstrip('w') or 0), url))
+        candidates.sort()
+        for width, url in candidates:
+            if width >= self.slot_width:
+                return url
+        return candidates[-1][1]
+
+
+class Command(BaseCommand):
+    help = 'Render a storefront page and sum the bytes of the HTML and the images a browser would fetch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='/')
+        parser.add_argument('--slot-width', type=int, default=330, help='Rendered image width in device pixels.')
+        parser.add_argument('--max-bytes', type=int, help='Fail if the initial (non-lazy) page weight exceeds this.')
+
+    def handle(self, *args, **options):
+        response = Client().get(options['path'])
+        if response.status_code != 200:
+            raise CommandError(f'{options["path"]} returned {response.status_code}')
+        html = response.content.decode()
+        collector = ImageCollector(options['slot_width'])
+        collector.feed(html)
+
+        initial = total = len(response.content)
+        missing = []
+        for url, lazy in collector.images:
+            size = self._size(url)
+            if size is None:
+                missing.append(url)
+                continue
+            total += size
+            if not lazy:
+                initial += size
+
+        lazy_count = sum(lazy for url, lazy in collector.images)
+        self.stdout.write(f'HTML: {len(response.content)} bytes, images: {len(collector.images)} ({lazy_count} lazy)')
+        self.stdout.write(f'Initial load: {initial} bytes, after scrolling: {total} bytes')
+        if missing:
+            self.stdout.write(f'Not in media storage (not counted): {len(missing)}')
+        if options['max_bytes'] and initial > options['max_bytes']:
+            raise CommandError(f'Initial page weight {initial} exceeds budget {options["max_bytes"]}.')
+
+    def _size(self, url):
+        path = unquote(urlparse(url).path)
+        media_url = '/' + settings.MEDIA_URL.lstrip('/')
+        if not path.startswith(media_url):
+            return None
+        name = path[len(media_url):]
+        return default_storage.size(name) if default_storage.exists(name) else None
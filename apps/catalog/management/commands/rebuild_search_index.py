@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from apps.catalog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Reindex all products in the storefront search backend.'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        indexed = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{type(backend).__name__}: indexed {indexed} translations.'))
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Composite index for subtree lookups (tree_id = X AND lft BETWEEN a AND b).
+
+    MPTT adds tree_id/lft/rght after Meta is processed, so the index cannot
+    be declared in Category.Meta.indexes and is created here directly.
+    """
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX catalog_category_tree_range_idx ON catalog_category (tree_id, lft, rght)',
+            'DROP INDEX catalog_category_tree_range_idx',
+        ),
+    ]
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+# Должно совпадать с apps.catalog.search.POSTGRES_CONFIGS
+POSTGRES_SEARCH_VECTOR = """
+    to_tsvector(
+        CASE language_code
+            WHEN 'en' THEN 'english'::regconfig
+            WHEN 'es' THEN 'spanish'::regconfig
+            WHEN 'ru' THEN 'russian'::regconfig
+            ELSE 'simple'::regconfig
+        END,
+        coalesce(name, '') || ' ' || coalesce(short_description, '') || ' ' || coalesce(description, '')
+    )
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE catalog_product_translation ADD COLUMN search_vector tsvector '
+            f'GENERATED ALWAYS AS ({POSTGRES_SEARCH_VECTOR}) STORED'
+        )
+        schema_editor.execute(
+            'CREATE INDEX catalog_product_translation_search_idx '
+            'ON catalog_product_translation USING gin (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE catalog_product_fts USING fts5('
+            'name, short_description, description, sku, '
+            'product_id UNINDEXED, language_code UNINDEXED, '
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            'INSERT INTO catalog_product_fts (rowid, name, short_description, description, sku, product_id, language_code) '
+            'SELECT t.id, t.name, t.short_description, t.description, p.sku, p.id, t.language_code '
+            'FROM catalog_product_translation t JOIN catalog_product p ON p.id = t.master_id'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE catalog_product_translation DROP COLUMN search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE catalog_product_fts')
+
+
+class Migration(migrations.Migration):
+    """
+    Storage for apps.catalog.search: a generated tsvector column with a GIN
+    index on PostgreSQL, an FTS5 virtual table on SQLite. Other databases
+    use the unindexed BasicSearchBackend.
+    """
+
+    dependencies = [
+        ('catalog', '0002_category_tree_range_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
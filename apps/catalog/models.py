@@ -68,7 +68,41 @@ class Category(MPTTModel, BaseTranslatableModel):
     def __str__(self):
         return self.safe_translation_getter('name', any_language=True) or f"Category {self.id}"
 
-class Product(BaseTranslatableModel):
+class RenditionMixin:
+    """
+    URLs of pre-generated images (apps.catalog.renditions), read from the
+    ``renditions`` field without touching storage. Until renditions for the
+    current file exist there are no URLs at all: the original is never sent
+    in place of a thumbnail.
+    """
+
+    def _current_renditions(self):
+        if self.image and self.renditions.get('source') == self.image.name:
+            return self.renditions
+        return {}
+
+    @property
+    def thumbnail_url(self):
+        name = self._current_renditions().get('thumbnail')
+        return self.image.storage.url(name) if name else ''
+
+    @property
+    def placeholder(self):
+        return self._current_renditions().get('placeholder', '')
+
+    @property
+    def image_size(self):
+        """(width, height) of the original, or None before renditions exist."""
+        renditions = self._current_renditions()
+        return (renditions['width'], renditions['height']) if renditions else None
+
+    def rendition_urls(self, format):
+        """[(width, url), ...] of one format, narrowest first."""
+        names = self._current_renditions().get('sources', {}).get(format, {})
+        return sorted((int(width), self.image.storage.url(name)) for width, name in names.items())
+
+
+class Product(RenditionMixin, BaseTranslatableModel):
     """
     Products with translations and price variations.
     """
@@ -102,12 +136,15 @@ class Product(BaseTranslatableModel):
         verbose_name=_('Main image')
     )
     
+    # Размер миниатюры нужен шаблонам для width/height без чтения файла
+    THUMBNAIL_SIZE = (300, 300)
     image_thumbnail = ImageSpecField(
         source='image',
-        processors=[ResizeToFill(300, 300)],
+        processors=[ResizeToFill(*THUMBNAIL_SIZE)],
         format='JPEG',
         options={'quality': 85}
     )
+    renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name=_('Renditions'))
     
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_('Price'))
     compare_price = models.DecimalField(
@@ -139,19 +176,21 @@ class Product(BaseTranslatableModel):
             return int(((self.compare_price - self.price) / self.compare_price) * 100)
         return 0
 
-class ProductImage(models.Model):
+class ProductImage(RenditionMixin, models.Model):
     """
     Product image gallery.
     """
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images', verbose_name=_('Product'))
     image = models.ImageField(upload_to='products/gallery/', verbose_name=_('Image'))
     
+    THUMBNAIL_SIZE = (150, 150)
     image_thumbnail = ImageSpecField(
         source='image',
-        processors=[ResizeToFill(150, 150)],
+        processors=[ResizeToFill(*THUMBNAIL_SIZE)],
         format='JPEG',
         options={'quality': 80}
     )
+    renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name=_('Renditions'))
     
     alt_text = models.CharField(max_length=255, blank=True, verbose_name=_('Alt text'))
     order = models.PositiveIntegerField(default=0, verbose_name=_('Order'))
@@ -0,0 +1,215 @@
+"""
+Eagerly generated image renditions.
+
+For every Product/ProductImage with an image we pre-generate the imagekit
+thumbnail spec plus resized WebP (and AVIF, when Pillow supports it)
+copies, and record their storage names in ``renditions``:
+
+    {"source": "products/a.jpg", "width": 1600, "height": 1200,
+     "thumbnail": "CACHE/images/.../a.jpg", "placeholder": "data:image/jpeg;base64,...",
+     "sources": {"webp": {"320": "renditions/..", ...}, "avif": {...}}}
+
+Templates read URLs from that field only, so a request never checks
+storage or resizes an image. Rendering runs in a process pool for
+backfills; an upload is handed to a long-lived pool of
+RENDITION_UPLOAD_WORKERS background processes once it is committed, so
+the request that saved it does not wait for the resizing.
+"""
+import base64
+import hashlib
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageFilter, ImageOps, features
+
+from apps.core.cache import invalidate
+from .services import PRODUCTS_TAG
+
+RENDITION_WIDTHS = (320, 640, 960, 1280)
+# Лучший формат первым: браузер берет первый поддерживаемый <source>
+RENDITION_FORMATS = ('avif', 'webp') if features.check('avif') else ('webp',)
+RENDITION_QUALITY = {'webp': 80, 'avif': 60}
+PLACEHOLDER_WIDTH = 16
+
+logger = logging.getLogger(__name__)
+_upload_pool = None
+
+
+def is_current(instance):
+    return bool(instance.image) and instance.renditions.get('source') == instance.image.name
+
+
+def render(instance):
+    """
+    Generate all renditions of one instance's image and return the
+    ``renditions`` dict. Touches storage only, never the database.
+    """
+    source = instance.image
+    storage = source.storage
+    # Существующий ImageSpecField: генерируем файл заранее, чтобы imagekit не делал это в запросе
+    instance.image_thumbnail.generate()
+
+    with source.open('rb'):
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    # Имена зависят от исходного файла: новая картинка — новые URL, старые кэши браузера не мешают
+    digest = hashlib.md5(source.name.encode()).hexdigest()
+    prefix = f'renditions/{digest[:2]}/{digest}'
+    sources = {}
+    for format in RENDITION_FORMATS:
+        sources[format] = {}
+        for width in sorted({min(width, image.width) for width in RENDITION_WIDTHS}):
+            height = round(image.height * width / image.width)
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, format=format.upper(), quality=RENDITION_QUALITY[format])
+            name = f'{prefix}/{width}.{format}'
+            if storage.exists(name):
+                storage.delete(name)
+            sources[format][str(width)] = storage.save(name, ContentFile(buffer.getvalue()))
+
+    return {
+        'source': source.name,
+        'width': image.width,
+        'height': image.height,
+        'thumbnail': instance.image_thumbnail.name,
+        'placeholder': placeholder(image),
+        'sources': sources,
+    }
+
+
+def placeholder(image):
+    """
+    Tiny blurred JPEG as a data URI (a few hundred bytes), shown while the
+    real image loads.
+    """
+    tiny = image.convert('RGB')
+    tiny.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH * 4))
+    tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    tiny.save(buffer, format='JPEG', quality=40)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def delete_files(instance, renditions):
+    """Remove rendition files recorded in ``renditions`` (the spec cache is imagekit's)."""
+    storage = instance.image.storage
+    for names in renditions.get('sources', {}).values():
+        for name in names.values():
+            storage.delete(name)
+
+
+def _render_one(instance):
+    previous = instance.renditions
+    try:
+        renditions = render(instance)
+    except (OSError, ValueError) as error:
+        return instance.pk, None, f'{type(error).__name__}: {error}'
+    if previous.get('source') not in (None, renditions['source']):
+        delete_files(instance, previous)
+    return instance.pk, renditions, None
+
+
+def generate_renditions(instances, workers=None):
+    """
+    Render renditions for ``instances`` (of one model) and store them with a
+    single bulk_update. ``workers=0`` renders in this process; otherwise a
+    process pool of ``workers`` processes (default: CPU count) is used.
+    Returns {pk: error} for images that could not be rendered.
+    """
+    instances = [instance for instance in instances if instance.image]
+    if not instances:
+        return {}
+    model = type(instances[0])
+
+    if workers == 0:
+        results = map(_render_one, instances)
+    else:
+        # Дочерние процессы не должны унаследовать открытые соединения с БД
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            results = list(pool.map(_render_one, instances, chunksize=4))
+
+    by_pk = {instance.pk: instance for instance in instances}
+    updated, errors = [], {}
+    for pk, renditions, error in results:
+        if error is not None:
+            errors[pk] = error
+            continue
+        by_pk[pk].renditions = renditions
+        updated.append(by_pk[pk])
+    # bulk_update не шлет post_save — повторной генерации и сброса кэшей не будет
+    model.objects.bulk_update(updated, ['renditions'])
+    if updated:
+        invalidate(PRODUCTS_TAG)
+    return errors
+
+
+def schedule(instance):
+    """
+    Render after the upload is committed, unless renditions are current.
+    Clears renditions of an instance whose image was removed.
+    """
+    if is_current(instance):
+        return
+    if not instance.image:
+        if instance.renditions:
+            delete_files(instance, instance.renditions)
+            type(instance).objects.filter(pk=instance.pk).update(renditions={})
+            instance.renditions = {}
+        return
+    if settings.RENDITION_UPLOAD_WORKERS:
+        transaction.on_commit(partial(_submit, instance._meta.label, instance.pk))
+    else:
+        transaction.on_commit(partial(generate_renditions, [instance], workers=0))
+
+
+def _get_upload_pool():
+    global _upload_pool
+    if _upload_pool is None:
+        # spawn, а не fork: веб-процесс многопоточный, форк мог бы унести чужие блокировки
+        _upload_pool = ProcessPoolExecutor(
+            max_workers=settings.RENDITION_UPLOAD_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+    return _upload_pool
+
+
+def _submit(label, pk):
+    future = _get_upload_pool().submit(render_uploaded, label, pk)
+    future.add_done_callback(partial(_log_failure, label, pk))
+
+
+def _log_failure(label, pk, future):
+    if future.exception() is not None:
+        logger.error('Rendering %s #%s failed', label, pk, exc_info=future.exception())
+
+
+def render_uploaded(label, pk):
+    """
+    Render one uploaded image in a background worker. The instance is
+    re-read, so an upload replaced in the meantime is rendered once, from
+    the latest file. Returns the error message, if any.
+    """
+    try:
+        instance = apps.get_model(label).objects.filter(pk=pk).first()
+        if instance is None or is_current(instance):
+            return None
+        error = generate_renditions([instance], workers=0).get(pk)
+        if error:
+            logger.warning('Could not render %s #%s: %s', label, pk, error)
+        return error
+    finally:
+        connections.close_all()
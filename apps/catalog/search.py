@@ -0,0 +1,198 @@
+"""
+Storefront product search.
+
+Backends share one interface: search() returns ranked product ids for one
+language plus the total number of hits, index_products()/remove_translations()
+keep the index current, rebuild() reindexes everything.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Product, ProductTranslation
+
+# Словари PostgreSQL для морфологии; для остальных языков — 'simple'
+POSTGRES_CONFIGS = {
+    'en': 'english',
+    'es': 'spanish',
+    'ru': 'russian',
+}
+
+FTS_TABLE = 'catalog_product_fts'
+
+# Админке хватает первых совпадений — дальше уточняют запрос
+ADMIN_SEARCH_LIMIT = 500
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class BaseSearchBackend:
+
+    def search(self, query, language, offset=0, limit=20, active_only=True):
+        """Return ([product_id, ...] best first, total). The admin searches inactive products too."""
+        raise NotImplementedError
+
+    def index_products(self, product_ids):
+        """(Re)index all translations of the given products."""
+
+    def remove_translations(self, translation_ids):
+        """Drop deleted translations from the index."""
+
+    def rebuild(self):
+        """Reindex every product. Returns the number of indexed rows."""
+        return 0
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """
+    Portable fallback: icontains over one language's translations and SKU.
+    Not ranked beyond newest first; fine for small catalogs only.
+    """
+
+    def search(self, query, language, offset=0, limit=20, active_only=True):
+        condition = Q()
+        for token in _TOKEN_RE.findall(query):
+            condition &= Q(name__icontains=token) | Q(short_description__icontains=token) | Q(description__icontains=token)
+        matches = ProductTranslation.objects.filter(condition, language_code=language).values('master_id')
+        # Подзапрос по переводам вместо JOIN — без дублей товара
+        products = Product.objects.filter(Q(pk__in=matches) | Q(sku__iexact=query))
+        if active_only:
+            products = products.filter(is_active=True)
+        products = products.order_by('-id')
+        total = products.count()
+        return list(products.values_list('pk', flat=True)[offset:offset + limit]), total
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Full-text search on a generated, GIN-indexed tsvector column of
+    catalog_product_translation (see migration 0003). PostgreSQL keeps the
+    column current on every INSERT/UPDATE, so no incremental work is needed.
+    """
+
+    def search(self, query, language, offset=0, limit=20, active_only=True):
+        config = POSTGRES_CONFIGS.get(language, 'simple')
+        sql = f'''
+            SELECT t.master_id, count(*) OVER ()
+            FROM {ProductTranslation._meta.db_table} t
+            JOIN {Product._meta.db_table} p ON p.id = t.master_id,
+                 websearch_to_tsquery(%s::regconfig, %s) q
+            WHERE t.language_code = %s AND (p.is_active OR NOT %s) AND (t.search_vector @@ q OR p.sku = %s)
+            ORDER BY (p.sku = %s) DESC, ts_rank_cd(t.search_vector, q) DESC, t.master_id DESC
+            LIMIT %s OFFSET %s
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [config, query, language, active_only, query, query, limit, offset])
+            rows = cursor.fetchall()
+        return _split_rows(rows)
+
+
+class SqliteSearchBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 fallback for development. The virtual table mirrors
+    product translations (rowid = translation id) and is updated from
+    Product/ProductTranslation signals.
+    """
+
+    def search(self, query, language, offset=0, limit=20, active_only=True):
+        tokens = _TOKEN_RE.findall(query)
+        # Точный SKU находится всегда и идет первым, как в PostgresSearchBackend
+        matches = f'SELECT id AS product_id, NULL AS score FROM {Product._meta.db_table} WHERE sku = %s'
+        params = [query]
+        if tokens:
+            # Каждое слово — префиксный поиск в кавычках, чтобы ввод пользователя не ломал синтаксис MATCH
+            match = ' '.join('"%s"*' % token.replace('"', '') for token in tokens)
+            # bm25() работает только в простом запросе к FTS-таблице, поэтому ранжируем во вложенном SELECT
+            matches += f'''
+                UNION ALL
+                SELECT product_id, bm25({FTS_TABLE}, 10.0, 3.0, 1.0, 5.0)
+                FROM {FTS_TABLE}
+                WHERE {FTS_TABLE} MATCH %s AND language_code = %s
+            '''
+            params += [match, language]
+        sql = f'''
+            SELECT f.product_id, count(*) OVER ()
+            FROM (SELECT product_id, min(score) AS score FROM ({matches}) GROUP BY product_id) f
+            JOIN {Product._meta.db_table} p ON p.id = f.product_id
+            WHERE p.is_active OR NOT %s
+            ORDER BY (p.sku = %s) DESC, f.score, f.product_id DESC
+            LIMIT %s OFFSET %s
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [active_only, query, limit, offset])
+            rows = cursor.fetchall()
+        return _split_rows(rows)
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        translations = ProductTranslation._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN '
+                f'(SELECT id FROM {translations} WHERE master_id IN ({placeholders}))',
+                product_ids,
+            )
+            cursor.execute(self._insert_sql(f'WHERE t.master_id IN ({placeholders})'), product_ids)
+
+    def remove_translations(self, translation_ids):
+        translation_ids = list(translation_ids)
+        if not translation_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(translation_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', translation_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(self._insert_sql(''))
+            return cursor.rowcount
+
+    @staticmethod
+    def _insert_sql(where):
+        return f'''
+            INSERT INTO {FTS_TABLE} (rowid, name, short_description, description, sku, product_id, language_code)
+            SELECT t.id, t.name, t.short_description, t.description, p.sku, p.id, t.language_code
+            FROM {ProductTranslation._meta.db_table} t
+            JOIN {Product._meta.db_table} p ON p.id = t.master_id
+            {where}
+        '''
+
+
+def _split_rows(rows):
+    if not rows:
+        return [], 0
+    return [row[0] for row in rows], rows[0][1]
+
+
+def get_search_backend():
+    """
+    Backend from settings.CATALOG_SEARCH_BACKEND, or picked by database vendor.
+    """
+    path = getattr(settings, 'CATALOG_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if connection.vendor == 'sqlite':
+        return SqliteSearchBackend()
+    return BasicSearchBackend()
+
+
+def search_product_ids(query, limit=ADMIN_SEARCH_LIMIT):
+    """
+    Ids of products, active or not, matching ``query`` in any configured
+    language (best first per language), for admin search and autocomplete.
+    """
+    backend = get_search_backend()
+    ids = dict.fromkeys(Product.objects.filter(sku=query).values_list('pk', flat=True))
+    for language, name in settings.LANGUAGES:
+        found, total = backend.search(query, language, limit=limit, active_only=False)
+        ids.update(dict.fromkeys(found))
+    return list(ids)[:limit]
@@ -0,0 +1,174 @@
+from bisect import bisect_right
+
+from django.core.cache import cache
+from django.db.models import Count, F, FilteredRelation, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.translation import get_language
+from parler.utils.i18n import get_active_language_choices
+
+from apps.core.cache import aget_versions, get_version, get_versions
+from .models import Category, CategoryTranslation, Product
+
+CATEGORY_TREE_TAG = 'category-tree'
+CATEGORY_TREE_TIMEOUT = 60 * 60 * 24
+PRODUCTS_TAG = 'products'
+# Меняется, только когда у товара меняется признак «в наличии»
+STOCK_TAG = 'stock'
+CATEGORY_COUNTS_TIMEOUT = 60 * 15
+
+
+def product_tag(product_id):
+    """Cache tag of one product (its storefront card)."""
+    return f'product:{product_id}'
+
+
+def attach_card_versions(products):
+    """
+    Set ``card_version`` on each product for its cached storefront card,
+    with a single cache round trip for the whole page.
+    """
+    versions = get_versions(*[product_tag(product.pk) for product in products])
+    for product in products:
+        product.card_version = versions[product_tag(product.pk)]
+
+
+async def aattach_card_versions(products):
+    """attach_card_versions() for async views."""
+    versions = await aget_versions(*[product_tag(product.pk) for product in products])
+    for product in products:
+        product.card_version = versions[product_tag(product.pk)]
+
+
+class CategoryNode:
+    """
+    Lightweight, picklable category used by menus and listings.
+    """
+    __slots__ = ('id', 'parent_id', 'tree_id', 'lft', 'rght', 'level', 'name', 'slug', 'children')
+
+    def __init__(self, id, parent_id, tree_id, lft, rght, level, name, slug):
+        self.id = id
+        self.parent_id = parent_id
+        self.tree_id = tree_id
+        self.lft = lft
+        self.rght = rght
+        self.level = level
+        self.name = name or f'Category {id}'
+        self.slug = slug
+        self.children = []
+
+    def __str__(self):
+        return self.name
+
+    def subtree_filter(self, prefix='category__'):
+        """
+        Lookup kwargs matching this category and all its descendants with
+        one range condition on the MPTT columns, instead of IN (descendants).
+        """
+        return {
+            f'{prefix}tree_id': self.tree_id,
+            f'{prefix}lft__gte': self.lft,
+            f'{prefix}rght__lte': self.rght,
+        }
+
+
+def _first_translated(aliases, field):
+    # Как safe_translation_getter(any_language=True): в конце — любой имеющийся перевод
+    any_language = CategoryTranslation.objects.filter(master=OuterRef('pk')).order_by('language_code').values(field)[:1]
+    return Coalesce(*[F(f'{alias}__{field}') for alias in aliases], Subquery(any_language))
+
+
+def _load_tree(language):
+    # Один запрос: LEFT JOIN перевода на каждый язык из цепочки fallback, берем первый непустой
+    languages = get_active_language_choices(language)
+    relations = {
+        f'tr_{i}': FilteredRelation('translations', condition=Q(translations__language_code=code))
+        for i, code in enumerate(languages)
+    }
+    rows = (
+        Category.objects.filter(is_active=True)
+        .annotate(**relations)
+        .annotate(tr_name=_first_translated(relations, 'name'), tr_slug=_first_translated(relations, 'slug'))
+        .order_by('tree_id', 'lft')
+        .values_list('id', 'parent_id', 'tree_id', 'lft', 'rght', 'level', 'tr_name', 'tr_slug')
+    )
+
+    roots = []
+    nodes = {}
+    for row in rows:
+        node = CategoryNode(*row)
+        if node.parent_id is None:
+            roots.append(node)
+        elif node.parent_id in nodes:
+            nodes[node.parent_id].children.append(node)
+        else:
+            # Родитель выключен — вся ветка скрыта
+            continue
+        nodes[node.id] = node
+    return roots
+
+
+def get_category_tree(language=None):
+    """
+    Active category tree for a language, as a list of root CategoryNodes.
+
+    Built from a single query in MPTT (tree_id, lft) order and cached per
+    language until any category or category translation changes.
+    """
+    language = language or get_language()
+    key = f'category-tree:{language}:{get_version(CATEGORY_TREE_TAG)}'
+    tree = cache.get(key)
+    if tree is None:
+        tree = _load_tree(language)
+        cache.set(key, tree, CATEGORY_TREE_TIMEOUT)
+    return tree
+
+
+def walk(nodes):
+    """Depth-first iteration over nodes and their descendants."""
+    for node in nodes:
+        yield node
+        yield from walk(node.children)
+
+
+def find_category(slug, language=None):
+    """
+    Active category node by slug, looked up in the cached tree.
+    Slugs of other languages fall back to one query. Returns None if missing.
+    """
+    nodes = list(walk(get_category_tree(language)))
+    for node in nodes:
+        if node.slug == slug:
+            return node
+    category_id = Category.objects.filter(translations__slug=slug).values_list('pk', flat=True).first()
+    return next((node for node in nodes if node.id == category_id), None)
+
+
+def get_subcategory_counts(node):
+    """
+    {child_id: number of active products in the child's subtree}.
+
+    One grouped query over the whole subtree, attributed to the children by
+    their lft/rght ranges and cached until products or categories change.
+    """
+    versions = get_versions(CATEGORY_TREE_TAG, PRODUCTS_TAG)
+    key = f'category-counts:{node.id}:{versions[CATEGORY_TREE_TAG]}:{versions[PRODUCTS_TAG]}'
+    counts = cache.get(key)
+    if counts is not None:
+        return counts
+
+    children = sorted(node.children, key=lambda child: child.lft)
+    counts = {child.id: 0 for child in children}
+    if children:
+        rows = (
+            Product.objects.filter(is_active=True, **node.subtree_filter())
+            .values_list('category__lft')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        bounds = [child.lft for child in children]
+        for lft, total in rows:
+            child = children[bisect_right(bounds, lft) - 1] if lft >= bounds[0] else None
+            if child is not None and lft <= child.rght:
+                counts[child.id] += total
+    cache.set(key, counts, CATEGORY_COUNTS_TIMEOUT)
+    return counts
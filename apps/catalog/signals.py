@@ -0,0 +1,58 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from mptt.signals import node_moved
+
+from apps.core.cache import invalidate
+from . import renditions
+from .models import Category, CategoryTranslation, Product, ProductImage, ProductTranslation
+from .search import get_search_backend
+from .services import CATEGORY_TREE_TAG, PRODUCTS_TAG, product_tag
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=CategoryTranslation)
+@receiver(post_delete, sender=CategoryTranslation)
+@receiver(node_moved, sender=Category)
+def category_changed(sender, **kwargs):
+    # Меню и дерево категорий кэшируются по версии тега — достаточно ее сменить
+    invalidate(CATEGORY_TREE_TAG)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductTranslation)
+@receiver(post_delete, sender=ProductTranslation)
+def product_changed(sender, instance, **kwargs):
+    # Цена, название, активность: сбрасываем страницы витрины и карточку этого товара
+    product_id = instance.master_id if sender is ProductTranslation else instance.pk
+    invalidate(PRODUCTS_TAG, product_tag(product_id))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductTranslation)
+def reindex_product(sender, instance, **kwargs):
+    product_id = instance.master_id if sender is ProductTranslation else instance.pk
+    get_search_backend().index_products([product_id])
+
+
+@receiver(post_delete, sender=ProductTranslation)
+def unindex_translation(sender, instance, **kwargs):
+    get_search_backend().remove_translations([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+def render_uploaded_image(sender, instance, raw=False, **kwargs):
+    if not raw:
+        renditions.schedule(instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductImage)
+def delete_renditions(sender, instance, **kwargs):
+    if instance.renditions:
+        transaction.on_commit(partial(renditions.delete_files, instance, instance.renditions))
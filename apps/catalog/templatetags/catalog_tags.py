@@ -0,0 +1,79 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from apps.core.cache import get_version
+from apps.catalog.renditions import RENDITION_FORMATS
+from apps.catalog.services import CATEGORY_TREE_TAG, CATEGORY_TREE_TIMEOUT, get_category_tree, walk
+
+register = template.Library()
+
+# Сколько первых картинок на странице грузить сразу (они на первом экране и влияют на LCP)
+EAGER_IMAGES = 4
+
+
+@register.simple_tag
+def category_menu():
+    """
+    Sidebar category menu. The rendered HTML is cached per language and
+    category tree version, so a warm cache renders it without queries.
+    """
+    language = get_language()
+    key = f'category-menu:{language}:{get_version(CATEGORY_TREE_TAG)}'
+    html = cache.get(key)
+    if html is None:
+        nodes = list(walk(get_category_tree(language)))
+        html = render_to_string('catalog/includes/category_menu.html', {'nodes': nodes})
+        cache.set(key, html, CATEGORY_TREE_TIMEOUT)
+    return mark_safe(html)
+
+
+@register.simple_tag
+def responsive_image(obj, sizes='100vw', alt='', css_class='', index=None):
+    """
+    <picture> for an object with RenditionMixin: AVIF/WebP srcsets, explicit
+    width/height against layout shift, a blurred placeholder and lazy
+    loading for everything past the first EAGER_IMAGES on the page.
+
+        {% responsive_image product sizes="25vw" alt=product.name index=forloop.counter0 %}
+    """
+    if not obj.image:
+        return ''
+    size = obj.image_size
+    if size is None:
+        # Рендишены еще не готовы (их делают сразу после загрузки) — пустая рамка, а не исходник в мегабайты
+        return format_html(
+            '<div class="{} bg-light" style="aspect-ratio:3/2" role="img" aria-label="{}"></div>', css_class, alt
+        )
+
+    eager = index is not None and index < EAGER_IMAGES
+    loading = format_html(
+        ' loading="{}" decoding="async"{}',
+        'eager' if eager else 'lazy',
+        mark_safe(' fetchpriority="high"') if index == 0 else '',
+    )
+
+    # Размеры задают пропорции, реальную ширину определяет CSS
+    width = min(size[0], 640)
+    height = round(size[1] * width / size[0])
+    sources = []
+    for format in RENDITION_FORMATS:
+        urls = obj.rendition_urls(format)
+        if urls:
+            srcset = ', '.join(f'{url} {candidate}w' for candidate, url in urls)
+            sources.append(format_html(
+                '<source type="image/{}" srcset="{}" sizes="{}" width="{}" height="{}">',
+                format, srcset, sizes, width, height,
+            ))
+
+    # Запасной <img> — квадратная миниатюра, и пропорции у него свои; у <source> — пропорции оригинала
+    thumbnail_width, thumbnail_height = obj.THUMBNAIL_SIZE
+    style = format_html(' style="background:url({}) center/cover"', obj.placeholder) if obj.placeholder else ''
+    return format_html(
+        '<picture>{}<img src="{}" width="{}" height="{}" alt="{}" class="{}"{}{}></picture>',
+        format_html_join('', '{}', ((source,) for source in sources)),
+        obj.thumbnail_url, thumbnail_width, thumbnail_height, alt, css_class, loading, style,
+    )
@@ -1,3 +1,247 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from apps.core.testing import assert_no_repeated_queries, assert_view_budget
+from apps.core.translations import local_cache
+from .importers import ProductImporter
+from .management.commands.page_weight import ImageCollector
+from .models import Category, Product, ProductTranslation
+from .renditions import generate_renditions, render_uploaded
+from .search import SqliteSearchBackend
+
+
+def make_category(slug='root'):
+    category = Category(is_active=True)
+    category.set_current_language('en')
+    category.name = slug.title()
+    category.slug = slug
+    category.save()
+    return category
+
+
+class ImporterSlugTests(TestCase):
+
+    def setUp(self):
+        self.category = make_category()
+        self.importer = ProductImporter(languages=['en'])
+
+    def row(self, sku, name, **columns):
+        return {'sku': sku, 'category': 'root', 'price': '10', 'name_en': name, **columns}
+
+    def slugs(self):
+        return dict(ProductTranslation.objects.values_list('master__sku', 'slug'))
+
+    def test_changed_translation_keeps_its_slug_reserved(self):
+        self.importer.run([self.row('A', 'Widget')])
+
+        result = ProductImporter(languages=['en']).run([
+            self.row('A', 'Widget', description_en='New description'),
+            self.row('B', 'Widget'),
+        ])
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual(self.slugs(), {'A': 'widget', 'B': 'widget-2'})
+        self.assertEqual(Product.objects.get(sku='A').safe_translation_getter('description'), 'New description')
+
+    def test_slug_freed_by_a_rename_is_not_reused_in_the_same_chunk(self):
+        self.importer.run([self.row('A', 'Widget')])
+
+        ProductImporter(languages=['en']).run([
+            self.row('A', 'Widget', slug_en='widget-classic'),
+            self.row('B', 'Widget'),
+        ])
+
+        self.assertEqual(self.slugs(), {'A': 'widget-classic', 'B': 'widget-2'})
+
+    def test_duplicate_names_in_one_chunk_get_suffixes(self):
+        self.importer.run([self.row('A', 'Gadget'), self.row('B', 'Gadget'), self.row('C', 'Gadget')])
+
+        self.assertEqual(sorted(self.slugs().values()), ['gadget', 'gadget-2', 'gadget-3'])
+
+
+class ResponsiveImageTests(TestCase):
+    """
+    Bytes a browser downloads for a product card image.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+        buffer = io.BytesIO()
+        # Шум плохо сжимается — исходник весит как настоящая фотография
+        Image.effect_noise((1600, 1200), 64).convert('RGB').save(buffer, format='JPEG', quality=95)
+        self.product = Product(category=make_category(), sku='IMG-1', price=Decimal('10'))
+        self.product.set_current_language('en')
+        self.product.name = 'Photo'
+        self.product.slug = 'photo'
+        self.product.image.save('photo.jpg', ContentFile(buffer.getvalue()), save=False)
+        self.product.save()
+
+    def render(self, slot_width=330):
+        html = Template('{% load catalog_tags %}{% responsive_image product sizes="330px" index=0 %}').render(
+            Context({'product': self.product})
+        )
+        collector = ImageCollector(slot_width)
+        collector.feed(html)
+        return html, collector.images
+
+    def test_original_is_never_sent_before_renditions_exist(self):
+        html, images = self.render()
+
+        self.assertEqual(images, [])
+        self.assertNotIn(self.product.image.url, html)
+
+    def test_card_downloads_a_rendition_sized_for_the_slot(self):
+        generate_renditions([self.product], workers=0)
+        html, images = self.render()
+
+        (url, lazy), = images
+        downloaded = default_storage.size(url.removeprefix(default_storage.base_url))
+        self.assertFalse(lazy)
+        self.assertIn('/640.', url)
+        self.assertLess(downloaded * 5, self.product.image.size)
+
+    def test_fallback_img_has_the_thumbnail_proportions(self):
+        generate_renditions([self.product], workers=0)
+        html, _ = self.render()
+
+        self.assertIn(f'src="{self.product.thumbnail_url}" width="300" height="300"', html)
+        self.assertIn('width="640" height="480"', html.split('<img')[0])
+
+    def test_upload_is_rendered_in_the_background(self):
+        product = self.product
+        with mock.patch('apps.catalog.renditions._get_upload_pool') as pool, \
+                self.captureOnCommitCallbacks(execute=True):
+            product.save()
+
+        pool.return_value.submit.assert_called_once_with(render_uploaded, 'catalog.Product', product.pk)
+        self.assertEqual(Product.objects.get(pk=product.pk).renditions, {})
+
+        # То же, что выполнит фоновый процесс
+        self.assertIsNone(render_uploaded('catalog.Product', product.pk))
+        self.assertEqual(Product.objects.get(pk=product.pk).image_size, (1600, 1200))
+
+
+class SqliteSearchTests(TestCase):
+
+    def setUp(self):
+        category = make_category()
+        self.products = {}
+        for sku, name in [('AB-100', 'Gadget'), ('XY-1', 'Spare part for AB 100 gadget')]:
+            product = Product(category=category, sku=sku, price=Decimal('10'))
+            product.set_current_language('en')
+            product.name = name
+            product.slug = sku.lower()
+            product.save()
+            self.products[sku] = product.pk
+
+    def test_exact_sku_comes_first(self):
+        ids, total = SqliteSearchBackend().search('AB-100', 'en')
+
+        self.assertEqual(ids, [self.products['AB-100'], self.products['XY-1']])
+        self.assertEqual(total, 2)
+
+    def test_exact_sku_is_found_without_a_translation(self):
+        self.assertEqual(SqliteSearchBackend().search('AB-100', 'es'), ([self.products['AB-100']], 1))
+        self.assertEqual(SqliteSearchBackend().search('XY-1', 'es'), ([self.products['XY-1']], 1))
+
+
+class StorefrontTranslationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.product = Product(category=make_category(), sku='LRU-1', price=Decimal('10'))
+        self.product.set_current_language('en')
+        self.product.name = 'Old name'
+        self.product.slug = 'lru-1'
+        self.product.save()
+
+    def test_cached_cards_ignore_a_stale_local_translation(self):
+        self.assertContains(self.client.get(reverse('catalog:product_list')), 'Old name')
+        stale = dict(local_cache._data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.get(pk=self.product.pk)
+            product.set_current_language('en')
+            product.name = 'New name'
+            product.save()
+        # Перевод сменили в другом процессе: LRU этого процесса о нем не знает
+        local_cache.set_many({key: value for key, (expires, value) in stale.items()})
+
+        response = self.client.get(reverse('catalog:product_list'))
+        self.assertContains(response, 'New name')
+        self.assertNotContains(response, 'Old name')
+
+
+class LanguagePickerTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        make_category()
+
+    def test_links_point_to_the_current_page_in_each_language(self):
+        response = self.client.get('/ru/category/root/?in_stock=1')
+
+        self.assertContains(response, 'href="/category/root/?in_stock=1" hreflang="en"')
+        self.assertContains(response, 'href="/es/category/root/?in_stock=1" hreflang="es"')
+        self.assertContains(response, 'href="/ru/category/root/?in_stock=1" hreflang="ru"')
+        self.assertNotContains(response, 'django_language')
+
+    def test_prefixed_link_switches_the_language(self):
+        self.assertEqual(self.client.get('/es/').wsgi_request.LANGUAGE_CODE, 'es')
+        # Без префикса — язык по умолчанию, cookie не учитывается
+        self.client.cookies['django_language'] = 'ru'
+        self.assertEqual(self.client.get('/').wsgi_request.LANGUAGE_CODE, 'en')
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Storefront and admin pages run a fixed number of queries however many
+    products they list.
+    """
+
+    def setUp(self):
+        cache.clear()
+        category = make_category()
+        for i in range(24):
+            product = Product(category=category, sku=f'BUDGET-{i}', price=Decimal('10'))
+            product.set_current_language('en')
+            product.name = f'Budget gadget {i}'
+            product.slug = f'budget-{i}'
+            product.save()
+
+    def test_product_list(self):
+        with assert_no_repeated_queries():
+            assert_view_budget(self.client, reverse('catalog:product_list'))
+
+    def test_category_detail(self):
+        with assert_no_repeated_queries():
+            assert_view_budget(self.client, reverse('catalog:category_detail', args=['root']))
+
+    def test_product_search(self):
+        with assert_no_repeated_queries():
+            response = assert_view_budget(self.client, reverse('catalog:product_search') + '?q=gadget')
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_changelist_total_stock(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'x'))
+        # ProductAdmin.total_stock читает StockSummary через list_select_related;
+        # тему admin_interface шаблон запрашивает дважды на любой странице
+        with assert_no_repeated_queries(threshold=3):
+            response = assert_view_budget(self.client, reverse('admin:catalog_product_changelist'))
+        self.assertContains(response, 'BUDGET-23')
@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import product_list
+from .views import category_detail, product_list, product_search
 
 app_name = 'catalog'
 
 urlpatterns = [
     path('', product_list, name='product_list'),
-]
\ No newline at end of file
+    path('category/<slug:slug>/', category_detail, name='category_detail'),
+    path('search/', product_search, name='product_search'),
+]
@@ -1,9 +1,110 @@
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.template.response import TemplateResponse
+from django.utils.translation import get_language
+
+from apps.core.cache import cache_anonymous_page, conditional_page
+from apps.core.pagination import KeysetPaginator
+from apps.core.translations import aprefetch_translations
 from .models import Product
+from .search import get_search_backend
+from .services import (
+    CATEGORY_TREE_TAG, PRODUCTS_TAG, STOCK_TAG, aattach_card_versions, find_category, get_subcategory_counts,
+)
+
+PRODUCTS_PER_PAGE = 24
+SEARCH_MAX_PAGES = 50
+# Все, из чего собираются страницы витрины
+STOREFRONT_TAGS = (PRODUCTS_TAG, CATEGORY_TREE_TAG, STOCK_TAG)
+
+
+def _parse_key(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def _storefront_page(request, products):
+    """
+    Keyset page of storefront products plus the shared listing context.
+    """
+    products = products.select_related('stock_summary')
+    in_stock = request.GET.get('in_stock') == '1'
+    if in_stock:
+        products = products.filter(stock_summary__in_stock=True)
+
+    paginator = KeysetPaginator(products, PRODUCTS_PER_PAGE)
+    page = await paginator.apage(
+        after=_parse_key(request.GET.get('after')),
+        before=_parse_key(request.GET.get('before')),
+    )
+    # Переводы страницы — из общего кэша, на холодном кэше одним запросом; карточки кэшируются по версии
+    await aprefetch_translations(page.object_list, local=False)
+    await aattach_card_versions(page.object_list)
+    return {
+        'products': page,
+        'page': page,
+        'total_count': await paginator.acount(),
+        'in_stock': in_stock,
+    }
+
 
-def product_list(request):
+def _find_category_with_counts(slug):
+    category = find_category(slug)
+    return category, get_subcategory_counts(category) if category is not None else {}
+
+
+@conditional_page(*STOREFRONT_TAGS)
+@cache_anonymous_page(*STOREFRONT_TAGS)
+async def product_list(request):
     # Fetching only active products to show on the storefront
-    products = Product.objects.filter(is_active=True).order_by('-id')
-    return render(request, 'catalog/product_list.html', {
-        'products': products
-    })
\ No newline at end of file
+    products = Product.objects.filter(is_active=True)
+    # TemplateResponse: шаблон Django отрендерит в потоке, не блокируя цикл событий
+    return TemplateResponse(request, 'catalog/product_list.html', await _storefront_page(request, products))
+
+
+@conditional_page(*STOREFRONT_TAGS)
+@cache_anonymous_page(*STOREFRONT_TAGS)
+async def category_detail(request, slug):
+    # Дерево и счетчики — из кэша, на промахе один-два запроса; одним переходом в поток
+    category, counts = await sync_to_async(_find_category_with_counts)(slug)
+    if category is None:
+        raise Http404('Category not found')
+
+    # Товары всего поддерева одним JOIN по диапазону lft/rght, без get_descendants() и IN (...)
+    products = Product.objects.filter(is_active=True, **category.subtree_filter())
+    context = await _storefront_page(request, products)
+    context.update({
+        'category': category,
+        'subcategories': [(child, counts.get(child.id, 0)) for child in category.children],
+    })
+    return TemplateResponse(request, 'catalog/category_detail.html', context)
+
+
+@conditional_page(*STOREFRONT_TAGS)
+@cache_anonymous_page(*STOREFRONT_TAGS)
+async def product_search(request):
+    query = request.GET.get('q', '').strip()
+    page_number = min(max(_parse_key(request.GET.get('page')) or 1, 1), SEARCH_MAX_PAGES)
+    products, total = [], 0
+    if query:
+        offset = (page_number - 1) * PRODUCTS_PER_PAGE
+        # Бэкенды поиска выполняют сырой SQL — синхронно, в потоке
+        ids, total = await sync_to_async(get_search_backend().search)(
+            query, get_language(), offset=offset, limit=PRODUCTS_PER_PAGE,
+        )
+        # Порядок задает ранжирование поиска, а не сортировка модели
+        by_id = await Product.objects.select_related('stock_summary').ain_bulk(ids)
+        products = [by_id[pk] for pk in ids if pk in by_id]
+        await aprefetch_translations(products, local=False)
+        await aattach_card_versions(products)
+
+    return TemplateResponse(request, 'catalog/search_results.html', {
+        'query': query,
+        'products': products,
+        'total_count': total,
+        'page_number': page_number,
+        'previous_page': page_number - 1 if page_number > 1 else None,
+        'next_page': page_number + 1 if page_number * PRODUCTS_PER_PAGE < total and page_number < SEARCH_MAX_PAGES else None,
+    })
@@ -1,3 +1,168 @@
+"""
+Admin changelists that stay fast on tables with millions of rows.
+
+ScalableAdminMixin gives a ModelAdmin:
+
+* EstimatedCountPaginator — the planner's row estimate instead of a full
+  COUNT(*) for the unfiltered list, and no second "of N total" count;
+* translations of the visible page — in the changelist and in the
+  autocomplete dropdowns — filled in one batch (``translated_relations``);
+* no facet counts.
+
+AutocompleteFilter replaces related-object filters that would list every
+row of the related table with a select2 search box. PreloadedRawIdWidget
+labels a raw id field from an object the page already loaded.
+"""
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect, ForeignKeyRawIdWidget
+from django.core.paginator import Paginator
+from django.db import connections
+from django.urls import NoReverseMatch, reverse
+from django.utils.functional import cached_property
+from django.utils.text import Truncator
+
+from .translations import prefetch_translations
+
+# Меньше этого — считаем точно, COUNT(*) еще дешев
+ESTIMATE_THRESHOLD = 100_000
+
+
+def estimated_count(model, using):
+    """Row estimate of the model's table from PostgreSQL statistics, None elsewhere."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        row = cursor.fetchone()
+    # -1 — таблица еще ни разу не анализировалась
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for very large tables: an unfiltered queryset is counted from
+    the planner's statistics (exact enough for page links), filtered ones
+    and small tables with COUNT(*). ``on_page`` gets the object list of
+    every page served.
+    """
+
+    def __init__(self, *args, on_page=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_page = on_page
+
+    def _get_page(self, object_list, number, paginator):
+        if self.on_page is not None:
+            object_list = list(object_list)
+            self.on_page(object_list)
+        return super()._get_page(object_list, number, paginator)
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class ScalableChangeList(ChangeList):
+
+    def get_results(self, request):
+        super().get_results(request)
+        # Единственная страница или «показать все» идут мимо пагинатора
+        if not isinstance(self.result_list, list):
+            self.result_list = list(self.result_list)
+            self.model_admin.prefetch_results(self.result_list)
+
+
+class ScalableAdminMixin:
+    """See the module docstring."""
+    paginator = EstimatedCountPaginator
+    # «Показать все (N)» — второй COUNT(*) по всей таблице
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    # Пути к переводимым объектам в строке списка: '' — сама строка, 'product' — stock.product
+    translated_relations = []
+
+    def get_changelist(self, request, **kwargs):
+        return ScalableChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        # Этот же пагинатор берет и autocomplete_view
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page, on_page=self.prefetch_results)
+
+    def prefetch_results(self, rows):
+        for path in self.translated_relations:
+            objects = rows
+            for name in filter(None, path.split('__')):
+                objects = [getattr(obj, name) for obj in objects if obj is not None]
+            prefetch_translations([obj for obj in objects if obj is not None])
+
+    @property
+    def media(self):
+        media = super().media
+        if any(isinstance(spec, (list, tuple)) and spec[1] is AutocompleteFilter for spec in self.list_filter):
+            media += AutocompleteSelect(None, self.admin_site).media
+            media += forms.Media(js=['core/js/autocomplete_filter.js'])
+        return media
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Filter on a foreign key through the admin's autocomplete view. Only the
+    selected object is loaded; the related ModelAdmin needs search_fields.
+
+        list_filter = [('category', AutocompleteFilter)]
+    """
+    template = 'admin/core/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.attname}__exact'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        value = self.used_parameters.get(self.lookup_kwarg)
+        self.value = value[-1] if isinstance(value, list) else value
+        self.admin_site = model_admin.admin_site
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        remote_model = self.field.remote_field.model
+        form_field = forms.ModelChoiceField(
+            queryset=remote_model._default_manager.all(),
+            widget=AutocompleteSelect(self.field, self.admin_site),
+            required=False,
+        )
+        # Выбор в select2 ведет на этот адрес с новым значением (core/js/autocomplete_filter.js)
+        reset_url = changelist.get_query_string(remove=[self.lookup_kwarg])
+        yield {
+            'selected': self.value is not None,
+            'widget': form_field.widget.render(self.lookup_kwarg, self.value, attrs={
+                'id': f'filter_{self.lookup_kwarg}',
+                'data-filter-url': reset_url,
+                'style': 'width: 100%',
+            }),
+        }
+
+
+class PreloadedRawIdWidget(ForeignKeyRawIdWidget):
+    """
+    Raw id widget that takes its label from ``preloaded`` (set per form,
+    e.g. by an inline formset from select_related rows) instead of fetching
+    the related object: one query less per inline row.
+    """
+    preloaded = None
 
-# Register your models here.
+    def label_and_url_for_value(self, value):
+        obj = self.preloaded
+        if obj is None or str(obj.pk) != str(value):
+            return super().label_and_url_for_value(value)
+        try:
+            url = reverse(f'{self.admin_site.name}:{obj._meta.app_label}_{obj._meta.model_name}_change', args=(obj.pk,))
+        except NoReverseMatch:
+            url = ''
+        return Truncator(obj).words(14), url
@@ -4,3 +4,20 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
+
+    def ready(self):
+        from django.apps import apps
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from .db.wrappers import install_dispatcher
+        from .models import BaseTranslatableModel
+        from .translations import translation_changed
+
+        connection_created.connect(install_dispatcher)
+
+        for model in apps.get_models():
+            if issubclass(model, BaseTranslatableModel):
+                for meta in model._parler_meta:
+                    post_save.connect(translation_changed, sender=meta.model)
+                    post_delete.connect(translation_changed, sender=meta.model)
@@ -0,0 +1,337 @@
+import datetime
+import hashlib
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.translation import get_language
+from django.views.decorators.http import condition
+
+from .db.routers import use_primary
+
+
+def _version_key(tag):
+    return f'tag-version:{tag}'
+
+
+def _changed_key(tag):
+    return f'tag-changed:{tag}'
+
+
+def _keys(tags):
+    return [key for tag in tags for key in (_version_key(tag), _changed_key(tag))]
+
+
+def _now():
+    return time.time_ns() // 1000
+
+
+def _tag_state(tags, found):
+    now = _now()
+    # Ключа нет и после add(): кэш ничего не хранит (DummyCache) или успел его вытеснить —
+    # свежая версия дает промах, а не KeyError
+    versions = {tag: found.get(_version_key(tag), now) for tag in tags}
+    changed = {tag: found.get(_changed_key(tag), now) for tag in tags}
+    return versions, changed
+
+
+def get_tag_state(*tags):
+    """
+    ({tag: version}, {tag: changed_at}) in one cache round trip (two for
+    tags seen for the first time).
+
+    A version is a counter bumped by every invalidation, so cache keys that
+    embed it go stale as soon as the tag is invalidated and no key ever has
+    to be deleted explicitly. Counters start from the current microsecond
+    timestamp, so a version evicted from the cache restarts above every
+    value it had. ``changed_at`` is the microsecond timestamp of the last
+    invalidation, for Last-Modified and replica lag checks.
+    """
+    found = cache.get_many(_keys(tags))
+    missing = [tag for tag in tags if _version_key(tag) not in found]
+    if missing:
+        now = _now()
+        for tag in missing:
+            # add(), а не set(): параллельный запрос мог уже записать версию
+            cache.add(_version_key(tag), now, None)
+            cache.add(_changed_key(tag), now, None)
+        found.update(cache.get_many(_keys(missing)))
+    return _tag_state(tags, found)
+
+
+async def aget_tag_state(*tags):
+    """get_tag_state() for async code."""
+    found = await cache.aget_many(_keys(tags))
+    missing = [tag for tag in tags if _version_key(tag) not in found]
+    if missing:
+        now = _now()
+        for tag in missing:
+            await cache.aadd(_version_key(tag), now, None)
+            await cache.aadd(_changed_key(tag), now, None)
+        found.update(await cache.aget_many(_keys(missing)))
+    return _tag_state(tags, found)
+
+
+def get_versions(*tags):
+    """Current version of every tag, {tag: int}; see get_tag_state()."""
+    return get_tag_state(*tags)[0]
+
+
+async def aget_versions(*tags):
+    """get_versions() for async code."""
+    return (await aget_tag_state(*tags))[0]
+
+
+def get_version(tag):
+    return get_versions(tag)[tag]
+
+
+def invalidate(*tags):
+    """
+    Bump the version of the given tags. cache.incr() is atomic on Redis,
+    Memcached and locmem, so concurrent invalidations always end on a
+    version nobody has cached under.
+    """
+    now = _now()
+    for tag in tags:
+        key = _version_key(tag)
+        if cache.add(key, now, None):
+            continue
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Ключ вытеснили между add() и incr()
+            cache.add(key, now, None)
+    cache.set_many({_changed_key(tag): now for tag in tags}, None)
+
+
+class CacheStats:
+    """
+    Hit/miss counters of one cache layer.
+
+    Counted per process and flushed to the shared cache every
+    ``flush_every`` calls, so the ratio over all workers is available too.
+    """
+
+    def __init__(self, namespace, flush_every=100):
+        self.namespace = namespace
+        self.flush_every = flush_every
+        self._counts = Counter()
+        self._unflushed = Counter()
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def count(self, **counts):
+        with self._lock:
+            self._counts.update(counts)
+            self._unflushed.update(counts)
+            self._calls += 1
+            if self._calls < self.flush_every:
+                return
+            pending = {name: value for name, value in self._unflushed.items() if value}
+            self._unflushed.clear()
+            self._calls = 0
+        for name, value in pending.items():
+            key = self._key(name)
+            # incr() падает на отсутствующем ключе
+            if not cache.add(key, value, None):
+                cache.incr(key, value)
+
+    def get(self, names, shared=False):
+        """{name: count} for this process, or summed over all processes."""
+        if shared:
+            found = cache.get_many([self._key(name) for name in names])
+            return {name: found.get(self._key(name), 0) for name in names}
+        with self._lock:
+            return {name: self._counts[name] for name in names}
+
+    def _key(self, name):
+        return f'cache-stats:{self.namespace}:{name}'
+
+
+page_stats = CacheStats('pages')
+
+
+def _load_user(request):
+    # Не request.auser(): шаблоны (контекст-процессор auth) читают request.user, и он должен
+    # быть уже вычислен, иначе сессия прочитается второй раз — уже внутри вьюхи
+    user = request.user
+    user.is_authenticated
+    return user
+
+
+def _page_key(request, tags, versions):
+    digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    version = '.'.join(str(versions[tag]) for tag in tags)
+    return f'page:{get_language()}:{digest}:{version}'
+
+
+def _changed_recently(changed):
+    # Данные только что изменились: реплика может отставать, а страница попадет в кэш надолго
+    return _now() - max(changed.values()) < settings.REPLICA_PIN_SECONDS * 1_000_000
+
+
+def _cached_response(cached):
+    page_stats.count(hits=1)
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Page-Cache'] = 'hit'
+    return response
+
+
+def _is_cacheable(request, response, used_session):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not used_session
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def cache_anonymous_page(*tags, timeout=None):
+    """
+    Cache a whole GET response for anonymous visitors, per language and full
+    URL (query string included). The key embeds the versions of ``tags``,
+    so invalidate(tag) drops every page built from that data at once.
+
+    Responses that depend on the visitor are never stored: anything for
+    logged-in users, pages that used the session or a CSRF token, set
+    cookies, or were rendered with pending flash messages.
+
+    Works for sync and async views; the async variant never blocks the
+    event loop on the cache, the session or template rendering.
+    """
+    def decorator(view):
+        page_timeout = settings.PAGE_CACHE_TIMEOUT if timeout is None else timeout
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or 'messages' in request.COOKIES:
+                    return await view(request, *args, **kwargs)
+                user = await sync_to_async(_load_user)(request)
+                if user.is_authenticated:
+                    return await view(request, *args, **kwargs)
+
+                versions, changed = await aget_tag_state(*tags)
+                key = _page_key(request, tags, versions)
+                cached = await cache.aget(key)
+                if cached is not None:
+                    return _cached_response(cached)
+
+                page_stats.count(misses=1)
+                session = request.session
+                accessed, session.accessed = session.accessed, False
+                with use_primary() if _changed_recently(changed) else nullcontext():
+                    response = await view(request, *args, **kwargs)
+                    if hasattr(response, 'render') and not response.is_rendered:
+                        # Шаблоны могут ходить в БД (меню, ленивые переводы) — рендерим в потоке
+                        response = await sync_to_async(response.render)()
+                used_session, session.accessed = session.accessed, accessed or session.accessed
+                if _is_cacheable(request, response, used_session):
+                    await cache.aset(key, (response.content, response['Content-Type']), page_timeout)
+                    response['X-Page-Cache'] = 'miss'
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated
+                or 'messages' in request.COOKIES
+            ):
+                return view(request, *args, **kwargs)
+
+            versions, changed = get_tag_state(*tags)
+            key = _page_key(request, tags, versions)
+            cached = cache.get(key)
+            if cached is not None:
+                return _cached_response(cached)
+
+            page_stats.count(misses=1)
+            # request.user уже прочитал сессию; отмечаем, трогает ли ее сама вьюха
+            session = request.session
+            accessed, session.accessed = session.accessed, False
+            with use_primary() if _changed_recently(changed) else nullcontext():
+                response = view(request, *args, **kwargs)
+            used_session, session.accessed = session.accessed, accessed or session.accessed
+            if _is_cacheable(request, response, used_session):
+                if hasattr(response, 'render'):
+                    response.render()
+                cache.set(key, (response.content, response['Content-Type']), page_timeout)
+                response['X-Page-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_page(*tags, last_updated=None):
+    """
+    ETag/Last-Modified for views built from tagged data, answering
+    If-None-Match/If-Modified-Since with 304 before the view runs.
+
+    Tags are invalidated right where ``updated_at`` changes, so their
+    versions and change timestamps (get_tag_state()) make the validators
+    for one cache round trip and no query. ``last_updated(request, *args, **kwargs)``
+    may return the ``updated_at`` of the object of a detail view; it is
+    folded into both validators.
+    """
+    def make_validators(request, user, state, updated):
+        versions, changed = state
+        stamp = max(changed.values())
+        if updated is not None:
+            stamp = max(stamp, int(updated.timestamp() * 1_000_000))
+        parts = [get_language(), str(user.pk if user.is_authenticated else 0), str(updated)]
+        parts += [str(versions[tag]) for tag in tags]
+        etag = hashlib.md5(':'.join(parts).encode()).hexdigest()
+        modified = datetime.datetime.fromtimestamp(stamp / 1_000_000, tz=datetime.timezone.utc)
+        request._page_validators = (etag, modified)
+        return request._page_validators
+
+    def validators(request, *args, **kwargs):
+        # condition() зовет etag_func и last_modified_func по отдельности — считаем один раз
+        cached = getattr(request, '_page_validators', None)
+        if cached is not None:
+            return cached
+        updated = last_updated(request, *args, **kwargs) if last_updated is not None else None
+        return make_validators(request, request.user, get_tag_state(*tags), updated)
+
+    def add_cache_control(request, response, user):
+        if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+            # Браузер и CDN хранят ответ, но каждый раз сверяют валидаторы
+            audience = 'private' if user.is_authenticated else 'public'
+            patch_cache_control(response, no_cache=True, **{audience: True})
+        return response
+
+    def decorator(view):
+        conditional = condition(
+            etag_func=lambda request, *args, **kwargs: validators(request, *args, **kwargs)[0],
+            last_modified_func=lambda request, *args, **kwargs: validators(request, *args, **kwargs)[1],
+        )(view)
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # Валидаторы считаем заранее: condition() вызывает их синхронно, прямо в цикле событий
+                user = await sync_to_async(_load_user)(request)
+                updated = None
+                if last_updated is not None:
+                    updated = await sync_to_async(last_updated)(request, *args, **kwargs)
+                make_validators(request, user, await aget_tag_state(*tags), updated)
+                return add_cache_control(request, await conditional(request, *args, **kwargs), user)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return add_cache_control(request, conditional(request, *args, **kwargs), request.user)
+        return wrapper
+    return decorator
@@ -0,0 +1,40 @@
+"""
+PostgreSQL backend with an in-process connection pool.
+
+Django 5.0 has no built-in pooling for psycopg2: with CONN_MAX_AGE=0 every
+request pays for TCP setup and authentication, and persistent connections
+hold one connection per thread even when idle. With this backend Django
+still "closes" the connection at the end of each request, but the
+connection goes back to a per-process pool (apps.core.db.backends.
+postgresql_pool.pool) instead. Configure with DATABASES[alias]['POOL'] =
+{'MAX_SIZE': ..., 'TIMEOUT': ..., 'MAX_IDLE': ..., 'CHECK_AFTER': ...}
+and CONN_MAX_AGE = 0.
+"""
+from django.db.backends.postgresql import base
+
+from .pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL', {}))
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+
+        def connect():
+            connection = super(DatabaseWrapper, self).get_new_connection(conn_params)
+            pool.isolation_level = self.isolation_level
+            return connection
+
+        connection = pool.getconn(connect)
+        # Для соединения из пула get_new_connection() родителя не вызывался
+        self.isolation_level = pool.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection, discard=self.in_atomic_block)
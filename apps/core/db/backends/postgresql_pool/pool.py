@@ -0,0 +1,172 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+from psycopg2 import extensions
+
+from apps.core.cache import CacheStats
+
+logger = logging.getLogger(__name__)
+
+STAT_NAMES = ('checkouts', 'connects', 'waits', 'wait_ms', 'timeouts', 'failed_checks', 'closed')
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pid = os.getpid()
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections for one database alias.
+
+    At most ``max_size`` connections are checked out at once; callers wait
+    up to ``timeout`` seconds for a free slot. Idle connections are closed
+    after ``max_idle`` seconds and pinged before reuse when they have been
+    idle longer than ``check_after`` seconds.
+    """
+
+    def __init__(self, alias, max_size=10, timeout=10.0, max_idle=300.0, check_after=30.0):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.isolation_level = None
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._stats = CacheStats(f'db-pool:{alias}')
+
+    def getconn(self, connect):
+        """
+        Check out a connection; ``connect()`` opens a new one when no idle
+        connection is usable.
+        """
+        if not self._slots.acquire(blocking=False):
+            started = time.monotonic()
+            self._stats.count(waits=1)
+            if not self._slots.acquire(timeout=self.timeout):
+                self._stats.count(timeouts=1)
+                logger.warning('Connection pool exhausted: %s connections busy for %ss', self.max_size, self.timeout)
+                raise PoolTimeout(f'No free database connection within {self.timeout}s (pool size {self.max_size}).')
+            self._stats.count(wait_ms=int((time.monotonic() - started) * 1000))
+
+        try:
+            connection = self._take_idle()
+            if connection is None:
+                connection = connect()
+                self._stats.count(connects=1)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+        self._stats.count(checkouts=1)
+        return connection
+
+    def putconn(self, connection, discard=False):
+        """Return a checked-out connection, closing it if it is broken."""
+        try:
+            if not discard and not connection.closed:
+                try:
+                    # Незавершенная транзакция не должна достаться следующему запросу
+                    if connection.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                        connection.rollback()
+                except Exception:
+                    discard = True
+            if discard or connection.closed:
+                self._close(connection)
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self, shared=False):
+        """
+        Counters of this process (or summed over all processes with
+        ``shared=True``) plus the current number of busy and idle connections
+        in this process.
+        """
+        counts = self._stats.get(STAT_NAMES, shared=shared)
+        with self._lock:
+            return dict(counts, in_use=self._in_use, idle=len(self._idle), max_size=self.max_size)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for connection, returned in idle:
+            self._close(connection)
+
+    def _take_idle(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                # Последнее возвращенное — самое «теплое»
+                connection, returned = self._idle.pop()
+            idle_for = time.monotonic() - returned
+            if connection.closed or idle_for > self.max_idle:
+                self._close(connection)
+                continue
+            if idle_for > self.check_after and not self._ping(connection):
+                self._close(connection)
+                self._stats.count(failed_checks=1)
+                continue
+            return connection
+
+    @staticmethod
+    def _ping(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if connection.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _close(self, connection):
+        self._stats.count(closed=1)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def get_pool(alias, options):
+    """Process-wide pool of ``alias``; a forked worker gets fresh pools."""
+    global _pid
+    with _pools_lock:
+        if os.getpid() != _pid:
+            # Соединения родителя после fork использовать нельзя
+            _pools.clear()
+            _pid = os.getpid()
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(
+                alias,
+                max_size=options.get('MAX_SIZE', 10),
+                timeout=options.get('TIMEOUT', 10.0),
+                max_idle=options.get('MAX_IDLE', 300.0),
+                check_after=options.get('CHECK_AFTER', 30.0),
+            )
+        return pool
+
+
+def get_pool_stats(shared=False):
+    """{alias: stats} of every pool created in this process."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats(shared=shared) for alias, pool in pools.items()}
@@ -0,0 +1,192 @@
+"""
+Primary/replica routing.
+
+Reads of models in settings.REPLICA_APPS (the catalog) made while serving
+a request go to one of settings.DATABASE_REPLICAS; everything else —
+writes, orders, stock, sessions, management commands — stays on
+``default``. Reads fall back to the primary when:
+
+* the code runs inside use_primary() (cart and checkout views);
+* the request is pinned by ReplicaPinningMiddleware: an unsafe method,
+  or a visitor who wrote something less than REPLICA_PIN_SECONDS ago,
+  so they always see their own writes;
+* a transaction is open on the primary;
+* cache_anonymous_page() is about to store a page whose data changed less
+  than REPLICA_PIN_SECONDS ago;
+* every replica lags more than REPLICA_MAX_LAG seconds (PostgreSQL).
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .wrappers import execute_wrapper
+
+logger = logging.getLogger(__name__)
+
+# Записи в эти таблицы не закрепляют посетителя за основной БД
+UNPINNED_TABLES = ('django_session',)
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+_forced = ContextVar('use_primary', default=False)
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+class RequestState:
+    """
+    Routing state of one request, kept by ReplicaPinningMiddleware. Also an
+    execute wrapper noting whether the request wrote anything
+    (router.db_for_write() is consulted for unsaved instances too, so it
+    cannot tell).
+    """
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if (
+            not self.wrote
+            and context['connection'].alias == DEFAULT_DB_ALIAS
+            and sql.lstrip()[:6].upper() in WRITE_STATEMENTS
+        ):
+            self.wrote = not any(table in sql for table in UNPINNED_TABLES)
+        return execute(sql, params, many, context)
+
+
+class use_primary:
+    """
+    Send every read in the block, or in the decorated sync or async view,
+    to the primary.
+    """
+
+    def __enter__(self):
+        self._token = _forced.set(True)
+
+    def __exit__(self, *exc_info):
+        _forced.reset(self._token)
+
+    def __call__(self, func):
+        # Для async-вьюхи контекст должен жить, пока выполняется корутина, а не до ее создания
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def inner(*args, **kwargs):
+                with use_primary():
+                    return await func(*args, **kwargs)
+        else:
+            @wraps(func)
+            def inner(*args, **kwargs):
+                with use_primary():
+                    return func(*args, **kwargs)
+        return inner
+
+
+@contextmanager
+def request_routing(pinned):
+    """Used by ReplicaPinningMiddleware around the view; yields the RequestState."""
+    state = RequestState(pinned)
+    token = _request_state.set(state)
+    try:
+        with execute_wrapper(state):
+            yield state
+    finally:
+        _request_state.reset(token)
+
+
+class ReplicaLag:
+    """
+    Per-process view of replica lag, refreshed every REPLICA_CHECK_INTERVAL
+    seconds. Only PostgreSQL standbys report lag; others count as current.
+    """
+
+    def __init__(self):
+        self._checked = {}
+        self._lagging = set()
+        self._lock = threading.Lock()
+
+    def is_lagging(self, alias):
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG', None)
+        if max_lag is None:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            due = now - self._checked.get(alias, float('-inf')) >= getattr(settings, 'REPLICA_CHECK_INTERVAL', 10)
+            if due:
+                self._checked[alias] = now
+        if due:
+            lag = self.measure(alias)
+            with self._lock:
+                if lag is None or lag > max_lag:
+                    self._lagging.add(alias)
+                    logger.warning('Replica %s skipped: lag %s s (max %s s)', alias, lag, max_lag)
+                else:
+                    self._lagging.discard(alias)
+        return alias in self._lagging
+
+    @staticmethod
+    def measure(alias):
+        """Seconds behind the primary; 0 for non-PostgreSQL, None if unreachable."""
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                # Без активности на основной БД replay_timestamp стареет — считаем такую реплику актуальной
+                cursor.execute(
+                    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+                    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+                )
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            return None
+        return float(lag or 0)
+
+
+replica_lag = ReplicaLag()
+
+
+def _pinned():
+    # Вне запроса (команды, скрипты) читаем с основной БД: mptt и прочие читают прямо во время записи
+    state = _request_state.get()
+    return _forced.get() or state is None or state.pinned
+
+
+class PrimaryReplicaRouter:
+    """
+    DATABASE_ROUTERS entry; see the module docstring for the rules.
+    """
+
+    def _replicas(self):
+        return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if alias in connections.settings]
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in getattr(settings, 'REPLICA_APPS', ()) or _pinned():
+            return DEFAULT_DB_ALIAS
+        # В транзакции читаем то, что в ней же и записали
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in self._replicas() if not replica_lag.is_lagging(alias)]
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной БД, связи между ними допустимы
+        databases = {DEFAULT_DB_ALIAS, *self._replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему на реплики приносит репликация
+        if db in self._replicas():
+            return False
+        return None
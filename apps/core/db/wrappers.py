@@ -0,0 +1,37 @@
+"""
+Execute wrappers bound to the current context instead of a connection.
+
+connection.execute_wrapper() only affects one connection object, but an
+async view runs its queries through sync_to_async in worker threads that
+hold connection objects of their own. Here every connection gets one
+dispatcher (installed on connection_created, see CoreConfig.ready) that
+runs the wrappers registered with execute_wrapper() below; they live in a
+ContextVar, which asgiref copies into those threads.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+_wrappers = ContextVar('execute_wrappers', default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+    for wrapper in reversed(_wrappers.get()):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def install_dispatcher(sender, connection, **kwargs):
+    """connection_created receiver."""
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _dispatch)
+
+
+@contextmanager
+def execute_wrapper(wrapper):
+    """Like connection.execute_wrapper(), for every database and thread of this context."""
+    token = _wrappers.set(_wrappers.get() + (wrapper,))
+    try:
+        yield
+    finally:
+        _wrappers.reset(token)
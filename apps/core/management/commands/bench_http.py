@@ -0,0 +1,123 @@
+import asyncio
+import statistics
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Hold many concurrent keep-alive connections against a running server and report throughput '
+        'and latency. Compare e.g. "gunicorn config.wsgi -w 4" with '
+        '"gunicorn config.asgi -w 4 -k uvicorn.workers.UvicornWorker" on the same URL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='e.g. http://127.0.0.1:8000/')
+        parser.add_argument('--connections', type=int, default=500)
+        parser.add_argument('--duration', type=float, default=30, help='Seconds.')
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='How many of the connections read responses slowly (1 KB per --slow-delay).',
+        )
+        parser.add_argument('--slow-delay', type=float, default=0.1, help='Seconds between 1 KB reads.')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout, seconds.')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Only plain http://host[:port]/path URLs are supported.')
+        self.host = url.hostname
+        self.port = url.port or 80
+        path = url.path or '/'
+        self.request = (
+            f'GET {path}{"?" + url.query if url.query else ""} HTTP/1.1\r\n'
+            f'Host: {url.netloc}\r\nConnection: keep-alive\r\n\r\n'
+        ).encode()
+        self.timeout = options['timeout']
+        self.latencies = []
+        self.statuses = Counter()
+
+        started = time.monotonic()
+        asyncio.run(self._run(options))
+        elapsed = time.monotonic() - started
+        self._report(elapsed)
+
+    async def _run(self, options):
+        deadline = time.monotonic() + options['duration']
+        clients = [
+            self._client(deadline, options['slow_delay'] if number < options['slow_clients'] else None)
+            for number in range(options['connections'])
+        ]
+        await asyncio.gather(*clients)
+
+    async def _client(self, deadline, slow_delay):
+        reader = writer = None
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port), self.timeout,
+                    )
+                writer.write(self.request)
+                await writer.drain()
+                status, keep_alive = await asyncio.wait_for(self._read_response(reader, slow_delay), self.timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as error:
+                self.statuses[type(error).__name__] += 1
+                keep_alive = False
+            else:
+                self.statuses[status] += 1
+                self.latencies.append((time.perf_counter() - started) * 1000)
+            if not keep_alive and writer is not None:
+                # Синхронные воркеры gunicorn закрывают соединение после каждого ответа
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    async def _read_response(self, reader, slow_delay):
+        head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(head[0].split()[1])
+        headers = {}
+        for line in head[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip().lower()
+
+        if headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                await self._read_body(reader, size + 2, slow_delay)
+                if size == 0:
+                    break
+        elif 'content-length' in headers:
+            await self._read_body(reader, int(headers['content-length']), slow_delay)
+        else:
+            # Без длины тело заканчивается закрытием соединения
+            await reader.read()
+            return status, False
+        return status, headers.get('connection') != 'close'
+
+    async def _read_body(self, reader, size, slow_delay):
+        step = 1024 if slow_delay else size
+        while size > 0:
+            chunk = await reader.readexactly(min(step, size))
+            size -= len(chunk)
+            if slow_delay and size:
+                await asyncio.sleep(slow_delay)
+
+    def _report(self, elapsed):
+        done = len(self.latencies)
+        self.stdout.write(f'{done} responses in {elapsed:.1f} s: {done / elapsed:.1f} req/s')
+        self.stdout.write('Statuses: ' + ', '.join(f'{status} x{count}' for status, count in sorted(
+            self.statuses.items(), key=lambda item: str(item[0]),
+        )))
+        if done >= 2:
+            cuts = statistics.quantiles(self.latencies, n=100)
+            self.stdout.write(
+                f'Latency: p50 {cuts[49]:.1f} ms, p95 {cuts[94]:.1f} ms, p99 {cuts[98]:.1f} ms, '
+                f'max {max(self.latencies):.1f} ms'
+            )
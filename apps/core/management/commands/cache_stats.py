@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.core.cache import page_stats
+from apps.core.translations import STAT_NAMES, stats as translation_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Show hit ratios of the page and translation caches and database pool counters, '
+        'summed over all worker processes.'
+    )
+
+    def handle(self, *args, **options):
+        pages = page_stats.get(('hits', 'misses'), shared=True)
+        self._ratio('Pages', pages['hits'], pages['misses'])
+
+        translations = translation_stats.get(STAT_NAMES, shared=True)
+        hits = translations['local_hits'] + translations['shared_hits']
+        self._ratio('Translations', hits, translations['misses'])
+        self.stdout.write(
+            f'  local {translations["local_hits"]}, shared {translations["shared_hits"]}, '
+            f'database queries {translations["queries"]}'
+        )
+
+        for alias in connections:
+            if 'POOL' in connections.settings[alias]:
+                from apps.core.db.backends.postgresql_pool.pool import STAT_NAMES as POOL_STAT_NAMES, get_pool
+                pool = get_pool(alias, connections.settings[alias]['POOL'])
+                counts = pool.stats(shared=True)
+                self.stdout.write(f'Database pool "{alias}": ' + ', '.join(f'{name} {counts[name]}' for name in POOL_STAT_NAMES))
+
+    def _ratio(self, name, hits, misses):
+        total = hits + misses
+        ratio = f'{hits / total:.1%}' if total else 'n/a'
+        self.stdout.write(f'{name}: {hits} hits / {misses} misses ({ratio})')
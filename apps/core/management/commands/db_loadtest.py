@@ -0,0 +1,86 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+from apps.catalog.models import Product
+
+MODES = ('new', 'persistent', 'pool')
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-request latency of new connections, persistent connections and the '
+        'in-process pool on the default PostgreSQL database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent "requests".')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per thread.')
+        parser.add_argument('--pool-size', type=int, default=8)
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+
+    def handle(self, *args, **options):
+        default = connections.settings['default']
+        if connections['default'].vendor != 'postgresql':
+            raise CommandError('The load test needs PostgreSQL as the default database.')
+
+        for mode in options['modes']:
+            alias = self._configure(mode, default, options['pool_size'])
+            timings = self._run(alias, options['threads'], options['requests'])
+            self._report(mode, timings)
+            if mode == 'pool':
+                from apps.core.db.backends.postgresql_pool.pool import get_pool_stats
+                stats = get_pool_stats()[alias]
+                self.stdout.write('  pool: ' + ', '.join(f'{name} {value}' for name, value in stats.items()))
+            connections[alias].close()
+
+    def _configure(self, mode, default, pool_size):
+        alias = f'loadtest_{mode}'
+        settings = dict(default)
+        if mode == 'new':
+            settings['CONN_MAX_AGE'] = 0
+        elif mode == 'persistent':
+            settings.update({'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True})
+        else:
+            settings.update({
+                'ENGINE': 'apps.core.db.backends.postgresql_pool',
+                'CONN_MAX_AGE': 0,
+                'POOL': {**default.get('POOL', {}), 'MAX_SIZE': pool_size},
+            })
+        connections.settings[alias] = settings
+        return alias
+
+    def _run(self, alias, threads, requests):
+        timings = []
+        lock = threading.Lock()
+
+        def worker():
+            local = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                # Как в обработчике запроса: close_old_connections() в начале и в конце
+                request_started.send(sender=self.__class__)
+                list(Product.objects.using(alias).filter(is_active=True).order_by('-id').values_list('id', 'price')[:24])
+                request_finished.send(sender=self.__class__)
+                local.append((time.perf_counter() - started) * 1000)
+            # Соединение потока с постоянным режимом живет до конца потока
+            connections[alias].close()
+            with lock:
+                timings.extend(local)
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for future in [executor.submit(worker) for _ in range(threads)]:
+                future.result()
+        return timings
+
+    def _report(self, mode, timings):
+        cuts = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{mode:<11} {len(timings)} requests: mean {statistics.fmean(timings):.2f} ms, '
+            f'p50 {cuts[49]:.2f} ms, p95 {cuts[94]:.2f} ms, p99 {cuts[98]:.2f} ms'
+        )
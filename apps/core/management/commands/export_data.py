@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from apps.core.export import WRITERS, write_export
+
+EXPORTS = {
+    'products': 'apps.catalog.exports.ProductExport',
+    'stock': 'apps.warehouse.exports.StockExport',
+    'orders': 'apps.orders.exports.OrderExport',
+    'order-items': 'apps.orders.exports.OrderItemExport',
+}
+
+
+class Command(BaseCommand):
+    help = 'Stream a table to CSV, JSON Lines or XLSX with flat memory use (for nightly dumps).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('export', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(WRITERS), default='csv')
+        parser.add_argument('--language', help='Language of translated columns (default: LANGUAGE_CODE).')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout).')
+        parser.add_argument('--chunk-size', type=int, help='Rows fetched per database round trip.')
+
+    def handle(self, *args, **options):
+        export = import_string(EXPORTS[options['export']])(language=options['language'])
+        if options['chunk_size']:
+            export.chunk_size = options['chunk_size']
+
+        if options['output']:
+            with open(options['output'], 'wb') as handle:
+                write_export(export, options['format'], handle)
+            self.stderr.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+        else:
+            write_export(export, options['format'], sys.stdout.buffer)
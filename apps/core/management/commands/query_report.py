@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from apps.core.queries import get_budget, get_view_stats
+
+SORT_KEYS = {
+    'queries': lambda row: row['queries'] / row['requests'],
+    'db_ms': lambda row: row['db_ms'] / row['requests'],
+    'total_db_ms': lambda row: row['db_ms'],
+    'duplicates': lambda row: row['duplicates'] / row['requests'],
+    'over_budget': lambda row: row['over_budget'],
+}
+
+
+def view_names(patterns=None, namespace=None):
+    """Names under which QueryInstrumentationMiddleware counts each URL pattern."""
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            inner = namespace
+            if pattern.namespace:
+                inner = f'{namespace}:{pattern.namespace}' if namespace else pattern.namespace
+            yield from view_names(pattern.url_patterns, inner)
+        elif isinstance(pattern, URLPattern):
+            # Как ResolverMatch.view_name: имя маршрута или путь к функции, если имени нет
+            name = pattern.name or pattern.lookup_str
+            yield f'{namespace}:{name}' if namespace else name
+
+
+class Command(BaseCommand):
+    help = 'List the endpoints with the most queries per request, summed over all worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=SORT_KEYS, default='queries')
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, *args, **options):
+        stats = get_view_stats(sorted(set(view_names())))
+        rows = [dict(row, view=view) for view, row in stats.items() if row['requests']]
+        if not rows:
+            self.stdout.write('No requests recorded yet (is QUERY_INSTRUMENTATION on?).')
+            return
+        rows.sort(key=SORT_KEYS[options['sort']], reverse=True)
+
+        self.stdout.write(
+            f'{"view":<50} {"requests":>9} {"queries/req":>12} {"budget":>7} {"db ms/req":>10} '
+            f'{"dups/req":>9} {"over budget":>12}'
+        )
+        for row in rows[:options['limit']]:
+            requests = row['requests']
+            self.stdout.write(
+                f'{row["view"][:50]:<50} {requests:>9} {row["queries"] / requests:>12.1f} '
+                f'{get_budget(row["view"]):>7} {row["db_ms"] / requests:>10.1f} '
+                f'{row["duplicates"] / requests:>9.1f} {row["over_budget"]:>12}'
+            )
@@ -0,0 +1,102 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .db.routers import request_routing
+from .queries import count_request, get_budget, record_queries
+
+logger = logging.getLogger('apps.core.queries')
+
+PIN_COOKIE = 'db_primary'
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read-your-writes for PrimaryReplicaRouter: a request that writes sets a
+    short-lived cookie, and while it lives the visitor reads from the primary.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Под ASGI не заставляем Django оборачивать цепочку в sync_to_async
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with request_routing(self._is_pinned(request)) as state:
+            response = self.get_response(request)
+        return self._pin(state, response)
+
+    async def __acall__(self, request):
+        with request_routing(self._is_pinned(request)) as state:
+            response = await self.get_response(request)
+        return self._pin(state, response)
+
+    def _is_pinned(self, request):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS') or PIN_COOKIE in request.COOKIES
+
+    def _pin(self, state, response):
+        if state.wrote:
+            # Срок cookie — ожидаемое отставание реплик
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Per-request query count, DB time and repeated fingerprints (see
+    apps.core.queries). Logs likely N+1 patterns with their call sites and
+    requests over their view's budget, adds X-Query-Count/X-Query-Time
+    headers and feeds the per-view totals shown by query_report.
+    Enabled by settings.QUERY_INSTRUMENTATION.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        return self._report(request, response, recorder)
+
+    async def __acall__(self, request):
+        with record_queries() as recorder:
+            response = await self.get_response(request)
+        return self._report(request, response, recorder)
+
+    def _report(self, request, response, recorder):
+        match = request.resolver_match
+        if match is None:
+            return response
+        view_name = match.view_name
+        budget = get_budget(view_name)
+        over_budget = recorder.count > budget
+        for key, count, site in recorder.repeated(settings.QUERY_N_PLUS_ONE_THRESHOLD):
+            logger.warning('N+1 in %s: %s identical queries at %s: %s', view_name, count, site, key[:300])
+        if over_budget:
+            logger.warning(
+                '%s %s: %s queries, budget %s\n%s', view_name, request.path, recorder.count, budget, recorder.summary(),
+            )
+        count_request(view_name, recorder, over_budget)
+        response['X-Query-Count'] = str(recorder.count)
+        response['X-Query-Time'] = f'{recorder.duration * 1000:.1f}ms'
+        return response
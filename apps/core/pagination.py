@@ -0,0 +1,107 @@
+import hashlib
+
+from django.core.cache import cache
+
+
+class KeysetPage:
+    """
+    One page of a keyset (seek) paginated queryset.
+    """
+
+    def __init__(self, object_list, has_next, has_previous, key):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.key = key
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_key(self):
+        """Key to pass as ``after`` to get the next page."""
+        if self.has_next and self.object_list:
+            return getattr(self.object_list[-1], self.key)
+        return None
+
+    @property
+    def previous_key(self):
+        """Key to pass as ``before`` to get the previous page."""
+        if self.has_previous and self.object_list:
+            return getattr(self.object_list[0], self.key)
+        return None
+
+
+class KeysetPaginator:
+    """
+    Seek pagination over a unique, descending key (``-id`` by default).
+
+    Unlike OFFSET pagination, every page is a single indexed range scan,
+    so deep pages cost the same as the first one.
+    """
+
+    def __init__(self, queryset, per_page, key='id', count_timeout=300):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.key = key
+        self.count_timeout = count_timeout
+
+    def page(self, after=None, before=None):
+        queryset = self._page_queryset(after, before)
+        return self._make_page(list(queryset), after, before)
+
+    async def apage(self, after=None, before=None):
+        """page() for async views."""
+        queryset = self._page_queryset(after, before)
+        return self._make_page([obj async for obj in queryset], after, before)
+
+    def _page_queryset(self, after, before):
+        if before is not None:
+            # Идем назад: берем ключи больше текущего по возрастанию и разворачиваем
+            return self.queryset.filter(**{f'{self.key}__gt': before}).order_by(self.key)[:self.per_page + 1]
+        queryset = self.queryset
+        if after is not None:
+            queryset = queryset.filter(**{f'{self.key}__lt': after})
+        return queryset.order_by(f'-{self.key}')[:self.per_page + 1]
+
+    def _make_page(self, rows, after, before):
+        # Пустая страница (курсор устарел или указывает за край) ссылок не дает: строить их не от чего
+        if before is not None:
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            return KeysetPage(rows, has_next=bool(rows), has_previous=has_previous, key=self.key)
+        has_next = len(rows) > self.per_page
+        return KeysetPage(
+            rows[:self.per_page], has_next=has_next, has_previous=after is not None and bool(rows), key=self.key,
+        )
+
+    def _count_key(self):
+        sql = str(self.queryset.order_by().query)
+        return 'keyset-count:' + hashlib.md5(sql.encode()).hexdigest()
+
+    @property
+    def count(self):
+        """
+        Total number of rows, cached for ``count_timeout`` seconds.
+
+        The exact COUNT(*) is only run when the cached value has expired.
+        """
+        cache_key = self._count_key()
+        count = cache.get(cache_key)
+        if count is None:
+            count = self.queryset.order_by().count()
+            cache.set(cache_key, count, self.count_timeout)
+        return count
+
+    async def acount(self):
+        """``count`` for async views."""
+        cache_key = self._count_key()
+        count = await cache.aget(cache_key)
+        if count is None:
+            count = await self.queryset.order_by().acount()
+            await cache.aset(cache_key, count, self.count_timeout)
+        return count
@@ -0,0 +1,151 @@
+"""
+Query instrumentation.
+
+QueryRecorder is an execute wrapper that counts the queries of a block
+of code, their database time and how often each SQL *fingerprint* (the
+statement with literals and IN lists collapsed) repeats. A fingerprint
+seen many times in one request is almost always an N+1: the recorder
+keeps the call site — project code line or template line — of each
+repeated fingerprint, so the log says where the loop is.
+
+Used by QueryInstrumentationMiddleware (per-request stats, logs and
+budgets), apps.core.testing (query budgets in tests) and query_report.
+"""
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .cache import CacheStats
+from .db import wrappers
+from .db.wrappers import execute_wrapper
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTS = re.compile(r'\((?:\s*(?:\?|%s)\s*,)+\s*(?:\?|%s)\s*\)')
+_SPACES = re.compile(r'\s+')
+
+PROJECT_DIR = os.path.join(settings.BASE_DIR, 'apps')
+# Кадры самой инструментации — не место вызова
+_OWN_FILES = {__file__, wrappers.__file__}
+
+STAT_NAMES = ('requests', 'queries', 'db_ms', 'duplicates', 'over_budget')
+# Одна запись на запрос — сбрасываем в общий кэш почаще
+stats = CacheStats('queries', flush_every=10)
+
+
+def fingerprint(sql):
+    """SQL with literals, numbers and IN (...) lists replaced by placeholders."""
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _LISTS.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def call_site():
+    """
+    'file:line' of the innermost project frame, or 'template:line' when the
+    query was triggered while rendering a template.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'render_annotated' and 'self' in frame.f_locals:
+            # Запрос из шаблона: {{ obj.related.name }} внутри {% for %}
+            node = frame.f_locals['self']
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f'{origin.template_name}:{token.lineno}'
+        if code.co_filename.startswith(PROJECT_DIR) and code.co_filename not in _OWN_FILES:
+            return f'{os.path.relpath(code.co_filename, settings.BASE_DIR)}:{frame.f_lineno}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class QueryRecorder:
+    """
+    Execute wrapper collecting count, time and fingerprints of queries.
+    """
+
+    def __init__(self, keep_sql=False, using=None):
+        self.keep_sql = keep_sql
+        self.using = using
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.call_sites = {}
+        self.sql = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.using is not None and context['connection'].alias != self.using:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            key = fingerprint(sql)
+            self.fingerprints[key] += 1
+            # Стек разбираем только для повторов — у разовых запросов он не нужен
+            if self.fingerprints[key] == 2:
+                self.call_sites[key] = call_site()
+            if self.keep_sql:
+                self.sql.append(sql)
+
+    @property
+    def duplicates(self):
+        """Queries beyond the first of each fingerprint."""
+        return sum(count - 1 for count in self.fingerprints.values())
+
+    def repeated(self, threshold):
+        """[(fingerprint, count, call site)] seen at least ``threshold`` times, most frequent first."""
+        return [
+            (key, count, self.call_sites.get(key, 'unknown'))
+            for key, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+    def summary(self, limit=10):
+        lines = [f'{self.count} queries, {self.duration * 1000:.1f} ms']
+        for key, count, site in self.repeated(2)[:limit]:
+            lines.append(f'  {count}x at {site}: {key[:300]}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def record_queries(keep_sql=False, using=None):
+    """
+    Record the queries of the block on ``using`` (default: every database),
+    including those an async block runs in worker threads.
+    """
+    recorder = QueryRecorder(keep_sql=keep_sql, using=using)
+    with execute_wrapper(recorder):
+        yield recorder
+
+
+def get_budget(view_name):
+    """Allowed queries per request of a view: QUERY_BUDGETS or QUERY_BUDGET_DEFAULT."""
+    return settings.QUERY_BUDGETS.get(view_name, settings.QUERY_BUDGET_DEFAULT)
+
+
+def count_request(view_name, recorder, over_budget):
+    stats.count(**{
+        f'{view_name}|requests': 1,
+        f'{view_name}|queries': recorder.count,
+        f'{view_name}|db_ms': round(recorder.duration * 1000),
+        f'{view_name}|duplicates': recorder.duplicates,
+        f'{view_name}|over_budget': int(over_budget),
+    })
+
+
+def get_view_stats(view_names, shared=True):
+    """{view_name: {stat: total}} for STAT_NAMES."""
+    names = [f'{view}|{stat}' for view in view_names for stat in STAT_NAMES]
+    found = stats.get(names, shared=shared)
+    return {view: {stat: found[f'{view}|{stat}'] for stat in STAT_NAMES} for view in view_names}
@@ -0,0 +1,12 @@
+'use strict';
+// AutocompleteFilter: выбор в select2 сразу применяет фильтр списка в админке
+{
+    const $ = django.jQuery;
+    $(document).on('change', 'select.admin-autocomplete[data-filter-url]', function() {
+        const url = new URL(this.dataset.filterUrl, window.location.href);
+        if (this.value) {
+            url.searchParams.set(this.name, this.value);
+        }
+        window.location.href = url.toString();
+    });
+}
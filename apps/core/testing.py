@@ -0,0 +1,55 @@
+"""
+Query budgets for tests.
+
+    from apps.core.testing import assert_max_queries, assert_view_budget
+
+    with assert_max_queries(3):
+        list(Product.objects.select_related('stock_summary')[:10])
+
+    response = assert_view_budget(self.client, '/')  # QUERY_BUDGETS['catalog:product_list']
+
+Failures list the repeated queries with their call sites, so an N+1
+points at the loop that caused it.
+"""
+from contextlib import contextmanager
+
+from django.urls import resolve
+
+from .queries import get_budget, record_queries
+
+
+@contextmanager
+def assert_max_queries(limit, using=None):
+    """Fail if the block runs more than ``limit`` queries."""
+    with record_queries(keep_sql=True, using=using) as recorder:
+        yield recorder
+    if recorder.count > limit:
+        raise AssertionError(f'{recorder.count} queries, expected at most {limit}.\n{recorder.summary()}')
+
+
+@contextmanager
+def assert_no_repeated_queries(threshold=2, using=None):
+    """Fail if any query fingerprint runs ``threshold`` or more times in the block."""
+    with record_queries(using=using) as recorder:
+        yield recorder
+    repeated = recorder.repeated(threshold)
+    if repeated:
+        lines = [f'  {count}x at {site}: {key[:300]}' for key, count, site in repeated]
+        raise AssertionError('Repeated queries (N+1?):\n' + '\n'.join(lines))
+
+
+def assert_view_budget(client, path, method='get', budget=None, **kwargs):
+    """
+    Request ``path`` with a test client and fail if it runs more queries than
+    the view's budget (QUERY_BUDGETS / QUERY_BUDGET_DEFAULT, or ``budget``).
+    Returns the response.
+    """
+    view_name = resolve(path.split('?')[0]).view_name
+    limit = get_budget(view_name) if budget is None else budget
+    with record_queries(keep_sql=True) as recorder:
+        response = getattr(client, method)(path, **kwargs)
+    if recorder.count > limit:
+        raise AssertionError(
+            f'{view_name} ({path}): {recorder.count} queries, budget {limit}.\n{recorder.summary()}'
+        )
+    return response
@@ -1,3 +1,81 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .cache import get_tag_state, get_version, invalidate
+from .pagination import KeysetPaginator
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tag-tests'}}
+DUMMY = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+@override_settings(CACHES=LOCMEM)
+class TagVersionTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidations_in_the_same_microsecond_get_distinct_versions(self):
+        with mock.patch('apps.core.cache._now', return_value=1_000_000):
+            first = get_version('products')
+            invalidate('products')
+            second = get_version('products')
+            invalidate('products')
+            third = get_version('products')
+
+        self.assertEqual(len({first, second, third}), 3)
+        self.assertLess(first, second)
+        self.assertLess(second, third)
+
+    def test_evicted_version_restarts_above_every_previous_value(self):
+        for _ in range(3):
+            invalidate('products')
+        before = get_version('products')
+        cache.delete('tag-version:products')
+
+        self.assertGreater(get_version('products'), before)
+
+    def test_changed_at_follows_the_last_invalidation(self):
+        with mock.patch('apps.core.cache._now', return_value=1_000_000):
+            get_version('products')
+        with mock.patch('apps.core.cache._now', return_value=5_000_000):
+            invalidate('products')
+
+        versions, changed = get_tag_state('products')
+        self.assertEqual(changed, {'products': 5_000_000})
+
+    @override_settings(CACHES=DUMMY)
+    def test_cache_without_storage_gives_a_fresh_version(self):
+        self.assertIsInstance(get_version('products'), int)
+        invalidate('products')
+        versions, changed = get_tag_state('products', 'categories')
+        self.assertEqual(set(versions), {'products', 'categories'})
+
+
+class KeysetPaginatorTests(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        self.ids = [User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com').pk for i in range(5)]
+        self.paginator = KeysetPaginator(User.objects.all(), per_page=2)
+
+    def keys(self, page):
+        return [user.pk for user in page], page.has_previous, page.has_next, page.previous_key, page.next_key
+
+    def test_walks_forward_and_back(self):
+        first = self.paginator.page()
+        second = self.paginator.page(after=first.next_key)
+
+        self.assertEqual(self.keys(first), ([self.ids[4], self.ids[3]], False, True, None, self.ids[3]))
+        self.assertEqual(self.keys(second), ([self.ids[2], self.ids[1]], True, True, self.ids[2], self.ids[1]))
+        self.assertEqual(self.keys(self.paginator.page(before=second.previous_key)), self.keys(first))
+
+    def test_empty_before_page_has_no_cursors(self):
+        page = self.paginator.page(before=self.ids[4])
+
+        self.assertEqual(self.keys(page), ([], False, False, None, None))
+
+    def test_empty_after_page_has_no_cursors(self):
+        self.assertEqual(self.keys(self.paginator.page(after=self.ids[0])), ([], False, False, None, None))
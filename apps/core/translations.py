@@ -0,0 +1,205 @@
+"""
+Batch translation cache for BaseTranslatableModel subclasses.
+
+parler loads translations one object at a time: each missing language in
+``_translations_cache`` costs a cache.get(), and on a cold cache a query
+(plus another one per fallback). prefetch_translations() fills that
+per-object cache for a whole list of objects at once:
+
+1. a small per-process LRU (TRANSLATION_CACHE_SIZE entries, short TTL),
+   skipped with ``local=False``;
+2. the shared cache, with one get_many() — using parler's own keys and
+   value format, so parler keeps it current whenever a translation is
+   saved or deleted through the ORM;
+3. one query for whatever is left, covering every configured language,
+   so fallbacks and ``any_language=True`` never need another query.
+
+Missing translations are cached as parler's fallback marker, so the
+fallback lookup is free too. Code that writes translations in bulk
+(bypassing save()) must call invalidate_translations().
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from parler import appsettings
+from parler.cache import MISSING, get_translation_cache_key
+
+from .cache import CacheStats
+
+LOCAL_CACHE_SIZE = getattr(settings, 'TRANSLATION_CACHE_SIZE', 10000)
+# Локальный LRU не узнает об изменениях в других процессах — поэтому живет недолго
+LOCAL_CACHE_TIMEOUT = getattr(settings, 'TRANSLATION_CACHE_LOCAL_TIMEOUT', 60)
+
+FALLBACK = {'__FALLBACK__': True}
+
+
+class LocalCache:
+    """
+    Thread-safe bounded LRU with per-entry expiry.
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                expires, value = entry
+                if expires < now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, values):
+        expires = time.monotonic() + self.timeout
+        with self._lock:
+            for key, value in values.items():
+                self._data[key] = (expires, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LocalCache(LOCAL_CACHE_SIZE, LOCAL_CACHE_TIMEOUT)
+
+STAT_NAMES = ('local_hits', 'shared_hits', 'misses', 'queries')
+stats = CacheStats('translations')
+
+
+def get_stats(shared=False):
+    """
+    Hit/miss counters: ``local_hits``, ``shared_hits``, ``misses`` (translations
+    read from the database) and ``queries``. Per process, or summed over all
+    processes with ``shared=True``.
+    """
+    return stats.get(STAT_NAMES, shared=shared)
+
+
+def _languages():
+    return [code for code, name in settings.LANGUAGES]
+
+
+def prefetch_translations(objects, local=True):
+    """
+    Fill parler's translation cache of ``objects`` for every configured
+    language. Costs no query when all entries are cached, otherwise one
+    query per translated model.
+
+    Pass ``local=False`` when the result is rendered into a versioned cache
+    entry (storefront cards and pages): the LRU of this process may still
+    hold a translation changed in another process, and it would be stored
+    under the new version for the whole life of that entry.
+    """
+    by_model = defaultdict(list)
+    for obj in objects:
+        if obj.pk is not None and not obj._state.adding:
+            by_model[type(obj)].append(obj)
+
+    for model, instances in by_model.items():
+        for meta in model._parler_meta:
+            _prefetch(meta.model, instances, local)
+
+
+async def aprefetch_translations(objects, local=True):
+    """
+    prefetch_translations() for async views: the whole page is filled in one
+    hop to a worker thread (the local LRU and parler's cache API are sync).
+    """
+    await sync_to_async(prefetch_translations)(objects, local)
+
+
+def _prefetch(translated_model, instances, local=True):
+    languages = _languages()
+    # Один товар может встречаться в списке несколькими экземплярами (например, в строках остатков)
+    wanted = defaultdict(list)
+    for obj in instances:
+        for language in languages:
+            if language not in obj._translations_cache[translated_model]:
+                wanted[get_translation_cache_key(translated_model, obj.pk, language)].append((obj, language))
+    if not wanted:
+        return
+
+    # Общий кэш parler обновляет при каждом сохранении, LRU процесса — нет
+    values = local_cache.get_many(wanted) if local else {}
+    local_hits = len(values)
+    shared_hits = misses = queries = 0
+
+    missing = [key for key in wanted if key not in values]
+    if missing and appsettings.PARLER_ENABLE_CACHING:
+        shared = cache.get_many(missing)
+        shared_hits = len(shared)
+        values.update(shared)
+        local_cache.set_many(shared)
+        missing = [key for key in missing if key not in values]
+
+    if missing:
+        master_ids = {wanted[key][0][0].pk for key in missing}
+        fields = ['id', 'master_id', 'language_code'] + list(translated_model.get_translated_fields())
+        loaded = {}
+        for row in translated_model.objects.filter(master_id__in=master_ids, language_code__in=languages).values(*fields):
+            key = get_translation_cache_key(translated_model, row.pop('master_id'), row.pop('language_code'))
+            if key in wanted:
+                loaded[key] = row
+        for key in missing:
+            loaded.setdefault(key, FALLBACK)
+        queries, misses = 1, len(missing)
+        values.update(loaded)
+        local_cache.set_many(loaded)
+        if appsettings.PARLER_ENABLE_CACHING:
+            cache.set_many(loaded)
+
+    for key, targets in wanted.items():
+        value = values[key]
+        for obj, language in targets:
+            if value.get('__FALLBACK__'):
+                obj._translations_cache[translated_model][language] = MISSING
+                continue
+            translation = translated_model(master=obj, language_code=language, **value)
+            translation._state.adding = False
+            translation._state.db = obj._state.db
+            obj._translations_cache[translated_model][language] = translation
+
+    stats.count(local_hits=local_hits, shared_hits=shared_hits, misses=misses, queries=queries)
+
+
+def invalidate_translations(translated_model, master_ids, languages=None):
+    """
+    Drop cached translations of ``master_ids``, e.g. after bulk_create() or
+    bulk_update() of translation rows.
+    """
+    keys = [
+        get_translation_cache_key(translated_model, master_id, language)
+        for master_id in master_ids
+        for language in languages or _languages()
+    ]
+    local_cache.delete_many(keys)
+    cache.delete_many(keys)
+
+
+def translation_changed(sender, instance, **kwargs):
+    """post_save/post_delete receiver for translation models (see CoreConfig.ready)."""
+    # Общий кэш обновляет сам parler, здесь — только LRU этого процесса
+    local_cache.delete_many([get_translation_cache_key(sender, instance.master_id, instance.language_code)])
@@ -1,20 +1,76 @@
 from django.contrib import admin
+from django.forms.models import BaseInlineFormSet
+from django.utils.translation import gettext_lazy as _
+from apps.core.admin import PreloadedRawIdWidget, ScalableAdminMixin
+from apps.core.export import export_actions
+from apps.core.translations import prefetch_translations
+from .exports import OrderExport
 from .models import Order, OrderItem
 
+
+class OrderItemFormSet(BaseInlineFormSet):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Подписи товаров — из уже загруженных строк, переводы названий — одним запросом
+        products = [form.instance.product for form in self.initial_forms]
+        prefetch_translations(products)
+        for form, product in zip(self.initial_forms, products):
+            form.fields['product'].widget.preloaded = product
+
+
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
+    formset = OrderItemFormSet
     raw_id_fields = ['product'] # Чтобы не грузить выпадающий список из 1000 товаров
     extra = 0
 
+    def get_queryset(self, request):
+        # OrderItem.__str__ выводит SKU товара — без JOIN это запрос на каждую строку
+        return super().get_queryset(request).select_related('product')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'product':
+            kwargs['widget'] = PreloadedRawIdWidget(db_field.remote_field, self.admin_site)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+class TotalCostFilter(admin.SimpleListFilter):
+    title = _('Total cost')
+    parameter_name = 'total'
+    # Границы диапазонов (по индексу на total_cost)
+    RANGES = {
+        'lt100': (None, 100),
+        '100-500': (100, 500),
+        '500-1000': (500, 1000),
+        'gte1000': (1000, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return (
+            ('lt100', _('Under 100')),
+            ('100-500', '100 – 500'),
+            ('500-1000', '500 – 1000'),
+            ('gte1000', _('1000 and more')),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.RANGES:
+            return queryset
+        low, high = self.RANGES[self.value()]
+        if low is not None:
+            queryset = queryset.filter(total_cost__gte=low)
+        if high is not None:
+            queryset = queryset.filter(total_cost__lt=high)
+        return queryset
+
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'status', 'total_cost', 'created_at']
-    list_filter = ['status', 'created_at']
-    search_fields = ['id', 'user__email', 'phone']
+class OrderAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['id', 'user', 'status', 'items_count', 'total_cost', 'created_at']
+    list_filter = ['status', TotalCostFilter, 'created_at']
+    list_select_related = ['user']
+    # Номер заказа — точное совпадение, email и телефон — по началу: без приведения id к тексту
+    search_fields = ['=id', '^user__email', '^phone']
     inlines = [OrderItemInline]
-    readonly_fields = ['total_cost']
-    
-    # total_cost - это свойство, а не поле БД, поэтому его нужно добавить вручную для отображения
-    def total_cost(self, obj):
-        return obj.total_cost
-    total_cost.short_description = 'Total Cost'
\ No newline at end of file
+    # total_cost и items_count хранятся в заказе и пересчитываются при изменении позиций
+    readonly_fields = ['total_cost', 'items_count']
+    actions = export_actions(OrderExport)
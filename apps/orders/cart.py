@@ -0,0 +1,231 @@
+import uuid
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from apps.catalog.models import Product
+from .models import OrderItem
+from .services import add_items, get_cart
+
+CART_SESSION_KEY = 'cart'
+CART_ID_SESSION_KEY = 'cart_id'
+
+
+class BaseCart:
+    """
+    Working cart of one visitor.
+
+    Backends differ only in where the lines live until checkout; at checkout
+    (and, for the database backend, at login) they are written into the
+    user's open Order through apps.orders.services.add_items.
+    """
+
+    def __init__(self, request):
+        self.request = request
+
+    @property
+    def user(self):
+        user = getattr(self.request, 'user', None)
+        return user if user is not None and user.is_authenticated else None
+
+    def add(self, product_id, quantity=1):
+        """Add one product. Returns False if the product is not on sale."""
+        return self.add_many([(product_id, quantity)]) > 0
+
+    def add_many(self, items):
+        """Add (product_id, quantity) pairs. Returns the number of accepted products."""
+        accepted = self._accepted(items)
+        if accepted:
+            lines = self.load()
+            for product_id, quantity in accepted.items():
+                lines[product_id] = lines.get(product_id, 0) + quantity
+            self.store(lines)
+        return len(accepted)
+
+    def _accepted(self, items):
+        """{product_id: quantity} of the products in ``items`` that are on sale."""
+        quantities = Counter()
+        for product_id, quantity in items:
+            if quantity > 0:
+                quantities[int(product_id)] += int(quantity)
+        active = Product.objects.filter(pk__in=quantities, is_active=True).values_list('pk', flat=True)
+        return {product_id: quantities[product_id] for product_id in active}
+
+    async def aadd(self, product_id, quantity=1):
+        """
+        add() for async views. Session, cache and ORM work of a cart change
+        runs in one hop to a worker thread, where the lazy session and
+        request.user are safe to touch.
+        """
+        return await sync_to_async(self.add)(product_id, quantity)
+
+    async def aadd_many(self, items):
+        """add_many() for async views."""
+        return await sync_to_async(self.add_many)(items)
+
+    def items(self):
+        """{product_id: quantity}"""
+        return self.load()
+
+    def clear(self):
+        self.store({})
+
+    def merge(self, user):
+        """Called right after the visitor logs in."""
+
+    def checkout(self, user):
+        """Write the cart into the user's open Order and empty it."""
+        order = get_cart(user)
+        add_items(order, self.items().items())
+        self.clear()
+        return order
+
+    def load(self):
+        raise NotImplementedError
+
+    def store(self, lines):
+        raise NotImplementedError
+
+
+class SessionCart(BaseCart):
+    """
+    Lines live in request.session until checkout.
+    Writes go wherever SESSION_ENGINE keeps sessions.
+
+    Django saves the whole session at the end of each request, so when one
+    visitor's requests overlap (double clicks, several tabs) the last one
+    to finish wins and the other's additions are lost. Use CacheCart or
+    DatabaseCart where that matters; both add line by line.
+    """
+
+    def load(self):
+        return {int(pk): qty for pk, qty in self.request.session.get(CART_SESSION_KEY, {}).items()}
+
+    def store(self, lines):
+        # Ключи JSON-сессии — строки
+        self.request.session[CART_SESSION_KEY] = {str(pk): qty for pk, qty in lines.items()}
+
+
+class CacheCart(BaseCart):
+    """
+    Lines live in a cache (settings.CART_CACHE_ALIAS), keyed by the user
+    or by a random cart id kept in the session, so browsing never touches
+    the database. Needs a shared cache backend when there are several
+    worker processes.
+
+    Every line is its own counter, bumped with cache.incr(), so concurrent
+    additions to one cart are all counted. The product ids of a cart are
+    listed in numbered slots (``<cart>:slot:<n>``, ``<cart>:n`` holds the
+    last number), written once per new line.
+    """
+
+    @property
+    def cache(self):
+        return caches[settings.CART_CACHE_ALIAS]
+
+    def _session_key(self):
+        cart_id = self.request.session.get(CART_ID_SESSION_KEY)
+        if cart_id is None:
+            cart_id = self.request.session[CART_ID_SESSION_KEY] = uuid.uuid4().hex
+        return f'cart:anon:{cart_id}'
+
+    def _key(self):
+        if self.user is not None:
+            return f'cart:user:{self.user.pk}'
+        return self._session_key()
+
+    def add_many(self, items):
+        accepted = self._accepted(items)
+        self._add_lines(self._key(), accepted)
+        return len(accepted)
+
+    def load(self):
+        return self._load(self._key())
+
+    def store(self, lines):
+        key = self._key()
+        self._clear(key)
+        self._add_lines(key, lines)
+
+    def clear(self):
+        self._clear(self._key())
+
+    def merge(self, user):
+        # Корзина, собранная до входа, добавляется к корзине пользователя
+        anonymous_key = self._session_key()
+        lines = self._load(anonymous_key)
+        if lines:
+            self._add_lines(f'cart:user:{user.pk}', lines)
+            self._clear(anonymous_key)
+
+    def _add_lines(self, key, lines):
+        timeout = settings.CART_CACHE_TIMEOUT
+        for product_id, quantity in lines.items():
+            line_key = f'{key}:{product_id}'
+            if self.cache.add(line_key, quantity, timeout):
+                # Новая строка: занимаем следующий слот списка товаров
+                self.cache.add(f'{key}:n', 0, timeout)
+                self.cache.set(f'{key}:slot:{self.cache.incr(f"{key}:n")}', product_id, timeout)
+                continue
+            try:
+                self.cache.incr(line_key, quantity)
+            except ValueError:
+                # Строка истекла между add() и incr()
+                self.cache.set(line_key, quantity, timeout)
+
+    def _slot_keys(self, key):
+        return [f'{key}:slot:{n}' for n in range(1, (self.cache.get(f'{key}:n') or 0) + 1)]
+
+    def _load(self, key):
+        product_ids = set(self.cache.get_many(self._slot_keys(key)).values())
+        quantities = self.cache.get_many([f'{key}:{product_id}' for product_id in product_ids])
+        return {
+            product_id: quantities[f'{key}:{product_id}']
+            for product_id in product_ids if quantities.get(f'{key}:{product_id}')
+        }
+
+    def _clear(self, key):
+        slot_keys = self._slot_keys(key)
+        product_ids = self.cache.get_many(slot_keys).values()
+        self.cache.delete_many(slot_keys + [f'{key}:{product_id}' for product_id in product_ids] + [f'{key}:n'])
+
+
+class DatabaseCart(SessionCart):
+    """
+    Lines of logged-in users are written straight into their open Order.
+    Anonymous visitors keep lines in the session until they log in.
+    """
+
+    def add_many(self, items):
+        if self.user is None:
+            return super().add_many(items)
+        return add_items(get_cart(self.user), items)
+
+    def items(self):
+        if self.user is None:
+            return super().items()
+        return dict(get_cart(self.user).items.values_list('product_id', 'quantity'))
+
+    def clear(self):
+        if self.user is None:
+            super().clear()
+        else:
+            OrderItem.objects.filter(order__user=self.user, order__status='new').delete()
+
+    def merge(self, user):
+        lines = super().items()
+        if lines:
+            add_items(get_cart(user), lines.items())
+            super().clear()
+
+    def checkout(self, user):
+        self.merge(user)
+        return get_cart(user)
+
+
+def get_request_cart(request):
+    """Cart of the current visitor, using settings.CART_BACKEND."""
+    return import_string(settings.CART_BACKEND)(request)
@@ -0,0 +1,20 @@
+from apps.core.export import Export
+from .models import Order, OrderItem
+
+
+class OrderExport(Export):
+    model = Order
+    name = 'orders'
+    fields = [
+        'id', 'user__email', 'status', 'first_name', 'last_name', 'email', 'phone',
+        'address', 'total_cost', 'items_count', 'created_at', 'updated_at',
+    ]
+
+
+class OrderItemExport(Export):
+    model = OrderItem
+    name = 'order-items'
+    fields = ['id', 'order_id', 'order__status', 'product_id', 'product__sku', 'price', 'quantity']
+    translated_fields = {
+        'product_name': ('product__translations', 'name'),
+    }
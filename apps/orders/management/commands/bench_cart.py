@@ -0,0 +1,84 @@
+import random
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils.module_loading import import_string
+
+from apps.catalog.models import Product
+from apps.orders.models import Order
+
+BACKENDS = [
+    'apps.orders.cart.DatabaseCart',
+    'apps.orders.cart.SessionCart',
+    'apps.orders.cart.CacheCart',
+]
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    help = 'Compare cart backends: queries, database writes and time per "add to cart" click.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clicks', type=int, default=500)
+        parser.add_argument('--products', type=int, default=20, help='Distinct products to click on.')
+        parser.add_argument('--backend', action='append', dest='backends', help='Dotted path, may be repeated.')
+
+    def handle(self, *args, **options):
+        product_ids = list(Product.objects.filter(is_active=True).values_list('pk', flat=True)[:options['products']])
+        if not product_ids:
+            raise CommandError('Need at least one active product.')
+        tag = uuid.uuid4().hex[:8]
+        user = get_user_model().objects.create_user(email=f'bench-{tag}@example.com', username=f'bench-{tag}')
+        clicks = [random.choice(product_ids) for _ in range(options['clicks'])]
+
+        self.stdout.write(f'{"backend":<34}{"queries/click":>14}{"writes/click":>14}{"ms/click":>10}{"checkout writes":>17}')
+        try:
+            for path in options['backends'] or BACKENDS:
+                self._run(import_string(path), path, user, clicks)
+        finally:
+            Order.objects.filter(user=user).delete()
+            user.delete()
+
+    def _run(self, backend, path, user, clicks):
+        factory = RequestFactory()
+        session_key = None
+
+        def request(view):
+            # Прогоняем через SessionMiddleware, чтобы запись сессии тоже попала в замер
+            req = factory.get('/')
+            req.user = user
+            req.COOKIES['sessionid'] = session_key or ''
+            middleware = SessionMiddleware(lambda r: view(r) or HttpResponse())
+            middleware.process_request(req)
+            response = middleware(req)
+            return response.cookies['sessionid'].value if 'sessionid' in response.cookies else session_key
+
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            for product_id in clicks:
+                session_key = request(lambda r, pk=product_id: backend(r).add(pk) and None)
+        elapsed = time.perf_counter() - started
+
+        with CaptureQueriesContext(connection) as checkout_ctx:
+            session_key = request(lambda r: backend(r).checkout(user) and None)
+        Order.objects.filter(user=user).delete()
+
+        n = len(clicks)
+        self.stdout.write(
+            f'{path.rsplit(".", 1)[-1]:<34}'
+            f'{len(ctx.captured_queries) / n:>14.2f}'
+            f'{self._writes(ctx) / n:>14.2f}'
+            f'{elapsed * 1000 / n:>10.2f}'
+            f'{self._writes(checkout_ctx):>17}'
+        )
+
+    @staticmethod
+    def _writes(ctx):
+        return sum(1 for q in ctx.captured_queries if q['sql'].lstrip().upper().startswith(WRITE_PREFIXES))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Find orders whose stored totals drifted from their items and optionally fix them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Recalculate drifted orders.')
+
+    def handle(self, *args, **options):
+        drifted = Order.objects.drifted()
+        sample = list(drifted.values_list('pk', 'total_cost', 'actual_total_cost', 'items_count', 'actual_items_count')[:20])
+        count = drifted.count()
+
+        self.stdout.write(f'Drifted orders: {count}')
+        for pk, total, actual_total, items, actual_items in sample:
+            self.stdout.write(f'  #{pk}: total {total} -> {actual_total}, items {items} -> {actual_items}')
+
+        if count and options['fix']:
+            fixed = Order.objects.filter(pk__in=drifted.values('pk')).recalculate_totals()
+            self.stdout.write(self.style.SUCCESS(f'Recalculated {fixed} orders.'))
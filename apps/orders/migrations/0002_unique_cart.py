@@ -0,0 +1,52 @@
+# Generated by Django 5.0.1 on 2026-10-18 20:18
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicates(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    # Несколько открытых корзин у пользователя: переносим позиции в самую новую
+    duplicated_users = (
+        Order.objects.filter(status='new').values('user_id').annotate(n=Count('id')).filter(n__gt=1)
+    )
+    for row in duplicated_users:
+        orders = list(Order.objects.filter(user_id=row['user_id'], status='new').order_by('-id'))
+        keep, others = orders[0], orders[1:]
+        OrderItem.objects.filter(order__in=others).update(order=keep)
+        Order.objects.filter(pk__in=[o.pk for o in others]).update(status='canceled')
+
+    # Один товар несколькими строками в заказе: складываем количество в первую строку
+    duplicated_items = (
+        OrderItem.objects.values('order_id', 'product_id').annotate(n=Count('id')).filter(n__gt=1)
+    )
+    for row in duplicated_items:
+        items = list(OrderItem.objects.filter(order_id=row['order_id'], product_id=row['product_id']).order_by('id'))
+        first = items[0]
+        first.quantity = sum(item.quantity for item in items)
+        first.save(update_fields=['quantity'])
+        OrderItem.objects.filter(pk__in=[item.pk for item in items[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('orders', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'new')), fields=('user',), name='unique_open_order_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('order', 'product'), name='unique_order_product'),
+        ),
+    ]
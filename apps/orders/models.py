@@ -1,9 +1,49 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from apps.catalog.models import Product
 from apps.core.models import BaseModel
 
+# Поля, которые считаются из позиций заказа и пишутся только через recalculate_totals()
+TOTAL_FIELDS = ('total_cost', 'items_count')
+
+
+def _actual_totals():
+    """Subqueries computing an order's total and item count from its items."""
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    line_cost = ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2))
+    return {
+        'total_cost': Coalesce(
+            Subquery(items.annotate(total=Sum(line_cost)).values('total')),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        'items_count': Coalesce(Subquery(items.annotate(count=Sum('quantity')).values('count')), 0),
+    }
+
+
+class OrderQuerySet(models.QuerySet):
+
+    def with_actual_totals(self):
+        """Annotate actual_total_cost / actual_items_count computed from the items."""
+        return self.annotate(**{f'actual_{name}': expression for name, expression in _actual_totals().items()})
+
+    def drifted(self):
+        """Orders whose stored totals differ from their items."""
+        return self.with_actual_totals().exclude(
+            total_cost=F('actual_total_cost'), items_count=F('actual_items_count')
+        )
+
+    def recalculate_totals(self):
+        """Recompute stored totals with one UPDATE over the matched orders."""
+        return self.update(updated_at=timezone.now(), **_actual_totals())
+
+
 class Order(BaseModel):
     """
     Заказ пользователя.
@@ -27,18 +67,35 @@ class Order(BaseModel):
     address = models.TextField(verbose_name=_('Delivery Address'))
     
     note = models.TextField(blank=True, verbose_name=_('Note'))
+
+    # Денормализованные итоги, чтобы список заказов не ходил за позициями
+    total_cost = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False, db_index=True, verbose_name=_('Total cost')
+    )
+    items_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Items count'))
+
+    objects = OrderQuerySet.as_manager()
     
     class Meta:
         verbose_name = _('Order')
         verbose_name_plural = _('Orders')
         ordering = ['-created_at']
+        constraints = [
+            # Корзина — это заказ в статусе 'new', у пользователя она может быть только одна
+            models.UniqueConstraint(fields=['user'], condition=models.Q(status='new'), name='unique_open_order_per_user'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.user}"
 
-    @property
-    def total_cost(self):
-        return sum(item.total_cost for item in self.items.all())
+    def save(self, *args, **kwargs):
+        # Итоги пересчитываются в БД; сохранение загруженного заказа не должно затирать их старыми значениями
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in TOTAL_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
 class OrderItem(models.Model):
     """
@@ -54,6 +111,9 @@ class OrderItem(models.Model):
     class Meta:
         verbose_name = _('Order Item')
         verbose_name_plural = _('Order Items')
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'product'], name='unique_order_product'),
+        ]
 
     def __str__(self):
         return f"{self.quantity}x {self.product.sku}"
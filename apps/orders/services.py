@@ -0,0 +1,100 @@
+from collections import Counter
+
+from django.db import connection
+from django.db.models import F
+
+from apps.catalog.models import Product
+from .models import Order, OrderItem
+
+
+def get_cart(user):
+    """
+    Return the user's open order ('new'), creating it if needed.
+
+    The partial unique constraint on (user) WHERE status = 'new' makes
+    get_or_create race-free: a parallel insert fails and the winner's row
+    is returned instead.
+    """
+    order, _ = Order.objects.get_or_create(
+        user=user,
+        status='new',
+        defaults={
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'email': user.email,
+            'phone': '',
+        },
+    )
+    return order
+
+
+def add_items(order, items):
+    """
+    Add (product_id, quantity) pairs to the order in a single upsert statement.
+
+    New lines copy the current catalog price, existing lines get their
+    quantity incremented in SQL, so double clicks and parallel tabs never
+    lose an increment. Inactive or unknown products are skipped. The
+    order's stored totals are recalculated in a second statement.
+    Returns the number of order lines inserted or updated.
+    """
+    quantities = Counter()
+    for product_id, quantity in items:
+        if quantity > 0:
+            quantities[int(product_id)] += int(quantity)
+    if not quantities:
+        return 0
+
+    if not connection.features.supports_update_conflicts_with_target:
+        affected = _add_items_fallback(order, quantities)
+        Order.objects.filter(pk=order.pk).recalculate_totals()
+        return affected
+
+    qn = connection.ops.quote_name
+    item_table = qn(OrderItem._meta.db_table)
+    product_table = qn(Product._meta.db_table)
+    order_col, product_col, price_col, quantity_col = (
+        qn(OrderItem._meta.get_field(name).column) for name in ('order', 'product', 'price', 'quantity')
+    )
+    product_id_col, product_price_col, product_active_col = (
+        qn(Product._meta.get_field(name).column) for name in ('id', 'price', 'is_active')
+    )
+    cases = ' '.join(['WHEN %s THEN %s'] * len(quantities))
+    placeholders = ', '.join(['%s'] * len(quantities))
+
+    sql = (
+        f'INSERT INTO {item_table} ({order_col}, {product_col}, {price_col}, {quantity_col}) '
+        f'SELECT %s, p.{product_id_col}, p.{product_price_col}, CASE p.{product_id_col} {cases} END '
+        f'FROM {product_table} p '
+        f'WHERE p.{product_id_col} IN ({placeholders}) AND p.{product_active_col} '
+        f'ON CONFLICT ({order_col}, {product_col}) '
+        f'DO UPDATE SET {quantity_col} = {item_table}.{quantity_col} + excluded.{quantity_col}'
+    )
+    params = [order.pk]
+    for product_id, quantity in quantities.items():
+        params += [product_id, quantity]
+    params += list(quantities)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        affected = cursor.rowcount
+    # Сырой SQL мимо сигналов, поэтому итоги заказа пересчитываем сами
+    if affected:
+        Order.objects.filter(pk=order.pk).recalculate_totals()
+    return affected
+
+
+def _add_items_fallback(order, quantities):
+    # Для БД без ON CONFLICT: инкремент через F(), затем вставка недостающих строк
+    affected = 0
+    for product_id, quantity in quantities.items():
+        updated = OrderItem.objects.filter(order=order, product_id=product_id).update(
+            quantity=F('quantity') + quantity
+        )
+        if not updated:
+            product = Product.objects.filter(pk=product_id, is_active=True).only('price').first()
+            if product is None:
+                continue
+            OrderItem.objects.create(order=order, product=product, price=product.price, quantity=quantity)
+        affected += 1
+    return affected
@@ -1,3 +1,153 @@
-from django.test import TestCase
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache import caches
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from apps.catalog.models import Category, Product
+from apps.core.testing import assert_no_repeated_queries, assert_view_budget
+from .cart import CacheCart
+from .models import Order
+from .services import add_items, get_cart
+
+CART_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cart-tests'}}
+
+
+def make_product(sku):
+    category = Category.objects.first()
+    if category is None:
+        category = Category(is_active=True)
+        category.set_current_language('en')
+        category.name = 'Root'
+        category.slug = 'root'
+        category.save()
+    product = Product(category=category, sku=sku, price=Decimal('10.00'))
+    product.set_current_language('en')
+    product.name = f'Product {sku}'
+    product.slug = sku.lower()
+    product.save()
+    return product
+
+
+def cart_request(user=None):
+    request = RequestFactory().post('/')
+    request.session = SessionStore()
+    if user is not None:
+        request.user = user
+    return request
+
+
+@override_settings(CACHES=CART_CACHES, CART_BACKEND='apps.orders.cart.CacheCart')
+class CacheCartTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.product = make_product('CART-1')
+        self.user = get_user_model().objects.create_user(username='cart', password='x')
+
+    def test_merge_adds_the_anonymous_cart_to_the_users(self):
+        other = make_product('CART-2')
+        request = cart_request()
+        CacheCart(request).add_many([(self.product.pk, 2), (other.pk, 1)])
+        CacheCart(cart_request(self.user)).add(self.product.pk, 3)
+
+        request.user = self.user
+        CacheCart(request).merge(self.user)
+
+        self.assertEqual(CacheCart(cart_request(self.user)).items(), {self.product.pk: 5, other.pk: 1})
+        request.user = None
+        self.assertEqual(CacheCart(request).items(), {})
+
+    def test_clear_empties_the_cart(self):
+        cart = CacheCart(cart_request(self.user))
+        cart.add(self.product.pk)
+        cart.clear()
+        cart.add(self.product.pk, 2)
+
+        self.assertEqual(cart.items(), {self.product.pk: 2})
+
+    def test_add_to_cart_accepts_only_post(self):
+        url = reverse('orders:add_to_cart', args=[self.product.pk])
+
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertRedirects(self.client.post(url), reverse('catalog:product_list'), fetch_redirect_response=False)
+        request = cart_request()
+        request.session = self.client.session
+        self.assertEqual(CacheCart(request).items(), {self.product.pk: 1})
+
+
+@override_settings(CACHES=CART_CACHES, CART_BACKEND='apps.orders.cart.CacheCart')
+class CacheCartRaceTests(TransactionTestCase):
+
+    def test_concurrent_adds_are_all_counted(self):
+        caches['default'].clear()
+        first, second = make_product('RACE-1'), make_product('RACE-2')
+        user = get_user_model().objects.create_user(username='race', password='x')
+
+        def click(n):
+            try:
+                CacheCart(cart_request(user)).add(first.pk if n % 2 else second.pk)
+            finally:
+                connection.close()
+
+        get = LocMemCache.get
+
+        def slow_get(cache, *args, **kwargs):
+            # Задержка ответа общего кэша: окно, в котором параллельные клики пересекаются
+            value = get(cache, *args, **kwargs)
+            time.sleep(0.005)
+            return value
+
+        with mock.patch.object(LocMemCache, 'get', slow_get), ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(click, range(40)))
+
+        self.assertEqual(CacheCart(cart_request(user)).items(), {first.pk: 20, second.pk: 20})
+
+
+class AddItemsTests(TestCase):
+
+    def test_upsert_increments_lines_and_skips_inactive_products(self):
+        product, hidden = make_product('ADD-1'), make_product('ADD-2')
+        Product.objects.filter(pk=hidden.pk).update(is_active=False)
+        order = get_cart(get_user_model().objects.create_user(username='add', password='x'))
+
+        self.assertEqual(add_items(order, [(product.pk, 2), (hidden.pk, 1)]), 1)
+        add_items(order, [(product.pk, 3)])
+
+        self.assertEqual(dict(order.items.values_list('product_id', 'quantity')), {product.pk: 5})
+        self.assertEqual(order.items.get().price, product.price)
+
+
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(self.admin)
+        self.products = [make_product(f'BUDGET-{i}') for i in range(10)]
+
+    def test_order_changelist_reads_stored_totals(self):
+        for i in range(15):
+            user = get_user_model().objects.create_user(username=f'buyer{i}', email=f'buyer{i}@example.com', password='x')
+            add_items(get_cart(user), [(product.pk, i + 1) for product in self.products[:3]])
+
+        # Order.total_cost хранится в заказе: позиции на каждую строку списка не читаются
+        with assert_no_repeated_queries(threshold=3):
+            response = assert_view_budget(self.client, reverse('admin:orders_order_changelist'))
+        self.assertContains(response, '450.00')
+
+    def test_order_change_page_with_many_items(self):
+        order = get_cart(self.admin)
+        add_items(order, [(product.pk, 1) for product in self.products])
+
+        # Подпись товара в raw id поле и OrderItem.__str__ — из строк инлайна, без запроса на строку
+        with assert_no_repeated_queries(threshold=3):
+            response = assert_view_budget(self.client, reverse('admin:orders_order_change', args=[order.pk]))
+        self.assertContains(response, 'Product BUDGET-9')
+        self.assertEqual(Order.objects.get(pk=order.pk).total_cost, Decimal('100.00'))
@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import add_to_cart
+from .views import add_to_cart, checkout, reorder
 
 app_name = 'orders'
 
 urlpatterns = [
     path('add/<int:product_id>/', add_to_cart, name='add_to_cart'),
-]
\ No newline at end of file
+    path('reorder/<int:order_id>/', reorder, name='reorder'),
+    path('checkout/', checkout, name='checkout'),
+]
@@ -1,38 +1,53 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from apps.catalog.models import Product
-from .models import Order, OrderItem
+from django.http import Http404
+from django.shortcuts import redirect
+from django.utils.translation import gettext as _
+from django.views.decorators.http import require_POST
 
+from apps.core.db.routers import use_primary
+from apps.warehouse.services import InsufficientStock, ReservationConflict, checkout_order
+from .cart import get_request_cart
+from .models import OrderItem
+
+
+@require_POST
+@use_primary()
+async def add_to_cart(request, product_id):
+    # Куда пишется корзина (заказ в БД, сессия или кэш) — решает settings.CART_BACKEND
+    if not await get_request_cart(request).aadd(product_id):
+        raise Http404('Product not found')
+
+    # Возвращаем пользователя обратно на витрину
+    return redirect('catalog:product_list')
+
+
+# login_required в Django 5.0 не умеет async — reorder и checkout остаются синхронными
 @login_required
-def add_to_cart(request, product_id):
-    # 1. Ищем товар
-    product = get_object_or_404(Product, id=product_id)
-    
-    # 2. Ищем или создаем черновик заказа для текущего пользователя
-    # Мы используем get_or_create: если есть заказ со статусом 'new', берем его.
-    # Если нет — создаем новый.
-    order, created = Order.objects.get_or_create(
-        user=request.user, 
-        status='new',
-        defaults={
-            'first_name': request.user.first_name,
-            'last_name': request.user.last_name,
-            'email': request.user.email,
-            'phone': ''
-        }
+@require_POST
+@use_primary()
+def reorder(request, order_id):
+    # Кнопка "Повторить заказ": вся корзина из прошлого заказа добавляется разом
+    items = list(
+        OrderItem.objects.filter(order_id=order_id, order__user=request.user).values_list('product_id', 'quantity')
     )
-    
-    # 3. Ищем, есть ли уже этот товар в заказе
-    item, created = OrderItem.objects.get_or_create(
-        order=order, 
-        product=product,
-        defaults={'price': product.price} # Если создаем, берем текущую цену
-    )
-    
-    # 4. Если товар уже был, просто увеличиваем количество
-    if not created:
-        item.quantity += 1
-        item.save()
-        
-    # 5. Возвращаем пользователя обратно на витрину
-    return redirect('catalog:home')
\ No newline at end of file
+    if not items:
+        raise Http404('Order not found')
+    get_request_cart(request).add_many(items)
+    return redirect('catalog:product_list')
+
+
+@login_required
+@require_POST
+@use_primary()
+def checkout(request):
+    # Только здесь корзина из сессии/кэша превращается в строки заказа
+    order = get_request_cart(request).checkout(request.user)
+    # Товар держится за заказом STOCK_RESERVATION_TTL секунд, пока его не подтвердят или не оплатят
+    try:
+        checkout_order(order)
+    except InsufficientStock:
+        messages.error(request, _('Some items in your cart are no longer in stock.'))
+    except ReservationConflict:
+        messages.error(request, _('Stock is changing quickly right now, please try again.'))
+    return redirect('catalog:product_list')
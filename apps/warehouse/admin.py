@@ -1,5 +1,13 @@
-from django.contrib import admin
-from .models import Warehouse, Stock
+from django import forms
+from django.contrib import admin, messages
+from django.http import HttpResponseRedirect
+from django.utils.translation import gettext_lazy as _
+from apps.catalog.admin import ProductIndexSearchMixin
+from apps.core.admin import AutocompleteFilter, ScalableAdminMixin
+from apps.core.export import export_actions
+from .exports import StockExport
+from .ledger import NegativeStock, post_movements
+from .models import AVAILABLE, LowStockAlert, Warehouse, Stock, StockMovement, Reservation
 
 class StockInline(admin.TabularInline):
     """
@@ -8,6 +16,8 @@ class StockInline(admin.TabularInline):
     model = Stock
     extra = 1 # Одна пустая строка для добавления
     autocomplete_fields = ['product'] # Чтобы искать товар, а не листать список
+    # Остатки меняются только движениями журнала (StockMovementAdmin)
+    readonly_fields = ['quantity', 'reserved']
 
 @admin.register(Warehouse)
 class WarehouseAdmin(admin.ModelAdmin):
@@ -15,11 +25,134 @@ class WarehouseAdmin(admin.ModelAdmin):
     search_fields = ['name']
     inlines = [StockInline] # Вкладка с товарами внутри склада
 
+class StockLevelFilter(admin.SimpleListFilter):
+    """
+    Низкий остаток считается в SQL (StockQuerySet.low_stock()), а не
+    свойством available_quantity для каждой строки.
+    """
+    title = _('stock level')
+    parameter_name = 'level'
+
+    def lookups(self, request, model_admin):
+        return [(LowStockAlert.LOW, _('At or below reorder level')), (LowStockAlert.OUT, _('Out of stock'))]
+
+    def queryset(self, request, queryset):
+        if self.value() == LowStockAlert.LOW:
+            return queryset.low_stock()
+        if self.value() == LowStockAlert.OUT:
+            return queryset.alias(available=AVAILABLE).filter(available__lte=0)
+        return queryset
+
 @admin.register(Stock)
-class StockAdmin(admin.ModelAdmin):
-    list_display = ['product', 'warehouse', 'quantity', 'reserved', 'available_quantity']
-    list_filter = ['warehouse']
+class StockAdmin(ProductIndexSearchMixin, ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['product', 'warehouse', 'quantity', 'reserved', 'available_quantity', 'reorder_level']
+    list_filter = [StockLevelFilter, 'warehouse', ('product', AutocompleteFilter)]
+    list_select_related = ['product', 'warehouse']
     search_fields = ['product__sku', 'product__translations__name']
+    product_lookup = 'product'
+    translated_relations = ['product']
     autocomplete_fields = ['product', 'warehouse']
-    # available_quantity - это свойство, его нельзя редактировать, но можно показывать
-    readonly_fields = ['available_quantity']
\ No newline at end of file
+    # available_quantity - это свойство, его нельзя редактировать, но можно показывать;
+    # количество и резерв — сумма журнала движений, правятся через StockMovementAdmin
+    readonly_fields = ['quantity', 'reserved', 'available_quantity']
+    actions = export_actions(StockExport)
+
+class StockMovementForm(forms.ModelForm):
+    # Резервы и отгрузки по заказам пишет apps.warehouse.services
+    MANUAL_KINDS = (StockMovement.RECEIPT, StockMovement.SHIPMENT, StockMovement.ADJUSTMENT)
+
+    class Meta:
+        model = StockMovement
+        fields = ['stock', 'kind', 'quantity', 'reference']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # На странице просмотра поле только для чтения и в форму не попадает
+        if 'kind' in self.fields:
+            self.fields['kind'].choices = [
+                choice for choice in StockMovement.KIND_CHOICES if choice[0] in self.MANUAL_KINDS
+            ]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        kind, quantity = cleaned_data.get('kind'), cleaned_data.get('quantity')
+        if quantity == 0:
+            self.add_error('quantity', _('A movement must change the stock.'))
+        if kind == StockMovement.RECEIPT and quantity is not None and quantity <= 0:
+            self.add_error('quantity', _('A receipt must add stock.'))
+        if kind == StockMovement.SHIPMENT and quantity is not None and quantity >= 0:
+            self.add_error('quantity', _('A shipment must take stock out (negative quantity).'))
+        stock = cleaned_data.get('stock')
+        if stock is not None and quantity is not None and stock.quantity + quantity < 0:
+            self.add_error('quantity', _('Only %(quantity)s in stock.') % {'quantity': stock.quantity})
+        return cleaned_data
+
+@admin.register(StockMovement)
+class StockMovementAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    form = StockMovementForm
+    list_display = ['created_at', 'stock', 'kind', 'quantity', 'reserved', 'reference']
+    list_filter = ['kind', 'created_at', 'stock__warehouse']
+    list_select_related = ['stock__product', 'stock__warehouse']
+    search_fields = ['=reference']
+    autocomplete_fields = ['stock']
+    date_hierarchy = 'created_at'
+
+    def save_model(self, request, obj, form, change):
+        # Движение и новый остаток — в одной транзакции
+        try:
+            post_movements([obj])
+        except NegativeStock:
+            # Форма проверила остаток, но параллельная запись успела его уменьшить
+            obj.rejected = True
+            self.message_user(
+                request,
+                _('Stock changed meanwhile and would go negative; nothing was posted. Only %(quantity)s in stock now.')
+                % {'quantity': Stock.objects.values_list('quantity', flat=True).get(pk=obj.stock_id)},
+                messages.ERROR,
+            )
+
+    def log_addition(self, request, obj, message):
+        if not getattr(obj, 'rejected', False):
+            return super().log_addition(request, obj, message)
+
+    def response_add(self, request, obj, post_url_continue=None):
+        if getattr(obj, 'rejected', False):
+            # Обратно на форму добавления, без сообщения об успехе
+            return HttpResponseRedirect(request.get_full_path())
+        return super().response_add(request, obj, post_url_continue)
+
+    # Журнал только дополняется
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(LowStockAlert)
+class LowStockAlertAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['created_at', 'stock', 'kind', 'available', 'reorder_level', 'resolved_at']
+    list_filter = [('resolved_at', admin.EmptyFieldListFilter), 'kind', 'stock__warehouse']
+    list_select_related = ['stock__product', 'stock__warehouse']
+    search_fields = ['=stock__product__sku']
+    date_hierarchy = 'created_at'
+
+    # Оповещения пишет и закрывает только check_low_stock
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ['order', 'stock', 'quantity', 'created_at', 'expires_at']
+    list_select_related = ['order__user', 'stock__product', 'stock__warehouse']
+    raw_id_fields = ['order', 'stock']
+    # Резерв меняет Stock.reserved, поэтому правим его только через apps.warehouse.services
+    readonly_fields = ['order', 'stock', 'quantity', 'expires_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
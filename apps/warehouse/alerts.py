@@ -0,0 +1,88 @@
+"""
+Low-stock and out-of-stock alerts.
+
+A Stock row with a reorder_level is low when its available quantity
+(quantity - reserved) is at or below that level and out of stock at zero.
+check_low_stock() (the check_low_stock command, run on a schedule) works
+on sets, never on loaded rows:
+
+1. one UPDATE resolves the open alerts of rows that recovered, and of low
+   rows that ran out (they get an out-of-stock alert instead);
+2. one INSERT ... SELECT, served by the partial stock_reorder_idx index,
+   opens an alert for every low row without one.
+
+The unique open alert per row (unique_open_stock_alert) deduplicates: a row
+stays alerted once until it recovers, and concurrent runs insert nothing
+twice. The new alerts are then streamed back and announced with the
+``stock_alerts_raised`` signal, once per chunk.
+"""
+import logging
+from itertools import islice
+
+from django.db import connection
+from django.db.models import Case, DateTimeField, Exists, F, OuterRef, Q, Value, When
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import LowStockAlert, Stock
+
+logger = logging.getLogger(__name__)
+
+# sender=LowStockAlert, alerts=[LowStockAlert]
+stock_alerts_raised = Signal()
+
+# Аннотация выборки -> колонка LowStockAlert
+ALERT_COLUMNS = {
+    'alert_stock': 'stock_id',
+    'alert_kind': 'kind',
+    'available': 'available',
+    'alert_level': 'reorder_level',
+    'alert_created_at': 'created_at',
+}
+
+
+def check_low_stock(chunk_size=5000, now=None):
+    """
+    Raise alerts for stock rows that crossed their reorder level and
+    resolve the ones that recovered. Returns (raised, resolved).
+    """
+    now = now or timezone.now()
+    low = Stock.objects.low_stock()
+
+    resolved = LowStockAlert.objects.filter(resolved_at__isnull=True).filter(
+        ~Exists(low.filter(pk=OuterRef('stock_id')))
+        | Q(kind=LowStockAlert.LOW) & Exists(low.filter(pk=OuterRef('stock_id'), available__lte=0))
+    ).update(resolved_at=now)
+
+    fresh = (
+        low.filter(~Exists(LowStockAlert.objects.filter(stock=OuterRef('pk'), resolved_at__isnull=True)))
+        .order_by()
+        .annotate(
+            alert_stock=F('pk'),
+            alert_kind=Case(When(available__lte=0, then=Value(LowStockAlert.OUT)), default=Value(LowStockAlert.LOW)),
+            alert_level=F('reorder_level'),
+            alert_created_at=Value(now, output_field=DateTimeField()),
+        )
+        .values_list(*ALERT_COLUMNS)
+    )
+    sql, params = fresh.query.sql_with_params()
+    quote = connection.ops.quote_name
+    # Колонки INSERT — в том порядке, в каком Django выбрал аннотации
+    columns = ', '.join(quote(ALERT_COLUMNS[name]) for name in fresh.query.annotation_select)
+    with connection.cursor() as cursor:
+        # Строки в Python не поднимаются; параллельный запуск мог успеть открыть оповещение — пропускаем
+        cursor.execute(
+            f'INSERT INTO {quote(LowStockAlert._meta.db_table)} ({columns}) {sql} ON CONFLICT DO NOTHING',
+            params,
+        )
+        raised = cursor.rowcount
+
+    if raised:
+        alerts = LowStockAlert.objects.filter(created_at=now, resolved_at__isnull=True).iterator(chunk_size=chunk_size)
+        while chunk := list(islice(alerts, chunk_size)):
+            stock_alerts_raised.send(sender=LowStockAlert, alerts=chunk)
+
+    if raised or resolved:
+        logger.warning('Stock alerts: %s raised, %s resolved', raised, resolved)
+    return raised, resolved
+
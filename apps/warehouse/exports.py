@@ -0,0 +1,11 @@
+from apps.core.export import Export
+from .models import Stock
+
+
+class StockExport(Export):
+    model = Stock
+    name = 'stock'
+    fields = ['id', 'warehouse_id', 'warehouse__name', 'product_id', 'product__sku', 'quantity', 'reserved']
+    translated_fields = {
+        'product_name': ('product__translations', 'name'),
+    }
@@ -0,0 +1,300 @@
+"""
+Multi-warehouse fulfilment planning.
+
+A plan says which active warehouse ships how much of each line of an
+order. The planner minimises the number of shipments (warehouses used);
+among plans with as few shipments it prefers higher Warehouse.priority,
+and inside the chosen warehouses lines are taken from the highest
+priority first.
+
+Availability is an in-memory matrix product -> warehouse -> available
+quantity, loaded with one query for any number of products. Per order the
+planner turns it into bitmasks over the order's products (what a warehouse
+has, what it covers in full), so testing a warehouse or a combination of
+warehouses is a few integer operations instead of a query per item:
+
+1. the highest-priority warehouse covering the whole order, if any;
+2. otherwise a greedy cover (most units per shipment), which is optimal
+   when it needs two shipments;
+3. otherwise combinations of fewer warehouses, in priority order, until
+   one covers the order or MAX_COMBINATIONS have been tried — then the
+   greedy plan is kept and marked as not proven optimal.
+
+Lines that no warehouse can fill are reported as shortages; the rest of
+the order is still planned. plan_backlog() plans thousands of orders in
+one batch: a fixed number of queries, then orders are planned oldest
+first against the same matrix, each consuming the stock it was given.
+"""
+import time
+from collections import defaultdict
+from itertools import combinations
+
+from django.db.models import F
+
+from apps.orders.models import Order, OrderItem
+from .models import Reservation, Stock
+
+# Потолок перебора комбинаций складов на один заказ; дальше — жадный план
+MAX_COMBINATIONS = 2000
+BACKLOG_STATUSES = ('confirmed', 'paid')
+
+
+class Availability:
+    """
+    Available quantity per product and warehouse, plus the stock row behind
+    each cell. Warehouses sort by ``rank()``: priority, then name.
+    """
+
+    def __init__(self):
+        self.matrix = defaultdict(dict)
+        self.stock_ids = {}
+        self._ranks = {}
+
+    @classmethod
+    def load(cls, products):
+        """
+        Availability of ``products`` (ids or a values('product_id') queryset)
+        in active warehouses. One query.
+        """
+        availability = cls()
+        rows = (
+            Stock.objects
+            .filter(product_id__in=products, warehouse__is_active=True, quantity__gt=F('reserved'))
+            .values_list('pk', 'warehouse_id', 'product_id', 'quantity', 'reserved', 'warehouse__priority', 'warehouse__name')
+        )
+        for stock_id, warehouse_id, product_id, quantity, reserved, priority, name in rows:
+            availability.add(stock_id, warehouse_id, product_id, quantity - reserved, priority, name)
+        return availability
+
+    def add(self, stock_id, warehouse_id, product_id, quantity, priority=0, name=''):
+        self.matrix[product_id][warehouse_id] = self.matrix[product_id].get(warehouse_id, 0) + quantity
+        self.stock_ids[warehouse_id, product_id] = stock_id
+        # Как Warehouse.Meta.ordering
+        self._ranks.setdefault(warehouse_id, (-priority, name, warehouse_id))
+
+    def take(self, warehouse_id, product_id, quantity):
+        self.matrix[product_id][warehouse_id] -= quantity
+
+    def rank(self, warehouse_id):
+        return self._ranks[warehouse_id]
+
+
+class FulfilmentPlan:
+    """
+    ``shipments`` — {warehouse_id: {product_id: quantity}}, ``stocks`` — the
+    same as {stock_id: quantity}, ``shortages`` — {product_id: quantity}
+    no warehouse has. ``optimal`` — no plan with fewer shipments exists.
+    """
+
+    def __init__(self, order_id=None):
+        self.order_id = order_id
+        self.shipments = {}
+        self.stocks = {}
+        self.shortages = {}
+        self.demanded = 0
+        self.optimal = True
+
+    @property
+    def complete(self):
+        return not self.shortages
+
+    @property
+    def planned(self):
+        return sum(self.stocks.values())
+
+    def __repr__(self):
+        return f'<FulfilmentPlan order={self.order_id} shipments={self.shipments} shortages={self.shortages}>'
+
+
+class PlanStats:
+    """
+    Quality and runtime of a planning run.
+    """
+
+    def __init__(self):
+        self.orders = 0
+        self.complete = 0
+        self.shipments = 0
+        self.split = 0
+        self.optimal = 0
+        self.units = 0
+        self.units_planned = 0
+        self.seconds = 0.0
+
+    def add(self, plan):
+        self.orders += 1
+        self.complete += plan.complete
+        self.shipments += len(plan.shipments)
+        self.split += len(plan.shipments) > 1
+        self.optimal += plan.optimal
+        self.units += plan.demanded
+        self.units_planned += plan.planned
+
+    def as_dict(self):
+        orders = self.orders or 1
+        return {
+            'orders': self.orders,
+            'complete': self.complete,
+            'shipments': self.shipments,
+            'shipments_per_order': round(self.shipments / orders, 3),
+            'split_orders': self.split,
+            'optimal_orders': self.optimal,
+            'fill_rate': round(self.units_planned / self.units, 4) if self.units else 1.0,
+            'seconds': round(self.seconds, 3),
+            'orders_per_second': round(self.orders / self.seconds) if self.seconds else None,
+        }
+
+
+class FulfilmentPlanner:
+    """
+    Plans orders against an Availability; see the module docstring. With
+    ``consume`` every plan takes its stock out of the matrix, so the next
+    order only sees what is left.
+    """
+
+    def __init__(self, availability, max_combinations=MAX_COMBINATIONS, consume=True):
+        self.availability = availability
+        self.max_combinations = max_combinations
+        self.consume = consume
+
+    def plan(self, demand, order_id=None):
+        """``demand`` — {product_id: quantity}."""
+        matrix = self.availability.matrix
+        result = FulfilmentPlan(order_id)
+        need = {}
+        for product_id, quantity in demand.items():
+            if quantity <= 0:
+                continue
+            result.demanded += quantity
+            total = sum(n for n in matrix.get(product_id, {}).values() if n > 0)
+            if total < quantity:
+                result.shortages[product_id] = quantity - total
+            if total:
+                need[product_id] = min(total, quantity)
+
+        warehouses, result.optimal = self._cover(need)
+        for product_id, quantity in need.items():
+            for warehouse_id in warehouses:
+                take = min(quantity, matrix[product_id].get(warehouse_id, 0))
+                if take <= 0:
+                    continue
+                result.shipments.setdefault(warehouse_id, {})[product_id] = take
+                result.stocks[self.availability.stock_ids[warehouse_id, product_id]] = take
+                if self.consume:
+                    self.availability.take(warehouse_id, product_id, take)
+                quantity -= take
+                if not quantity:
+                    break
+        return result
+
+    def _cover(self, need):
+        """Warehouses to ship ``need`` from, in priority order, and whether that is a minimum."""
+        if not need:
+            return [], True
+        matrix = self.availability.matrix
+        bits = {product_id: 1 << i for i, product_id in enumerate(need)}
+        required = (1 << len(need)) - 1
+        has = defaultdict(int)
+        full = defaultdict(int)
+        for product_id, quantity in need.items():
+            for warehouse_id, available in matrix[product_id].items():
+                if available > 0:
+                    has[warehouse_id] |= bits[product_id]
+                    if available >= quantity:
+                        full[warehouse_id] |= bits[product_id]
+        candidates = sorted(has, key=self.availability.rank)
+
+        for warehouse_id in candidates:
+            if full[warehouse_id] == required:
+                return [warehouse_id], True
+
+        greedy = self._greedy(need, candidates)
+        checked = 0
+        for size in range(2, len(greedy)):
+            for combination in combinations(candidates, size):
+                checked += 1
+                if checked > self.max_combinations:
+                    return greedy, False
+                mask = 0
+                for warehouse_id in combination:
+                    mask |= has[warehouse_id]
+                if mask != required:
+                    continue
+                if all(
+                    sum(matrix[product_id].get(warehouse_id, 0) for warehouse_id in combination) >= quantity
+                    for product_id, quantity in need.items()
+                ):
+                    return list(combination), True
+        return greedy, True
+
+    def _greedy(self, need, candidates):
+        matrix = self.availability.matrix
+        remaining = dict(need)
+        chosen = []
+        left = list(candidates)
+        while remaining and left:
+            # Склад, закрывающий больше всего оставшихся штук; при равенстве — более приоритетный
+            best, gain = None, 0
+            for warehouse_id in left:
+                units = sum(min(matrix[product_id].get(warehouse_id, 0), n) for product_id, n in remaining.items())
+                if units > gain:
+                    best, gain = warehouse_id, units
+            if best is None:
+                break
+            chosen.append(best)
+            left.remove(best)
+            for product_id in list(remaining):
+                remaining[product_id] -= min(matrix[product_id].get(best, 0), remaining[product_id])
+                if remaining[product_id] <= 0:
+                    del remaining[product_id]
+        return sorted(chosen, key=self.availability.rank)
+
+
+def plan_order(order, max_combinations=MAX_COMBINATIONS):
+    """Fulfilment plan of one order against current stock (its own reservations count as available)."""
+    plans, _ = plan_backlog(Order.objects.filter(pk=order.pk), max_combinations=max_combinations)
+    return plans[0] if plans else FulfilmentPlan(order.pk)
+
+
+def plan_backlog(orders=None, max_combinations=MAX_COMBINATIONS):
+    """
+    Plan ``orders`` (default: confirmed and paid orders), oldest first,
+    each against the stock the previous ones left. An order's own
+    reservations count as available to it. Four queries however many
+    orders there are. Returns ([FulfilmentPlan], PlanStats); nothing is
+    written.
+    """
+    if orders is None:
+        orders = Order.objects.filter(status__in=BACKLOG_STATUSES)
+    started = time.perf_counter()
+    order_ids = list(orders.order_by('created_at', 'pk').values_list('pk', flat=True))
+    items = OrderItem.objects.filter(order__in=orders.order_by())
+
+    demand = defaultdict(dict)
+    for order_id, product_id, quantity in items.values_list('order_id', 'product_id', 'quantity'):
+        demand[order_id][product_id] = demand[order_id].get(product_id, 0) + quantity
+    availability = Availability.load(items.values('product_id'))
+    reserved = defaultdict(list)
+    for order_id, *row in (
+        Reservation.objects.filter(order__in=orders.order_by(), stock__warehouse__is_active=True)
+        .values_list('order_id', 'stock_id', 'stock__warehouse_id', 'stock__product_id', 'quantity',
+                     'stock__warehouse__priority', 'stock__warehouse__name')
+    ):
+        reserved[order_id].append(row)
+
+    planner = FulfilmentPlanner(availability, max_combinations=max_combinations)
+    stats = PlanStats()
+    plans = []
+    for order_id in order_ids:
+        for stock_id, warehouse_id, product_id, quantity, priority, name in reserved.get(order_id, ()):
+            availability.add(stock_id, warehouse_id, product_id, quantity, priority, name)
+        plan = planner.plan(demand.get(order_id, {}), order_id=order_id)
+        # Неиспользованный резерв заказа остается за ним, остальным заказам он недоступен
+        for stock_id, warehouse_id, product_id, quantity, *_ in reserved.get(order_id, ()):
+            unused = quantity - plan.stocks.get(stock_id, 0)
+            if unused > 0:
+                availability.take(warehouse_id, product_id, unused)
+        plans.append(plan)
+        stats.add(plan)
+    stats.seconds = time.perf_counter() - started
+    return plans, stats
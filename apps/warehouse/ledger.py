@@ -0,0 +1,257 @@
+"""
+Stock movement ledger.
+
+Every change of Stock.quantity or Stock.reserved is a StockMovement row
+(receipt, shipment, reservation, release, adjustment) written in the same
+transaction as the balance change, so the Stock row is always the sum of
+its movements. Writers either post through post_movements() (receipts,
+adjustments, shipments, warehouse scanners via MovementBuffer) or, like
+reserve() and release(), update the balance themselves and insert the
+matching movements next to it.
+
+Periodic snapshots (take_snapshots(), run by the snapshot_stock command)
+store the ledger balance of each changed stock row as of a movement id,
+so balances_at() answers "stock at date X" from one snapshot per row plus
+the movements posted after it instead of summing the whole history.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Stock, StockMovement, StockSnapshot
+
+
+class NegativeStock(Exception):
+    """
+    The movements would take quantity or reserved of some stock rows below
+    zero (``stock_ids``); nothing was posted.
+    """
+
+    def __init__(self, stock_ids):
+        self.stock_ids = stock_ids
+        super().__init__(f'Movements would make stock negative: {stock_ids}')
+
+
+def _per_row(values):
+    return Case(
+        *[When(pk=pk, then=Value(n)) for pk, n in values.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _per_value(values):
+    """
+    Like _per_row(), with one WHEN pk IN (...) per distinct value: a WHEN
+    per row makes the UPDATE quadratic in the batch size, while the deltas
+    of a batch (scanner counts, feed corrections) take few distinct values.
+    """
+    groups = defaultdict(list)
+    for pk, n in values.items():
+        groups[n].append(pk)
+    return Case(
+        *[When(pk__in=pks, then=Value(n)) for n, pks in groups.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def post_movements(movements, batch_size=1000):
+    """
+    Append ``movements`` (unsaved StockMovement instances) to the ledger and
+    apply them to the Stock balances in one transaction. Per ``batch_size``
+    stock rows that is one SELECT ... FOR NO KEY UPDATE (in id order, so
+    concurrent batches cannot deadlock) and one UPDATE, plus one INSERT per
+    ``batch_size`` movements. All or nothing: raises NegativeStock if a
+    balance would drop below zero. Returns the created movements.
+    """
+    movements = [movement for movement in movements if movement.quantity or movement.reserved]
+    if not movements:
+        return []
+    quantity = defaultdict(int)
+    reserved = defaultdict(int)
+    for movement in movements:
+        quantity[movement.stock_id] += movement.quantity
+        reserved[movement.stock_id] += movement.reserved
+    chunks = [sorted(quantity)[start:start + batch_size] for start in range(0, len(quantity), batch_size)]
+
+    with transaction.atomic():
+        negative = []
+        for chunk in chunks:
+            rows = (
+                Stock.objects.select_for_update(no_key=True)
+                .filter(pk__in=chunk).order_by('pk')
+                .values_list('pk', 'quantity', 'reserved')
+            )
+            balances = {pk: (q, r) for pk, q, r in rows}
+            negative += [
+                pk for pk in chunk
+                if pk not in balances
+                or balances[pk][0] + quantity[pk] < 0
+                or balances[pk][1] + reserved[pk] < 0
+            ]
+        if negative:
+            raise NegativeStock(negative)
+
+        created = StockMovement.objects.bulk_create(movements, batch_size=batch_size)
+        for chunk in chunks:
+            Stock.objects.filter(pk__in=chunk).update(
+                quantity=F('quantity') + _per_value({pk: quantity[pk] for pk in chunk if quantity[pk]}),
+                reserved=F('reserved') + _per_value({pk: reserved[pk] for pk in chunk if reserved[pk]}),
+            )
+    return created
+
+
+class MovementBuffer:
+    """
+    Collects movements from a high-volume source (warehouse scanners) and
+    posts them with post_movements() every ``batch_size`` movements and when
+    the block ends. Each flush is all or nothing.
+
+        with MovementBuffer() as ledger:
+            for scan in scans:
+                ledger.add(scan.stock_id, StockMovement.RECEIPT, quantity=scan.count, reference=scan.batch)
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.pending = []
+        self.posted = 0
+
+    def add(self, stock_id, kind, quantity=0, reserved=0, reference=''):
+        self.pending.append(StockMovement(
+            stock_id=stock_id, kind=kind, quantity=quantity, reserved=reserved, reference=reference,
+        ))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        self.posted += len(post_movements(pending, batch_size=self.batch_size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+
+def _snapshots(stock_ref, at=None):
+    """Snapshots of the outer query's stock row, newest first."""
+    snapshots = StockSnapshot.objects.filter(stock=OuterRef(stock_ref))
+    if at is not None:
+        snapshots = snapshots.filter(taken_at__lte=at)
+    return snapshots.order_by('-taken_at', '-pk')
+
+
+def _tail(stocks, at=None, up_to=None):
+    """
+    Movement totals per stock row posted after its latest snapshot (taken
+    at or before ``at``): {stock_id: (quantity, reserved)}.
+    """
+    movements = StockMovement.objects.filter(
+        stock__in=stocks.values('pk'),
+        pk__gt=Coalesce(Subquery(_snapshots('stock_id', at).values('last_movement_id')[:1]), 0),
+    )
+    if at is not None:
+        movements = movements.filter(created_at__lte=at)
+    if up_to is not None:
+        movements = movements.filter(pk__lte=up_to)
+    rows = movements.order_by().values('stock_id').annotate(total_quantity=Sum('quantity'), total_reserved=Sum('reserved'))
+    return {row['stock_id']: (row['total_quantity'], row['total_reserved']) for row in rows}
+
+
+def _snapshot_balances(stocks, at=None):
+    snapshots = _snapshots('pk', at)
+    rows = stocks.annotate(
+        snapshot_quantity=Subquery(snapshots.values('quantity')[:1]),
+        snapshot_reserved=Subquery(snapshots.values('reserved')[:1]),
+    ).values_list('pk', 'snapshot_quantity', 'snapshot_reserved')
+    return {pk: (quantity or 0, reserved or 0) for pk, quantity, reserved in rows}
+
+
+def balances_at(at, stocks=None):
+    """
+    {stock_id: (quantity, reserved)} of ``stocks`` (default: all) as of
+    ``at``, from the latest snapshot taken at or before ``at`` plus the
+    movements posted after it. Two queries.
+    """
+    stocks = Stock.objects.all() if stocks is None else stocks
+    balances = _snapshot_balances(stocks, at)
+    for stock_id, (quantity, reserved) in _tail(stocks, at).items():
+        base_quantity, base_reserved = balances.get(stock_id, (0, 0))
+        balances[stock_id] = (base_quantity + quantity, base_reserved + reserved)
+    return balances
+
+
+def take_snapshots(settle=None, chunk_size=2000):
+    """
+    Snapshot every stock row with movements since its latest snapshot, up
+    to the last movement older than ``settle`` seconds
+    (STOCK_SNAPSHOT_SETTLE): ids are handed out before commit, so younger
+    ones may still be joined by lower ids from open transactions.
+    Returns the number of snapshots written.
+    """
+    settle = settings.STOCK_SNAPSHOT_SETTLE if settle is None else settle
+    taken_at = timezone.now() - timedelta(seconds=settle)
+    cut = (
+        StockMovement.objects.filter(created_at__lte=taken_at)
+        .order_by('-created_at', '-pk').values_list('pk', flat=True).first()
+    )
+    if cut is None:
+        return 0
+
+    written = 0
+    stock_ids = Stock.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size)
+    chunk = []
+    for stock_id in stock_ids:
+        chunk.append(stock_id)
+        if len(chunk) >= chunk_size:
+            written += _snapshot_chunk(chunk, taken_at, cut)
+            chunk = []
+    if chunk:
+        written += _snapshot_chunk(chunk, taken_at, cut)
+    return written
+
+
+def _snapshot_chunk(stock_ids, taken_at, cut):
+    stocks = Stock.objects.filter(pk__in=stock_ids)
+    tail = _tail(stocks, up_to=cut)
+    if not tail:
+        return 0
+    previous = _snapshot_balances(stocks.filter(pk__in=tail))
+    snapshots = [
+        StockSnapshot(
+            stock_id=stock_id,
+            taken_at=taken_at,
+            last_movement_id=cut,
+            quantity=previous[stock_id][0] + quantity,
+            reserved=previous[stock_id][1] + reserved,
+        )
+        for stock_id, (quantity, reserved) in tail.items()
+    ]
+    # Параллельный запуск с тем же срезом ничего не задвоит
+    StockSnapshot.objects.bulk_create(snapshots, ignore_conflicts=True)
+    return len(snapshots)
+
+
+def ledger_drift(stocks=None):
+    """
+    Stock rows whose balance differs from the ledger:
+    [(stock_id, (quantity, reserved), (ledger quantity, ledger reserved))].
+    Movements posted between the two reads show up as false positives,
+    so re-check before acting on a hit.
+    """
+    stocks = Stock.objects.all() if stocks is None else stocks
+    ledger = balances_at(timezone.now(), stocks)
+    return [
+        (pk, (quantity, reserved), ledger.get(pk, (0, 0)))
+        for pk, quantity, reserved in stocks.values_list('pk', 'quantity', 'reserved')
+        if ledger.get(pk, (0, 0)) != (quantity, reserved)
+    ]
@@ -0,0 +1,90 @@
+import random
+from collections import defaultdict
+from copy import deepcopy
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.warehouse.fulfilment import MAX_COMBINATIONS, Availability, FulfilmentPlan, FulfilmentPlanner, PlanStats
+
+
+def priority_first(availability, demand, order_id):
+    """Baseline: every line from the highest-priority warehouses that have it, as reserve() used to do."""
+    plan = FulfilmentPlan(order_id)
+    for product_id, quantity in demand.items():
+        plan.demanded += quantity
+        for warehouse_id in sorted(availability.matrix[product_id], key=availability.rank):
+            take = min(quantity, availability.matrix[product_id][warehouse_id])
+            if take <= 0:
+                continue
+            plan.shipments.setdefault(warehouse_id, {})[product_id] = take
+            plan.stocks[availability.stock_ids[warehouse_id, product_id]] = take
+            availability.take(warehouse_id, product_id, take)
+            quantity -= take
+            if not quantity:
+                break
+        if quantity:
+            plan.shortages[product_id] = quantity
+    return plan
+
+
+class Command(BaseCommand):
+    help = (
+        'Plan a synthetic order backlog in memory with the fulfilment planner and with the naive '
+        'priority-first split, and compare shipments per order, optimality, fill rate and speed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--warehouses', type=int, default=12)
+        parser.add_argument('--max-lines', type=int, default=6)
+        parser.add_argument('--coverage', type=float, default=0.4, help='Share of products each warehouse stocks.')
+        parser.add_argument('--max-combinations', type=int, default=MAX_COMBINATIONS)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        availability = Availability()
+        stock_id = 0
+        for warehouse_id in range(1, options['warehouses'] + 1):
+            priority = rng.randint(0, 3)
+            for product_id in range(1, options['products'] + 1):
+                if rng.random() < options['coverage']:
+                    stock_id += 1
+                    availability.add(stock_id, warehouse_id, product_id, rng.randint(0, 300), priority, f'W{warehouse_id}')
+
+        # Популярные товары заказывают чаще
+        weights = [1 / rank for rank in range(1, options['products'] + 1)]
+        backlog = []
+        for order_id in range(1, options['orders'] + 1):
+            lines = rng.choices(range(1, options['products'] + 1), weights, k=rng.randint(1, options['max_lines']))
+            demand = defaultdict(int)
+            for product_id in lines:
+                demand[product_id] += rng.randint(1, 3)
+            backlog.append((order_id, dict(demand)))
+        self.stdout.write(
+            f'{len(backlog)} orders, {options["products"]} products, {options["warehouses"]} warehouses, '
+            f'{stock_id} stock rows'
+        )
+
+        results = {}
+        baseline = deepcopy(availability)
+        planner = FulfilmentPlanner(availability, max_combinations=options['max_combinations'])
+        for name, plan in (
+            ('priority-first', lambda order_id, demand: priority_first(baseline, demand, order_id)),
+            ('planner', lambda order_id, demand: planner.plan(demand, order_id=order_id)),
+        ):
+            stats = PlanStats()
+            started = time.perf_counter()
+            for order_id, demand in backlog:
+                stats.add(plan(order_id, demand))
+            stats.seconds = time.perf_counter() - started
+            results[name] = stats.as_dict()
+        # Базовый вариант оптимальность не проверяет
+        results['priority-first']['optimal_orders'] = '-'
+
+        keys = list(results['planner'])
+        self.stdout.write(f'{"":>20} ' + ' '.join(f'{name:>15}' for name in results))
+        for key in keys:
+            self.stdout.write(f'{key:>20} ' + ' '.join(f'{str(row[key]):>15}' for row in results.values()))
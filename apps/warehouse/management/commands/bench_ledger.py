@@ -0,0 +1,68 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.catalog.models import Category, Product
+from apps.warehouse.ledger import MovementBuffer, balances_at, ledger_drift, take_snapshots
+from apps.warehouse.models import Stock, StockMovement, Warehouse
+
+
+class Command(BaseCommand):
+    help = (
+        'Post scanner-style stock movements through the batched ledger on the configured database, '
+        'report movements per second and time a point-in-time query with and without a snapshot.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movements', type=int, default=20000)
+        parser.add_argument('--stocks', type=int, default=200, help='Stock rows the movements are spread over.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        category = Category()
+        category.save()
+        warehouse = Warehouse.objects.create(name=f'Ledger bench {tag}')
+        products = [Product(category=category, sku=f'LEDGER-{tag}-{i}', price=1) for i in range(options['stocks'])]
+        for product in products:
+            product.save()
+        stocks = Stock.objects.bulk_create([Stock(warehouse=warehouse, product=product) for product in products])
+        stock_ids = [stock.pk for stock in stocks]
+        bench_stocks = Stock.objects.filter(pk__in=stock_ids)
+
+        try:
+            started = time.perf_counter()
+            with MovementBuffer(batch_size=options['batch_size']) as ledger:
+                # Сканеры на приемке: каждое сканирование — отдельный приход
+                for _ in range(options['movements']):
+                    ledger.add(random.choice(stock_ids), StockMovement.RECEIPT, quantity=random.randint(1, 5), reference=tag)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'Posted {ledger.posted} movements in {elapsed:.2f}s: {ledger.posted / elapsed:.0f} movements/s '
+                f'(batches of {options["batch_size"]})'
+            )
+
+            now = timezone.now()
+            started = time.perf_counter()
+            without_snapshot = balances_at(now, bench_stocks)
+            self.stdout.write(f'Stock at a point in time, full history: {(time.perf_counter() - started) * 1000:.1f} ms')
+
+            written = take_snapshots(settle=0)
+            started = time.perf_counter()
+            with_snapshot = balances_at(now, bench_stocks)
+            self.stdout.write(
+                f'Stock at a point in time, after {written} snapshots: {(time.perf_counter() - started) * 1000:.1f} ms'
+            )
+
+            drift = ledger_drift(bench_stocks)
+            if with_snapshot != without_snapshot or drift:
+                self.stdout.write(self.style.ERROR(f'Ledger mismatch: {drift[:5]}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('Stock rows, snapshots and ledger agree.'))
+        finally:
+            warehouse.delete()
+            Product.objects.filter(pk__in=[product.pk for product in products]).delete()
+            category.delete()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.warehouse.alerts import check_low_stock
+from apps.warehouse.models import LowStockAlert
+
+
+class Command(BaseCommand):
+    help = (
+        'Raise alerts for stock rows whose available quantity fell to their reorder level and resolve '
+        'the ones that recovered. One open alert per row; run on a schedule (e.g. every 5 minutes).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        raised, resolved = check_low_stock(chunk_size=options['chunk_size'])
+        open_alerts = LowStockAlert.objects.filter(resolved_at__isnull=True).count()
+        self.stdout.write(self.style.SUCCESS(f'Raised {raised} alerts, resolved {resolved}; {open_alerts} open.'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from apps.orders.models import Order
+from apps.warehouse.fulfilment import BACKLOG_STATUSES, MAX_COMBINATIONS, plan_backlog
+
+
+class Command(BaseCommand):
+    help = (
+        'Plan the fulfilment of the order backlog against current stock: which warehouses ship what, '
+        'with as few shipments per order as possible. Nothing is written.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', action='append', help=f'Order status to plan (repeatable, default: {", ".join(BACKLOG_STATUSES)}).')
+        parser.add_argument('--limit', type=int, help='Only the N oldest orders.')
+        parser.add_argument('--max-combinations', type=int, default=MAX_COMBINATIONS)
+        parser.add_argument('--show', type=int, default=0, help='Print the plans of the first N orders.')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.filter(status__in=options['status'] or BACKLOG_STATUSES)
+        if options['limit']:
+            orders = Order.objects.filter(pk__in=list(orders.order_by('created_at', 'pk').values_list('pk', flat=True)[:options['limit']]))
+        plans, stats = plan_backlog(orders, max_combinations=options['max_combinations'])
+
+        for plan in plans[:options['show']]:
+            shipments = '; '.join(
+                f'warehouse #{warehouse_id}: ' + ', '.join(f'{n}x product #{product_id}' for product_id, n in lines.items())
+                for warehouse_id, lines in plan.shipments.items()
+            )
+            shortages = f' | short: {plan.shortages}' if plan.shortages else ''
+            self.stdout.write(f'Order #{plan.order_id}: {shipments or "-"}{shortages}')
+
+        for key, value in stats.as_dict().items():
+            self.stdout.write(f'{key:>20}: {value}')
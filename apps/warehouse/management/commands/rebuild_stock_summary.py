@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.catalog.models import Product
+from apps.warehouse.models import StockSummary
+
+
+class Command(BaseCommand):
+    help = 'Verify per-product stock summaries against Stock rows and rebuild the drifted ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Only report drifted products, do not write.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        product_ids = Product.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size)
+
+        drifted = rebuilt = 0
+        chunk = []
+        for product_id in product_ids:
+            chunk.append(product_id)
+            if len(chunk) >= chunk_size:
+                drifted, rebuilt = self._process(chunk, options['verify'], drifted, rebuilt)
+                chunk = []
+        if chunk:
+            drifted, rebuilt = self._process(chunk, options['verify'], drifted, rebuilt)
+
+        self.stdout.write(f'Drifted products: {drifted}')
+        if options['verify']:
+            if drifted:
+                raise CommandError('Stock summaries are out of date, run without --verify to fix.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} stock summaries.'))
+
+    def _process(self, chunk, verify, drifted, rebuilt):
+        drift = StockSummary.objects.drift(chunk)
+        if drift and not verify:
+            rebuilt += StockSummary.objects.rebuild(drift)
+        return drifted + len(drift), rebuilt
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.warehouse.services import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Release stock reserved by abandoned carts whose reservations have expired.'
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired reservations.'))
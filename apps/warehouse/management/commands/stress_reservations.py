@@ -0,0 +1,95 @@
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+
+from apps.catalog.models import Category, Product
+from apps.orders.models import Order
+from apps.warehouse.ledger import ledger_drift, post_movements
+from apps.warehouse.models import Reservation, Stock, StockMovement, Warehouse
+from apps.warehouse.services import InsufficientStock, ReservationConflict, reserve
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent checkouts against one hot SKU on the configured database '
+        '(SQLite or PostgreSQL) and verify that stock is never overbooked and matches the movement ledger.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=32)
+        parser.add_argument('--checkouts', type=int, default=300)
+        parser.add_argument('--warehouses', type=int, default=3)
+        parser.add_argument('--stock', type=int, default=50, help='Units per warehouse.')
+        parser.add_argument('--per-order', type=int, default=1)
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        category = Category()
+        category.save()
+        product = Product(category=category, sku=f'STRESS-{tag}', price=1)
+        product.save()
+        user = get_user_model().objects.create_user(email=f'stress-{tag}@example.com', username=f'stress-{tag}')
+        warehouses = [
+            Warehouse.objects.create(name=f'Stress {tag} #{i}', priority=i)
+            for i in range(options['warehouses'])
+        ]
+        stocks = Stock.objects.bulk_create([Stock(warehouse=warehouse, product=product) for warehouse in warehouses])
+        post_movements([
+            StockMovement(stock=stock, kind=StockMovement.RECEIPT, quantity=options['stock'], reference=f'Stress {tag}')
+            for stock in stocks
+        ])
+        orders = Order.objects.bulk_create([
+            Order(user=user, status='confirmed', first_name='Stress', last_name=tag, email=user.email, phone='', address='')
+            for _ in range(options['checkouts'])
+        ])
+
+        outcomes = Counter()
+
+        def checkout(order):
+            try:
+                reserve(order, [(product.pk, options['per_order'])])
+                return 'reserved'
+            except InsufficientStock:
+                return 'sold out'
+            except ReservationConflict:
+                return 'conflict'
+            except OperationalError:
+                return 'db error'
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                outcomes.update(pool.map(checkout, orders))
+            elapsed = time.perf_counter() - started
+
+            stocks = list(Stock.objects.filter(product=product).values_list('quantity', 'reserved'))
+            reserved = sum(r for _, r in stocks)
+            booked = Reservation.objects.filter(stock__product=product).aggregate(total=Sum('quantity'))['total'] or 0
+
+            self.stdout.write(f'{connection.vendor}: {len(orders)} checkouts, {options["workers"]} workers, {elapsed:.2f}s')
+            for outcome, count in sorted(outcomes.items()):
+                self.stdout.write(f'  {outcome}: {count}')
+            self.stdout.write(f'  reserved per warehouse: {[r for _, r in stocks]}')
+
+            if any(r > q for q, r in stocks):
+                raise CommandError('Overbooked: reserved exceeds quantity.')
+            if reserved != booked or booked != outcomes['reserved'] * options['per_order']:
+                raise CommandError(f'Mismatch: Stock.reserved={reserved}, reservations={booked}.')
+            drift = ledger_drift(Stock.objects.filter(product=product))
+            if drift:
+                raise CommandError(f'Stock rows disagree with the movement ledger: {drift}')
+            self.stdout.write(self.style.SUCCESS('No overbooking detected.'))
+        finally:
+            Order.objects.filter(pk__in=[o.pk for o in orders]).delete()
+            Warehouse.objects.filter(pk__in=[w.pk for w in warehouses]).delete()
+            product.delete()
+            category.delete()
+            user.delete()
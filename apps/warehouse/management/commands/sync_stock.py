@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.warehouse.sync import FORMATS, StockSync, read_feed
+
+
+class Command(BaseCommand):
+    help = (
+        'Set stock levels from a WMS/ERP feed: CSV (warehouse,sku,quantity) or JSON Lines, '
+        'a file or "-" for stdin. Only changed rows are written, as ledger adjustments.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Default: by file extension, CSV for stdin.')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change.')
+        parser.add_argument('--reference', help='Reference of the ledger movements (default: "Stock sync <time>").')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        feed_format = options['format'] or ('jsonl' if Path(path).suffix.lower() in ('.jsonl', '.ndjson') else 'csv')
+        reference = options['reference'] or f'Stock sync {timezone.now():%Y-%m-%d %H:%M}'
+        sync = StockSync(
+            chunk_size=options['chunk_size'], dry_run=options['dry_run'], reference=reference, progress=self._progress,
+        )
+        first_line = 1 if feed_format == 'jsonl' else 2
+        if path == '-':
+            result = sync.run(read_feed(sys.stdin, feed_format), first_line=first_line)
+        else:
+            try:
+                with open(path, newline='', encoding='utf-8-sig') as handle:
+                    result = sync.run(read_feed(handle, feed_format), first_line=first_line)
+            except FileNotFoundError as error:
+                raise CommandError(error)
+
+        for line, message in result.errors[:50]:
+            self.stderr.write(f'  line {line}: {message}')
+        if result.skipped > 50:
+            self.stderr.write(f'  ... and {result.skipped - 50} more')
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Dry run: " if options["dry_run"] else ""}{result.rows} rows: {result.created} created, '
+            f'{result.updated} updated, {result.unchanged} unchanged, {result.skipped} skipped; '
+            f'+{result.units_in}/-{result.units_out} units.'
+        ))
+
+    def _progress(self, result):
+        self.stdout.write(f'  {result.rows} rows, {result.rate:.0f} rows/s')
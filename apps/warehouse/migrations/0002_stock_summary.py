@@ -0,0 +1,49 @@
+# Generated by Django 5.0.1 on 2026-10-18 20:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_summaries(apps, schema_editor):
+    Stock = apps.get_model('warehouse', 'Stock')
+    StockSummary = apps.get_model('warehouse', 'StockSummary')
+    totals = {}
+    for product_id, quantity, reserved in Stock.objects.values_list('product_id', 'quantity', 'reserved').iterator():
+        row = totals.setdefault(product_id, [0, 0, 0])
+        row[0] += quantity
+        row[1] += reserved
+        row[2] += max(0, quantity - reserved)
+    StockSummary.objects.bulk_create(
+        [
+            StockSummary(product_id=product_id, quantity=q, reserved=r, available=a, in_stock=a > 0)
+            for product_id, (q, r, a) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('warehouse', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSummary',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_summary', serialize=False, to='catalog.product', verbose_name='Product')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Total quantity')),
+                ('reserved', models.PositiveIntegerField(default=0, verbose_name='Total reserved')),
+                ('available', models.PositiveIntegerField(default=0, verbose_name='Total available')),
+                ('in_stock', models.BooleanField(default=False, verbose_name='In stock')),
+            ],
+            options={
+                'verbose_name': 'Stock summary',
+                'verbose_name_plural': 'Stock summaries',
+                'indexes': [models.Index(fields=['in_stock', 'available'], name='warehouse_s_in_stoc_569ca6_idx')],
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
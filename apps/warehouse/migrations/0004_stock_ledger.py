@@ -0,0 +1,69 @@
+# Generated by Django 5.0.1 on 2026-10-18 21:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def opening_balances(apps, schema_editor):
+    Stock = apps.get_model('warehouse', 'Stock')
+    StockMovement = apps.get_model('warehouse', 'StockMovement')
+
+    # Журнал начинается с текущих остатков: одна корректировка на запись Stock
+    stocks = Stock.objects.exclude(quantity=0, reserved=0).order_by('pk').values_list('pk', 'quantity', 'reserved')
+    batch = []
+    for stock_id, quantity, reserved in stocks.iterator(chunk_size=2000):
+        batch.append(StockMovement(
+            stock_id=stock_id, kind='adjustment', quantity=quantity, reserved=reserved, reference='Opening balance',
+        ))
+        if len(batch) >= 2000:
+            StockMovement.objects.bulk_create(batch)
+            batch = []
+    StockMovement.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0003_reservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('receipt', 'Receipt'), ('shipment', 'Shipment'), ('reservation', 'Reservation'), ('release', 'Release'), ('adjustment', 'Adjustment')], max_length=20, verbose_name='Kind')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Quantity change')),
+                ('reserved', models.IntegerField(default=0, verbose_name='Reserved change')),
+                ('reference', models.CharField(blank=True, help_text='Order, delivery note or scanner batch', max_length=100, verbose_name='Reference')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Created at')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='warehouse.stock', verbose_name='Stock')),
+            ],
+            options={
+                'verbose_name': 'Stock movement',
+                'verbose_name_plural': 'Stock movements',
+                'indexes': [models.Index(fields=['stock', 'id'], name='warehouse_s_stock_i_96988b_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(verbose_name='Taken at')),
+                ('last_movement_id', models.BigIntegerField(verbose_name='Last movement')),
+                ('quantity', models.IntegerField(verbose_name='Quantity')),
+                ('reserved', models.IntegerField(verbose_name='Reserved')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='warehouse.stock', verbose_name='Stock')),
+            ],
+            options={
+                'verbose_name': 'Stock snapshot',
+                'verbose_name_plural': 'Stock snapshots',
+                'indexes': [models.Index(fields=['stock', '-taken_at'], name='warehouse_s_stock_i_defc08_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('stock', 'last_movement_id'), name='unique_stock_snapshot'),
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.1 on 2026-10-18 21:23
+
+import django.db.models.deletion
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_renditions'),
+        ('warehouse', '0004_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('low', 'Low stock'), ('out', 'Out of stock')], max_length=10, verbose_name='Kind')),
+                ('available', models.IntegerField(verbose_name='Available')),
+                ('reorder_level', models.PositiveIntegerField(verbose_name='Reorder level')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Created at')),
+                ('resolved_at', models.DateTimeField(blank=True, null=True, verbose_name='Resolved at')),
+            ],
+            options={
+                'verbose_name': 'Low stock alert',
+                'verbose_name_plural': 'Low stock alerts',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='reorder_level',
+            field=models.PositiveIntegerField(blank=True, help_text='Alert when available stock falls to this level (0 — only when out of stock). Empty — no alerts.', null=True, verbose_name='Reorder level'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('quantity'), '-', models.F('reserved')), '-', models.F('reorder_level')), condition=models.Q(('reorder_level__isnull', False)), name='stock_reorder_idx'),
+        ),
+        migrations.AddField(
+            model_name='lowstockalert',
+            name='stock',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='warehouse.stock', verbose_name='Stock'),
+        ),
+        migrations.AddConstraint(
+            model_name='lowstockalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('resolved_at__isnull', True)), fields=('stock',), name='unique_open_stock_alert'),
+        ),
+    ]
@@ -1,6 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
 from django.utils.translation import gettext_lazy as _
 from apps.catalog.models import Product
+from apps.catalog.services import STOCK_TAG, product_tag
+from apps.core.cache import invalidate
 
 class Warehouse(models.Model):
     """
@@ -19,6 +23,61 @@ class Warehouse(models.Model):
     def __str__(self):
         return self.name
 
+# Доступный остаток в SQL — то же, что Stock.available_quantity, без загрузки строк
+AVAILABLE = F('quantity') - F('reserved')
+
+
+class StockQuerySet(models.QuerySet):
+    """
+    Массовые операции не шлют сигналы, поэтому после них
+    пересчитываем StockSummary для затронутых товаров.
+    update(quantity=...) и upsert журнал движений не ведут —
+    остатки меняют через apps.warehouse.ledger.post_movements().
+    """
+
+    def low_stock(self):
+        """
+        Rows with a reorder level whose available quantity is at or below
+        it, annotated with ``available``. Served by the stock_reorder_idx
+        partial index.
+        """
+        return (
+            self.filter(reorder_level__isnull=False)
+            .alias(headroom=AVAILABLE - F('reorder_level'))
+            .filter(headroom__lte=0)
+            .annotate(available=AVAILABLE)
+        )
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            product_ids = set(self.values_list('product_id', flat=True))
+            rows = super().update(**kwargs)
+            new_product = kwargs.get('product_id', kwargs.get('product'))
+            if new_product is not None:
+                product_ids.add(getattr(new_product, 'pk', new_product))
+            StockSummary.objects.rebuild(product_ids)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if not kwargs.get('update_conflicts'):
+                # Начальные остатки новых записей — первые движения журнала
+                StockMovement.objects.bulk_create([
+                    StockMovement(stock=obj, kind=StockMovement.ADJUSTMENT, quantity=obj.quantity, reserved=obj.reserved)
+                    for obj in objs
+                    if obj.pk is not None and (obj.quantity or obj.reserved)
+                ], batch_size=1000)
+            StockSummary.objects.rebuild({obj.product_id for obj in objs})
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            rows = super().bulk_update(objs, fields, *args, **kwargs)
+            StockSummary.objects.rebuild({obj.product_id for obj in objs})
+        return rows
+
+
 class Stock(models.Model):
     """
     Количество конкретного товара на конкретном складе.
@@ -30,11 +89,37 @@ class Stock(models.Model):
     # Резерв (на случай, если товар в корзине, но еще не оплачен)
     reserved = models.PositiveIntegerField(default=0, verbose_name=_('Reserved'))
 
+    reorder_level = models.PositiveIntegerField(
+        null=True, blank=True, verbose_name=_('Reorder level'),
+        help_text=_('Alert when available stock falls to this level (0 — only when out of stock). Empty — no alerts.'),
+    )
+
     class Meta:
         verbose_name = _('Stock')
         verbose_name_plural = _('Stocks')
         # Нельзя дублировать записи: один товар на одном складе — одна запись
         unique_together = ['warehouse', 'product'] 
+        indexes = [
+            # Выражение то же, что в StockQuerySet.low_stock(); записи без порога в индекс не попадают
+            models.Index(
+                AVAILABLE - F('reorder_level'),
+                name='stock_reorder_idx',
+                condition=Q(reorder_level__isnull=False),
+            ),
+        ]
+
+    objects = StockQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            if not self._state.adding and self.pk is not None:
+                # Дельту считаем от строки в БД под блокировкой, а не от загруженной в память:
+                # параллельное сохранение той же записи иначе разведет StockSummary и журнал
+                self._loaded_values = (
+                    Stock._base_manager.select_for_update()
+                    .filter(pk=self.pk).values('product_id', 'quantity', 'reserved').first()
+                )
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.product.sku} - {self.warehouse.name} ({self.quantity})"
@@ -42,4 +127,303 @@ class Stock(models.Model):
     @property
     def available_quantity(self):
         """Реально доступное количество (Физическое - Резерв)"""
-        return max(0, self.quantity - self.reserved)
\ No newline at end of file
+        return max(0, self.quantity - self.reserved)
+
+
+def _stock_flipped(product_ids):
+    if product_ids:
+        # После коммита: иначе параллельный запрос закэширует старые остатки под новой версией
+        tags = [STOCK_TAG] + [product_tag(product_id) for product_id in product_ids]
+        transaction.on_commit(lambda: invalidate(*tags))
+
+
+class StockSummaryManager(models.Manager):
+
+    def apply_delta(self, product_id, quantity=0, reserved=0, available=0, create_missing=True):
+        """
+        Инкрементально применить изменение остатков к итогам товара.
+        """
+        updated = self.filter(product_id=product_id).update(
+            quantity=F('quantity') + quantity,
+            reserved=F('reserved') + reserved,
+            available=F('available') + available,
+            # В UPDATE справа стоят старые значения, поэтому сравниваем с -дельтой
+            in_stock=Case(When(available__gt=-available, then=Value(True)), default=Value(False)),
+        )
+        if not updated:
+            if create_missing:
+                self.rebuild([product_id])
+            return
+        if available:
+            # Витрина показывает только «в наличии / нет» — сбрасываем кэш, лишь если признак сменился
+            after = self.filter(product_id=product_id).values_list('available', flat=True).first()
+            if after is not None and (after > 0) != (after - available > 0):
+                _stock_flipped([product_id])
+
+    def apply_deltas(self, deltas):
+        """
+        apply_delta() for several products: ``deltas`` is {product_id:
+        (quantity, reserved, available)}. One UPDATE with per-product
+        increments, with no transaction or row locks of its own, then one
+        SELECT of the new ``available`` to tell which products changed
+        availability.
+        """
+        deltas = {product_id: delta for product_id, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+
+        def per_product(index):
+            return Case(
+                *[When(product_id=product_id, then=Value(delta[index])) for product_id, delta in deltas.items()],
+                default=Value(0),
+                output_field=models.IntegerField(),
+            )
+
+        self.filter(product_id__in=deltas).update(
+            quantity=F('quantity') + per_product(0),
+            reserved=F('reserved') + per_product(1),
+            available=F('available') + per_product(2),
+            # В UPDATE справа стоят старые значения, поэтому сравниваем с -дельтой
+            in_stock=Case(
+                *[When(product_id=product_id, available__gt=-delta[2], then=Value(True))
+                  for product_id, delta in deltas.items()],
+                default=Value(False),
+            ),
+        )
+        after = dict(self.filter(product_id__in=deltas).values_list('product_id', 'available'))
+        # Итогов еще нет — собираем агрегатом
+        self.rebuild([product_id for product_id in deltas if product_id not in after])
+        _stock_flipped([
+            product_id for product_id, available in after.items()
+            if (available > 0) != (available - deltas[product_id][2] > 0)
+        ])
+
+    def rebuild(self, product_ids=None):
+        """
+        Пересчитать итоги агрегатом по Stock.
+        Если product_ids не передан, пересчитываются все товары.
+        Возвращает количество пересчитанных товаров.
+        """
+        products = Product.objects.all()
+        if product_ids is not None:
+            product_ids = list(product_ids)
+            if not product_ids:
+                return 0
+            products = products.filter(pk__in=product_ids)
+
+        previous = {
+            row[0]: row[1:]
+            for row in self.filter(product__in=products).values_list('product_id', 'quantity', 'reserved', 'available', 'in_stock')
+        }
+        summaries = [
+            StockSummary(
+                product_id=row['pk'],
+                quantity=row['total_quantity'],
+                reserved=row['total_reserved'],
+                available=row['total_available'],
+                in_stock=row['total_available'] > 0,
+            )
+            for row in self._aggregate(products)
+        ]
+        count = len(summaries)
+        # Пишем только изменившиеся итоги
+        summaries = [
+            summary for summary in summaries
+            if previous.get(summary.product_id) != (summary.quantity, summary.reserved, summary.available, summary.in_stock)
+        ]
+        self.bulk_create(
+            summaries,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['quantity', 'reserved', 'available', 'in_stock'],
+        )
+        _stock_flipped([
+            summary.product_id for summary in summaries
+            if previous.get(summary.product_id, (None,))[-1] != summary.in_stock
+        ])
+        return count
+
+    def drift(self, product_ids=None):
+        """
+        Товары, у которых сохраненные итоги расходятся с фактическими остатками.
+        """
+        products = Product.objects.all()
+        if product_ids is not None:
+            products = products.filter(pk__in=product_ids)
+        stored = {
+            row['product_id']: row
+            for row in self.filter(product__in=products).values(
+                'product_id', 'quantity', 'reserved', 'available', 'in_stock'
+            )
+        }
+        drifted = []
+        for row in self._aggregate(products):
+            expected = {
+                'product_id': row['pk'],
+                'quantity': row['total_quantity'],
+                'reserved': row['total_reserved'],
+                'available': row['total_available'],
+                'in_stock': row['total_available'] > 0,
+            }
+            if stored.get(row['pk']) != expected:
+                drifted.append(row['pk'])
+        return drifted
+
+    @staticmethod
+    def _aggregate(products):
+        return products.order_by().values('pk').annotate(
+            total_quantity=Coalesce(Sum('stocks__quantity'), 0),
+            total_reserved=Coalesce(Sum('stocks__reserved'), 0),
+            total_available=Coalesce(Sum(Greatest(F('stocks__quantity') - F('stocks__reserved'), 0, output_field=models.IntegerField())), 0),
+        )
+
+
+class StockSummary(models.Model):
+    """
+    Итоги остатков товара по всем складам.
+    Денормализация для витрины и админки: обновляется дельтами из Stock,
+    сверяется и пересобирается командой rebuild_stock_summary.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stock_summary',
+        verbose_name=_('Product'),
+    )
+    quantity = models.PositiveIntegerField(default=0, verbose_name=_('Total quantity'))
+    reserved = models.PositiveIntegerField(default=0, verbose_name=_('Total reserved'))
+    available = models.PositiveIntegerField(default=0, verbose_name=_('Total available'))
+    in_stock = models.BooleanField(default=False, verbose_name=_('In stock'))
+
+    objects = StockSummaryManager()
+
+    class Meta:
+        verbose_name = _('Stock summary')
+        verbose_name_plural = _('Stock summaries')
+        indexes = [
+            models.Index(fields=['in_stock', 'available']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.available}"
+
+
+
+class StockMovement(models.Model):
+    """
+    Запись журнала движения остатков. Журнал только дополняется:
+    Stock.quantity и Stock.reserved — сумма его записей, обе стороны
+    меняются в одной транзакции (apps.warehouse.ledger).
+    """
+    RECEIPT = 'receipt'
+    SHIPMENT = 'shipment'
+    RESERVATION = 'reservation'
+    RELEASE = 'release'
+    ADJUSTMENT = 'adjustment'
+    KIND_CHOICES = (
+        (RECEIPT, _('Receipt')),
+        (SHIPMENT, _('Shipment')),
+        (RESERVATION, _('Reservation')),
+        (RELEASE, _('Release')),
+        (ADJUSTMENT, _('Adjustment')),
+    )
+
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='movements', verbose_name=_('Stock'))
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name=_('Kind'))
+    # Изменения со знаком: приход +, отгрузка -
+    quantity = models.IntegerField(default=0, verbose_name=_('Quantity change'))
+    reserved = models.IntegerField(default=0, verbose_name=_('Reserved change'))
+    reference = models.CharField(max_length=100, blank=True, verbose_name=_('Reference'), help_text=_('Order, delivery note or scanner batch'))
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name=_('Created at'))
+
+    class Meta:
+        verbose_name = _('Stock movement')
+        verbose_name_plural = _('Stock movements')
+        indexes = [
+            # Хвост журнала после снимка: WHERE stock_id = ? AND id > ?
+            models.Index(fields=['stock', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk}: stock #{self.stock_id} {self.quantity:+d}/{self.reserved:+d}"
+
+
+class StockSnapshot(models.Model):
+    """
+    Остаток по журналу на момент taken_at: сумма всех движений записи
+    Stock с id <= last_movement_id. Остаток на дату — последний снимок
+    до нее плюс короткий хвост движений (apps.warehouse.ledger.balances_at).
+    """
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='snapshots', verbose_name=_('Stock'))
+    taken_at = models.DateTimeField(verbose_name=_('Taken at'))
+    last_movement_id = models.BigIntegerField(verbose_name=_('Last movement'))
+    quantity = models.IntegerField(verbose_name=_('Quantity'))
+    reserved = models.IntegerField(verbose_name=_('Reserved'))
+
+    class Meta:
+        verbose_name = _('Stock snapshot')
+        verbose_name_plural = _('Stock snapshots')
+        indexes = [
+            models.Index(fields=['stock', '-taken_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['stock', 'last_movement_id'], name='unique_stock_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"Stock #{self.stock_id} at {self.taken_at:%Y-%m-%d %H:%M}: {self.quantity}/{self.reserved}"
+
+
+class Reservation(models.Model):
+    """
+    Резерв товара на конкретном складе под заказ.
+    Пока запись существует, ее количество учтено в Stock.reserved.
+    """
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='reservations', verbose_name=_('Stock'))
+    order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, related_name='reservations', verbose_name=_('Order'))
+    quantity = models.PositiveIntegerField(verbose_name=_('Quantity'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created at'))
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name=_('Expires at'))
+
+    class Meta:
+        verbose_name = _('Reservation')
+        verbose_name_plural = _('Reservations')
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.quantity} from stock #{self.stock_id}"
+
+
+class LowStockAlert(models.Model):
+    """
+    Оповещение о том, что доступный остаток записи Stock опустился до
+    порога (reorder_level) или до нуля. Открытое оповещение (resolved_at
+    пусто) на запись одно, поэтому повторные проверки не дублируют его;
+    закрывается, когда остаток поднялся выше порога (apps.warehouse.alerts).
+    """
+    LOW = 'low'
+    OUT = 'out'
+    KIND_CHOICES = (
+        (LOW, _('Low stock')),
+        (OUT, _('Out of stock')),
+    )
+
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='alerts', verbose_name=_('Stock'))
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name=_('Kind'))
+    # Остаток и порог на момент оповещения
+    available = models.IntegerField(verbose_name=_('Available'))
+    reorder_level = models.PositiveIntegerField(verbose_name=_('Reorder level'))
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name=_('Created at'))
+    resolved_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Resolved at'))
+
+    class Meta:
+        verbose_name = _('Low stock alert')
+        verbose_name_plural = _('Low stock alerts')
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['stock'], condition=Q(resolved_at__isnull=True), name='unique_open_stock_alert'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: stock #{self.stock_id} ({self.available}/{self.reorder_level})"
@@ -0,0 +1,235 @@
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .fulfilment import Availability, FulfilmentPlanner
+from .ledger import _per_row, post_movements
+from .models import Reservation, Stock, StockMovement, StockSummary
+
+
+# Статусы заказа, резерв которых больше не истекает
+HELD_STATUSES = ('confirmed', 'paid')
+
+
+class InsufficientStock(Exception):
+    """
+    Not enough available stock across active warehouses.
+    ``shortages`` maps product_id to the missing quantity.
+    """
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f'Insufficient stock for products: {sorted(shortages)}')
+
+
+class ReservationConflict(Exception):
+    """
+    Stock is available, but concurrent checkouts kept winning the race for it.
+    Safe to retry.
+    """
+
+
+class _AllocationConflict(Exception):
+    """A concurrent checkout took the stock between our read and our UPDATE."""
+
+
+def _allocate(demand):
+    """
+    Split the demand over as few warehouses as possible, higher priority
+    first (apps.warehouse.fulfilment). Returns {stock_id: quantity}.
+    """
+    plan = FulfilmentPlanner(Availability.load(list(demand))).plan(demand)
+    if plan.shortages:
+        raise InsufficientStock(plan.shortages)
+    return plan.stocks
+
+
+def _is_lock_conflict(error):
+    # SQLite не ждет при повышении блокировки чтения до записи, а сразу отвечает "database is locked"
+    return connection.vendor == 'sqlite' and 'locked' in str(error)
+
+
+def _reference(order_id):
+    return f'Order #{order_id}'
+
+
+def _apply_summary(deltas, attempts=5):
+    """
+    Apply reservation deltas to StockSummary outside the reservation
+    transaction. The reservation itself is already committed, so a busy
+    SQLite database is waited out here rather than failing the checkout.
+    """
+    for attempt in range(attempts):
+        try:
+            return StockSummary.objects.apply_deltas(deltas)
+        except OperationalError as error:
+            if not _is_lock_conflict(error) or attempt == attempts - 1:
+                raise
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
+
+def reserve(order, lines, ttl=None, attempts=5):
+    """
+    Reserve ``lines`` (iterable of (product_id, quantity)) for ``order``.
+
+    Each attempt is four statements regardless of the number of lines:
+    one SELECT of candidate stock rows, one conditional UPDATE that bumps
+    ``reserved`` only where ``quantity - reserved`` still covers the
+    allocation, and one INSERT each of the reservation rows and of their
+    ledger movements. If a concurrent checkout won the race for some row,
+    the whole attempt rolls back and is re-planned against fresh numbers.
+    The only rows locked are the allocated stock rows, so checkouts of one
+    product served from different warehouses do not wait for each other;
+    the product's StockSummary is brought up to date by a lock-free UPDATE
+    once the reservation has committed (see _apply_summary()). On SQLite a
+    busy database is treated the same way as a lost race.
+    """
+    demand = Counter()
+    for product_id, quantity in lines:
+        if quantity > 0:
+            demand[product_id] += quantity
+    if not demand:
+        return []
+
+    if ttl is None:
+        ttl = settings.STOCK_RESERVATION_TTL
+    expires_at = timezone.now() + timedelta(seconds=ttl) if ttl else None
+
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                allocation = _allocate(demand)
+                delta = _per_row(allocation)
+                # Мимо StockQuerySet.update(): пересборка итогов агрегатом не нужна, дельта известна
+                updated = (
+                    Stock._base_manager
+                    .filter(pk__in=allocation, quantity__gte=F('reserved') + delta)
+                    .update(reserved=F('reserved') + delta)
+                )
+                if updated != len(allocation):
+                    raise _AllocationConflict()
+                # Итоги — после коммита: строка StockSummary общая для всех складов товара
+                transaction.on_commit(partial(_apply_summary, {
+                    product_id: (0, quantity, -quantity) for product_id, quantity in demand.items()
+                }))
+                StockMovement.objects.bulk_create([
+                    StockMovement(stock_id=stock_id, kind=StockMovement.RESERVATION, reserved=n, reference=_reference(order.pk))
+                    for stock_id, n in allocation.items()
+                ])
+                return Reservation.objects.bulk_create([
+                    Reservation(stock_id=stock_id, order=order, quantity=n, expires_at=expires_at)
+                    for stock_id, n in allocation.items()
+                ])
+        except _AllocationConflict:
+            continue
+        except OperationalError as error:
+            if not _is_lock_conflict(error):
+                raise
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
+    # Все попытки проиграли гонку: если товара действительно не хватает, _allocate скажет об этом
+    _allocate(demand)
+    raise ReservationConflict()
+
+
+def reserve_order(order, ttl=None):
+    """Reserve all items of the order."""
+    return reserve(order, order.items.values_list('product_id', 'quantity'), ttl=ttl)
+
+
+def release(reservations):
+    """
+    Return reserved quantities to stock and drop the reservations.
+    A stock row never gives back more than it has reserved: the RELEASE
+    movements record the quantity actually released, so the ledger keeps
+    matching Stock. Returns the number of released reservations.
+    """
+    with transaction.atomic():
+        rows = list(reservations.select_for_update().values_list('pk', 'stock_id', 'quantity', 'order_id'))
+        if not rows:
+            return 0
+        left = dict(
+            Stock._base_manager.select_for_update()
+            .filter(pk__in={stock_id for _, stock_id, _, _ in rows}).order_by('pk')
+            .values_list('pk', 'reserved')
+        )
+        movements = []
+        for _, stock_id, quantity, order_id in rows:
+            # Резерв записи могли уже уменьшить в обход журнала — возвращаем не больше, чем осталось
+            released = min(quantity, left.get(stock_id, 0))
+            left[stock_id] = left.get(stock_id, 0) - released
+            movements.append(StockMovement(
+                stock_id=stock_id, kind=StockMovement.RELEASE, reserved=-released, reference=_reference(order_id),
+            ))
+        post_movements(movements)
+        Reservation.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    return len(rows)
+
+
+def release_order(order):
+    return release(Reservation.objects.filter(order=order))
+
+
+def release_expired(now=None):
+    """
+    Release reservations of abandoned checkouts. Only orders still in
+    'new' expire: confirming or paying an order pins its reservations
+    (hold_order()), and a reservation is never released from under an
+    order that is about to ship.
+    """
+    return release(Reservation.objects.filter(expires_at__lte=now or timezone.now(), order__status='new'))
+
+
+def checkout_order(order, ttl=None):
+    """
+    Reserve the order's items at checkout for ``ttl`` seconds
+    (STOCK_RESERVATION_TTL), replacing the hold of an earlier checkout of
+    the same cart in one transaction, so a failed re-checkout keeps it.
+    Raises InsufficientStock or ReservationConflict like reserve().
+    """
+    with transaction.atomic():
+        release_order(order)
+        return reserve_order(order, ttl=ttl)
+
+
+def hold_order(order):
+    """
+    Pin the reservations of a confirmed or paid order: they no longer
+    expire. Returns the number of reservations held; 0 means the order
+    has nothing reserved.
+    """
+    reservations = Reservation.objects.filter(order=order)
+    reservations.filter(expires_at__isnull=False).update(expires_at=None)
+    return reservations.count()
+
+
+def ship(reservations):
+    """
+    Ship reserved goods: post shipment movements taking the reserved
+    quantities out of both Stock.quantity and Stock.reserved, and drop the
+    reservations. Returns the number of shipped reservations.
+    """
+    with transaction.atomic():
+        rows = list(reservations.select_for_update().values_list('pk', 'stock_id', 'quantity', 'order_id'))
+        if not rows:
+            return 0
+        post_movements([
+            StockMovement(
+                stock_id=stock_id, kind=StockMovement.SHIPMENT,
+                quantity=-quantity, reserved=-quantity, reference=_reference(order_id),
+            )
+            for _, stock_id, quantity, order_id in rows
+        ])
+        Reservation.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    return len(rows)
+
+
+def ship_order(order):
+    return ship(Reservation.objects.filter(order=order))
@@ -0,0 +1,108 @@
+import logging
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.orders.models import Order
+from .alerts import stock_alerts_raised
+from .models import LowStockAlert, Stock, StockMovement, StockSummary
+from .services import HELD_STATUSES, _reference, hold_order, release_order, ship_order
+
+logger = logging.getLogger(__name__)
+
+
+def _row_totals(values):
+    quantity = values.get('quantity') or 0
+    reserved = values.get('reserved') or 0
+    return quantity, reserved, max(0, quantity - reserved)
+
+
+@receiver(post_save, sender=Stock)
+def stock_saved(sender, instance, created, raw=False, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None)
+    current = {'product_id': instance.product_id, 'quantity': instance.quantity, 'reserved': instance.reserved}
+    instance._loaded_values = current
+
+    if raw or (not created and loaded is None):
+        # Не знаем, что было в БД до сохранения (фикстуры, объект собран вручную) — пересчитываем
+        StockSummary.objects.rebuild([instance.product_id])
+        return
+
+    old = {} if created else loaded
+    old_quantity, old_reserved, old_available = _row_totals(old)
+    new_quantity, new_reserved, new_available = _row_totals(current)
+
+    if new_quantity != old_quantity or new_reserved != old_reserved:
+        # Прямое сохранение Stock (create(), фикстуры, скрипты) — тоже движение журнала
+        StockMovement.objects.create(
+            stock=instance, kind=StockMovement.ADJUSTMENT,
+            quantity=new_quantity - old_quantity, reserved=new_reserved - old_reserved,
+        )
+
+    old_product_id = old.get('product_id', instance.product_id)
+    if old_product_id != instance.product_id:
+        # Запись перенесли на другой товар: списываем со старого целиком
+        StockSummary.objects.apply_delta(
+            old_product_id, -old_quantity, -old_reserved, -old_available, create_missing=False
+        )
+        old_quantity = old_reserved = old_available = 0
+
+    StockSummary.objects.apply_delta(
+        instance.product_id,
+        new_quantity - old_quantity,
+        new_reserved - old_reserved,
+        new_available - old_available,
+    )
+
+
+@receiver(post_delete, sender=Stock)
+def stock_deleted(sender, instance, **kwargs):
+    quantity, reserved, available = _row_totals(
+        {'quantity': instance.quantity, 'reserved': instance.reserved}
+    )
+    # Итоги могли быть удалены каскадом вместе с товаром — тогда создавать их заново нельзя
+    StockSummary.objects.apply_delta(
+        instance.product_id, -quantity, -reserved, -available, create_missing=False
+    )
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    # Каскадное удаление резервов не вернуло бы количество в Stock.reserved
+    release_order(instance)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.status in HELD_STATUSES:
+        # Подтвержденный или оплаченный заказ держит резерв бессрочно
+        hold_order(instance)
+    elif instance.status == 'shipped':
+        # Отгруженный заказ списывает свои резервы со склада; повторное сохранение ничего не найдет
+        if not ship_order(instance) and not StockMovement.objects.filter(
+            kind=StockMovement.SHIPMENT, reference=_reference(instance.pk)
+        ).exists():
+            # Резерв истек или не создавался: со склада ничего не списано, отгрузку надо провести вручную
+            logger.warning('Order #%s shipped without reserved stock; nothing was taken out of stock', instance.pk)
+
+
+@receiver(stock_alerts_raised, sender=LowStockAlert)
+def email_stock_alerts(sender, alerts, **kwargs):
+    if not settings.STOCK_ALERT_EMAILS:
+        return
+    labels = {
+        pk: (sku, warehouse)
+        for pk, sku, warehouse in Stock.objects.filter(pk__in=[alert.stock_id for alert in alerts])
+        .values_list('pk', 'product__sku', 'warehouse__name')
+    }
+    lines = [
+        f'{alert.get_kind_display()}: {labels[alert.stock_id][0]} @ {labels[alert.stock_id][1]} '
+        f'— available {alert.available}, reorder level {alert.reorder_level}'
+        for alert in alerts if alert.stock_id in labels
+    ]
+    # Одно письмо на пачку новых оповещений, а не на каждую запись
+    send_mail(f'Stock alerts: {len(lines)}', '\n'.join(lines), None, settings.STOCK_ALERT_EMAILS, fail_silently=True)
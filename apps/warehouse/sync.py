@@ -0,0 +1,227 @@
+"""
+Bulk stock sync from WMS/ERP feeds.
+
+A feed states absolute stock levels, one row per (warehouse, sku,
+quantity), as CSV with a header or as JSON Lines. ``warehouse`` is a
+warehouse id or name. Rows are streamed in chunks, so memory stays
+bounded by the chunk size plus the SKU map (loaded once per sync) and
+the first MAX_ERRORS errors. Per chunk:
+
+1. one SELECT of the current Stock rows, locked until the chunk commits;
+2. one upsert (bulk_create(update_conflicts=True) on warehouse+product)
+   creating the rows the feed mentions for the first time, and one SELECT
+   re-reading them under the lock, since a concurrent writer may have
+   created some of them with stock in the meantime;
+3. the differences to the feed posted as adjustment movements through
+   the ledger (apps.warehouse.ledger.post_movements), which applies them
+   to the balances with one UPDATE.
+
+Unchanged rows are not written at all, and every change keeps its
+history in the movement ledger.
+"""
+import csv
+import json
+import time
+from itertools import islice
+
+from django.db import transaction
+
+from apps.catalog.models import Product
+from .ledger import post_movements
+from .models import Stock, StockMovement, Warehouse
+
+FORMATS = ('csv', 'jsonl')
+# Сколько ошибочных строк помнить: у битого фида на миллионы строк ошибок столько же
+MAX_ERRORS = 1000
+
+
+class SyncResult:
+    """
+    Diff summary of one sync, passed to the progress callback after every chunk.
+    ``errors`` keeps the first ``max_errors`` (line, message) pairs,
+    ``skipped`` counts all of them.
+    """
+
+    def __init__(self, max_errors=MAX_ERRORS):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.units_in = 0
+        self.units_out = 0
+        self.skipped = 0
+        self.errors = []
+        self.max_errors = max_errors
+        self.started = time.monotonic()
+
+    def add_error(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, message))
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.rows / elapsed if elapsed else 0.0
+
+    def as_dict(self, max_errors=100):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'units_in': self.units_in,
+            'units_out': self.units_out,
+            'skipped': self.skipped,
+            'errors': [{'line': line, 'error': message} for line, message in self.errors[:max_errors]],
+            'seconds': round(time.monotonic() - self.started, 3),
+        }
+
+
+def read_feed(lines, feed_format='csv'):
+    """
+    Yield feed rows from an iterable of text lines. A JSON line that does
+    not parse yields None (reported as an error for its line).
+    """
+    if feed_format == 'jsonl':
+        for line in lines:
+            line = line.strip()
+            if not line:
+                yield {}
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield row if row is None or isinstance(row, dict) else None
+    else:
+        for row in csv.DictReader(lines):
+            yield {(key or '').strip().lower(): value or '' for key, value in row.items()}
+
+
+class StockSync:
+    """
+    Set stock levels from a feed; see the module docstring. With
+    ``dry_run`` only the diff is computed.
+    """
+
+    def __init__(self, chunk_size=5000, dry_run=False, reference='', progress=None, max_errors=MAX_ERRORS):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.reference = reference
+        self.progress = progress
+        self.max_errors = max_errors
+        self._products = None
+        self._warehouses = None
+
+    def run(self, rows, first_line=2):
+        """``first_line`` — line number of the first row (2 for CSV after the header)."""
+        result = SyncResult(max_errors=self.max_errors)
+        rows = iter(rows)
+        line = first_line
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self._sync_chunk(list(enumerate(chunk, start=line)), result)
+            line += len(chunk)
+            if self.progress is not None:
+                self.progress(result)
+        return result
+
+    def _sync_chunk(self, numbered_rows, result):
+        target = {}
+        for line, row in numbered_rows:
+            if row == {}:
+                continue
+            result.rows += 1
+            try:
+                key, quantity = self._parse(row)
+            except ValueError as error:
+                result.add_error(line, str(error))
+                continue
+            # Повтор пары склад/товар внутри фида: побеждает последняя строка
+            target[key] = quantity
+        if not target:
+            return
+
+        with transaction.atomic():
+            current = self._locked(target)
+            missing = {key for key in target if key not in current}
+            if missing and not self.dry_run:
+                Stock.objects.bulk_create(
+                    [Stock(warehouse_id=warehouse_id, product_id=product_id) for warehouse_id, product_id in missing],
+                    batch_size=self.chunk_size,
+                    update_conflicts=True,
+                    unique_fields=['warehouse', 'product'],
+                    # Строку мог создать параллельный запрос — тогда это пустое обновление
+                    update_fields=['warehouse'],
+                )
+                # Перечитываем под блокировкой: у созданной параллельно строки уже может быть остаток
+                current.update(self._locked(missing))
+                missing = {key for key in missing if current[key][1] == 0}
+            result.created += len(missing)
+
+            movements = []
+            for key, quantity in target.items():
+                stock_id, old_quantity = current.get(key, (None, 0))
+                delta = quantity - old_quantity
+                if key not in missing:
+                    if delta:
+                        result.updated += 1
+                    else:
+                        result.unchanged += 1
+                if delta > 0:
+                    result.units_in += delta
+                else:
+                    result.units_out -= delta
+                if delta:
+                    movements.append(StockMovement(
+                        stock_id=stock_id, kind=StockMovement.ADJUSTMENT, quantity=delta, reference=self.reference,
+                    ))
+            if not self.dry_run:
+                post_movements(movements, batch_size=self.chunk_size)
+
+    def _locked(self, keys):
+        """{(warehouse_id, product_id): (stock_id, quantity)} of ``keys``, locked until the chunk commits."""
+        rows = (
+            Stock.objects.select_for_update(no_key=True)
+            .filter(warehouse_id__in={key[0] for key in keys}, product_id__in={key[1] for key in keys})
+            .values_list('pk', 'warehouse_id', 'product_id', 'quantity')
+        )
+        return {(warehouse_id, product_id): (pk, quantity) for pk, warehouse_id, product_id, quantity in rows}
+
+    def _parse(self, row):
+        if row is None:
+            raise ValueError('Invalid JSON line.')
+        sku = str(row.get('sku') or '').strip()
+        if not sku:
+            raise ValueError('SKU is required.')
+        product_id = self._product_map().get(sku)
+        if product_id is None:
+            raise ValueError(f'Unknown SKU "{sku}".')
+        warehouse = str(row.get('warehouse') or '').strip()
+        warehouse_id = self._warehouse_map().get(warehouse)
+        if warehouse_id is None:
+            raise ValueError(f'Unknown warehouse "{warehouse}".')
+        try:
+            quantity = int(str(row.get('quantity', '')).strip())
+        except ValueError:
+            raise ValueError(f'SKU {sku}: invalid quantity "{row.get("quantity")}".') from None
+        if quantity < 0:
+            raise ValueError(f'SKU {sku}: quantity cannot be negative.')
+        return (warehouse_id, product_id), quantity
+
+    def _product_map(self):
+        if self._products is None:
+            # Весь каталог в памяти: пара строк на товар, зато без запроса на каждый чанк
+            self._products = dict(Product.objects.values_list('sku', 'pk').iterator(chunk_size=10000))
+        return self._products
+
+    def _warehouse_map(self):
+        if self._warehouses is None:
+            self._warehouses = {}
+            for warehouse_id, name in Warehouse.objects.values_list('pk', 'name'):
+                self._warehouses[name] = warehouse_id
+                self._warehouses[str(warehouse_id)] = warehouse_id
+        return self._warehouses
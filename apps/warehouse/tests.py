@@ -1,3 +1,549 @@
-from django.test import TestCase
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.catalog.models import Category, Product
+from apps.core.testing import assert_max_queries, assert_no_repeated_queries, assert_view_budget
+from apps.orders.models import Order, OrderItem
+from .alerts import check_low_stock, stock_alerts_raised
+from .fulfilment import Availability, FulfilmentPlanner, plan_backlog
+from .ledger import balances_at, ledger_drift, post_movements, take_snapshots
+from .models import LowStockAlert, Reservation, Stock, StockMovement, StockSnapshot, StockSummary, Warehouse
+from .services import InsufficientStock, ReservationConflict, release_expired, release_order, reserve, reserve_order
+from .sync import StockSync
+
+
+def make_product(sku, price='10.00'):
+    category = Category.objects.first()
+    if category is None:
+        category = Category(is_active=True)
+        category.set_current_language('en')
+        category.name = 'Root'
+        category.slug = 'root'
+        category.save()
+    product = Product(category=category, sku=sku, price=Decimal(price))
+    product.set_current_language('en')
+    product.name = f'Product {sku}'
+    product.slug = sku.lower()
+    product.save()
+    return product
+
+
+def make_order(email, lines, status='new'):
+    user = get_user_model().objects.create_user(username=email, email=email, password='x')
+    order = Order.objects.create(
+        user=user, status=status, first_name='A', last_name='B', email=email, phone='1', address='Street 1',
+    )
+    for product, quantity in lines:
+        OrderItem.objects.create(order=order, product=product, price=product.price, quantity=quantity)
+    return order
+
+
+def balance(stock):
+    stock.refresh_from_db()
+    return stock.quantity, stock.reserved
+
+
+class ReservationExpiryTests(TestCase):
+
+    def setUp(self):
+        self.product = make_product('EXP-1')
+        self.stock = Stock.objects.create(warehouse=Warehouse.objects.create(name='Main'), product=self.product, quantity=5)
+
+    def test_paid_order_keeps_its_reservation_past_the_ttl(self):
+        order = make_order('paid@example.com', [(self.product, 2)])
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_order(order, ttl=60)
+        order.status = 'paid'
+        order.save()
+
+        self.assertEqual(release_expired(now=timezone.now() + timedelta(hours=1)), 0)
+        order.status = 'shipped'
+        order.save()
+        self.assertEqual(balance(self.stock), (3, 0))
+
+    def test_abandoned_checkout_is_released(self):
+        order = make_order('new@example.com', [(self.product, 2)])
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_order(order, ttl=60)
+
+        self.assertEqual(release_expired(now=timezone.now() + timedelta(hours=1)), 1)
+        self.assertEqual(balance(self.stock), (5, 0))
+
+    def test_checkout_reserves_the_cart(self):
+        order = make_order('cart@example.com', [(self.product, 2)])
+        self.client.force_login(order.user)
+
+        self.client.post(reverse('orders:checkout'))
+        self.client.post(reverse('orders:checkout'))
+
+        # Повторный checkout заменяет резерв, а не добавляет к нему
+        self.assertEqual(balance(self.stock), (5, 2))
+        self.assertIsNotNone(Reservation.objects.get(order=order).expires_at)
+
+
+class ReservationRaceTests(TransactionTestCase):
+    """
+    Параллельные checkout одного горячего SKU: остаток не уходит в минус,
+    итоги и журнал сходятся со Stock.
+    """
+
+    def test_concurrent_checkouts_never_overbook(self):
+        product = make_product('RACE-1')
+        stocks = [
+            Stock.objects.create(warehouse=Warehouse.objects.create(name=f'W{i}', priority=i), product=product)
+            for i in range(2)
+        ]
+        post_movements([StockMovement(stock=stock, kind=StockMovement.RECEIPT, quantity=5) for stock in stocks])
+        orders = [make_order(f'race{i}@example.com', []) for i in range(24)]
+
+        def checkout(order):
+            try:
+                reserve(order, [(product.pk, 1)])
+                return 'reserved'
+            except InsufficientStock:
+                return 'sold out'
+            except (ReservationConflict, OperationalError):
+                return 'conflict'
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            outcomes = Counter(pool.map(checkout, orders))
+
+        rows = list(Stock.objects.filter(product=product).values_list('quantity', 'reserved'))
+        booked = Reservation.objects.aggregate(total=Sum('quantity'))['total'] or 0
+        self.assertTrue(all(reserved <= quantity for quantity, reserved in rows), rows)
+        self.assertEqual(sum(reserved for _, reserved in rows), booked)
+        self.assertEqual(booked, outcomes['reserved'])
+        self.assertLessEqual(booked, 10)
+        self.assertGreater(booked, 0)
+        self.assertEqual(StockSummary.objects.drift([product.pk]), [])
+        self.assertEqual(ledger_drift(), [])
+
+    def test_checkouts_across_warehouses_do_not_lock_the_summary(self):
+        product = make_product('RACE-3')
+        stocks = [
+            Stock.objects.create(warehouse=Warehouse.objects.create(name=f'W{i}', priority=i), product=product)
+            for i in range(6)
+        ]
+        post_movements([StockMovement(stock=stock, kind=StockMovement.RECEIPT, quantity=2) for stock in stocks])
+        orders = [make_order(f'spread{i}@example.com', []) for i in range(12)]
+        in_transaction = []
+
+        def record(execute, sql, params, many, context):
+            if context['connection'].in_atomic_block:
+                in_transaction.append(sql)
+            return execute(sql, params, many, context)
+
+        def checkout(order):
+            try:
+                with connection.execute_wrapper(record):
+                    reserve(order, [(product.pk, 1)])
+                return 'reserved'
+            except InsufficientStock:
+                return 'sold out'
+            except (ReservationConflict, OperationalError):
+                return 'conflict'
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            outcomes = Counter(pool.map(checkout, orders))
+
+        # Внутри транзакции резерва — только строки Stock, Reservation и журнала
+        summary_table = StockSummary._meta.db_table
+        self.assertEqual([sql for sql in in_transaction if summary_table in sql], [])
+        self.assertTrue(in_transaction)
+        self.assertEqual(outcomes['sold out'], 0)
+        self.assertGreater(outcomes['reserved'], 0)
+        self.assertGreater(Stock.objects.filter(product=product, reserved__gt=0).count(), 1)
+        self.assertEqual(Reservation.objects.aggregate(total=Sum('quantity'))['total'], outcomes['reserved'])
+        self.assertEqual(StockSummary.objects.drift([product.pk]), [])
+        self.assertEqual(ledger_drift(), [])
+
+    def test_reserve_updates_the_summary_by_delta(self):
+        product = make_product('RACE-2')
+        stock = Stock.objects.create(warehouse=Warehouse.objects.create(name='Main'), product=product, quantity=4)
+        order = make_order('delta@example.com', [(product, 3)])
+
+        # Строки заказа, BEGIN, четыре запроса reserve() и два — итогов после коммита; без пересборки агрегатом
+        with assert_max_queries(8):
+            reserve_order(order)
+
+        summary = StockSummary.objects.get(product=product)
+        self.assertEqual((summary.quantity, summary.reserved, summary.available, summary.in_stock), (4, 3, 1, True))
+        self.assertEqual(balance(stock), (4, 3))
+
+
+class StockSaveTests(TestCase):
+
+    def test_stale_instance_saves_its_delta_against_the_database(self):
+        product = make_product('SAVE-1')
+        stock = Stock.objects.create(warehouse=Warehouse.objects.create(name='Main'), product=product, quantity=10)
+        first, second = Stock.objects.get(pk=stock.pk), Stock.objects.get(pk=stock.pk)
+
+        first.quantity = 7
+        first.save()
+        # Второй экземпляр загружен до первого сохранения и о нем не знает
+        second.quantity = 12
+        second.save()
+
+        summary = StockSummary.objects.get(product=product)
+        self.assertEqual((summary.quantity, summary.available), (12, 12))
+        self.assertEqual(StockSummary.objects.drift([product.pk]), [])
+        self.assertEqual(ledger_drift(), [])
+        self.assertEqual(
+            list(StockMovement.objects.filter(stock=stock).order_by('pk').values_list('quantity', flat=True)),
+            [10, -3, 5],
+        )
+
+
+class LedgerTests(TestCase):
+
+    def setUp(self):
+        self.product = make_product('LEDGER-1')
+        self.stock = Stock.objects.create(warehouse=Warehouse.objects.create(name='Main'), product=self.product)
+
+    def post(self, kind, quantity=0, reserved=0, at=None):
+        movement, = post_movements([StockMovement(stock=self.stock, kind=kind, quantity=quantity, reserved=reserved)])
+        if at is not None:
+            StockMovement.objects.filter(pk=movement.pk).update(created_at=at)
+
+    def full_history(self, at):
+        totals = StockMovement.objects.filter(stock=self.stock, created_at__lte=at).aggregate(
+            quantity=Sum('quantity'), reserved=Sum('reserved'),
+        )
+        return totals['quantity'] or 0, totals['reserved'] or 0
+
+    def test_balances_from_snapshots_match_the_full_history(self):
+        now = timezone.now()
+        self.post(StockMovement.RECEIPT, quantity=10, at=now - timedelta(hours=3))
+        self.post(StockMovement.SHIPMENT, quantity=-4, at=now - timedelta(hours=2))
+        self.assertEqual(take_snapshots(settle=90 * 60), 1)
+        self.post(StockMovement.RECEIPT, quantity=6, at=now - timedelta(minutes=30))
+        self.assertEqual(take_snapshots(settle=0), 1)
+        self.post(StockMovement.ADJUSTMENT, quantity=-1)
+
+        self.assertEqual(
+            list(StockSnapshot.objects.filter(stock=self.stock).order_by('taken_at').values_list('quantity', flat=True)),
+            [6, 12],
+        )
+        for at in [now - timedelta(hours=4), now - timedelta(hours=2), now - timedelta(hours=1),
+                   now - timedelta(minutes=10), timezone.now()]:
+            self.assertEqual(balances_at(at)[self.stock.pk], self.full_history(at), at)
+        self.assertEqual(balance(self.stock), (11, 0))
+        self.assertEqual(ledger_drift(), [])
+
+    def test_release_records_only_what_it_returned(self):
+        self.post(StockMovement.RECEIPT, quantity=5)
+        order = make_order('release@example.com', [(self.product, 3)])
+        # Итоги reserve() обновляет после коммита; в TestCase коммита нет
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_order(order)
+        # Резерв уменьшили вручную; движение ADJUSTMENT записывает Stock.save()
+        self.stock.refresh_from_db()
+        self.stock.reserved = 1
+        self.stock.save()
+
+        self.assertEqual(release_order(order), 1)
+        self.assertEqual(balance(self.stock), (5, 0))
+        self.assertEqual(ledger_drift(), [])
+        self.assertEqual(StockSummary.objects.drift([self.product.pk]), [])
+
+    def test_shipping_an_order_without_reservations_warns(self):
+        self.post(StockMovement.RECEIPT, quantity=5)
+        order = make_order('ship@example.com', [(self.product, 2)])
+
+        order.status = 'shipped'
+        with self.assertLogs('apps.warehouse.signals', 'WARNING'):
+            order.save()
+        self.assertEqual(balance(self.stock), (5, 0))
+
+    def test_shipping_a_reserved_order_once(self):
+        self.post(StockMovement.RECEIPT, quantity=5)
+        order = make_order('once@example.com', [(self.product, 2)])
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_order(order)
+
+        order.status = 'shipped'
+        with self.assertNoLogs('apps.warehouse.signals', 'WARNING'):
+            order.save()
+            order.save()
+        self.assertEqual(balance(self.stock), (3, 0))
+
+
+class StockMovementAdminTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'x'))
+        self.stock = Stock.objects.create(warehouse=Warehouse.objects.create(name='Main'), product=make_product('ADMIN-1'))
+        post_movements([StockMovement(stock=self.stock, kind=StockMovement.RECEIPT, quantity=5)])
+        self.url = reverse('admin:warehouse_stockmovement_add')
+
+    def add(self, kind, quantity):
+        return self.client.post(self.url, {'stock': self.stock.pk, 'kind': kind, 'quantity': quantity, 'reference': 'test'})
+
+    def test_zero_movement_is_a_form_error(self):
+        response = self.add(StockMovement.ADJUSTMENT, 0)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['adminform'].form, 'quantity', 'A movement must change the stock.')
+        self.assertEqual(StockMovement.objects.filter(stock=self.stock).count(), 1)
+
+    def test_stock_drained_after_validation_is_reported(self):
+        def drain_then_post(movements):
+            # Параллельная отгрузка между проверкой формы и записью
+            post_movements([StockMovement(stock=self.stock, kind=StockMovement.SHIPMENT, quantity=-4)])
+            return post_movements(movements)
+
+        with mock.patch('apps.warehouse.admin.post_movements', side_effect=drain_then_post):
+            response = self.add(StockMovement.SHIPMENT, -3)
+
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        messages = [str(message) for message in response.wsgi_request._messages]
+        self.assertEqual(len(messages), 1)
+        self.assertIn('nothing was posted. Only 1 in stock now.', messages[0])
+        self.assertEqual(balance(self.stock), (1, 0))
+        self.assertEqual(ledger_drift(), [])
+
+
+class StockSyncTests(TestCase):
+
+    def setUp(self):
+        self.product = make_product('SYNC-1')
+        self.warehouse = Warehouse.objects.create(name='Main')
+
+    def test_row_created_concurrently_is_synced_from_its_real_quantity(self):
+        locked = StockSync._locked
+
+        def created_meanwhile(sync, keys):
+            rows = locked(sync, keys)
+            if not hasattr(sync, 'raced'):
+                # Первое чтение не видит строку: ее создает параллельный запрос до нашего upsert
+                sync.raced = Stock.objects.create(warehouse=self.warehouse, product=self.product, quantity=7)
+                return {}
+            return rows
+
+        with mock.patch.object(StockSync, '_locked', created_meanwhile):
+            result = StockSync().run([{'warehouse': 'Main', 'sku': 'SYNC-1', 'quantity': '10'}])
+
+        self.assertEqual((result.created, result.updated, result.units_in), (0, 1, 3))
+        self.assertEqual(Stock.objects.get(product=self.product).quantity, 10)
+        self.assertEqual(ledger_drift(), [])
+
+    def test_errors_are_bounded_but_all_counted(self):
+        rows = [{'warehouse': 'Main', 'sku': f'NOPE-{i}', 'quantity': '1'} for i in range(5)]
+
+        result = StockSync(max_errors=2).run(rows + [{'warehouse': 'Main', 'sku': 'SYNC-1', 'quantity': '4'}])
+
+        self.assertEqual(result.errors, [(2, 'Unknown SKU "NOPE-0".'), (3, 'Unknown SKU "NOPE-1".')])
+        self.assertEqual((result.skipped, result.as_dict()['skipped'], result.created), (5, 5, 1))
+
+
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'x'))
+        warehouses = [Warehouse.objects.create(name=f'W{i}') for i in range(3)]
+        stocks = [
+            Stock.objects.create(warehouse=warehouse, product=make_product(f'BUDGET-{i}-{warehouse.pk}'), reorder_level=5)
+            for i in range(5) for warehouse in warehouses
+        ]
+        post_movements([StockMovement(stock=stock, kind=StockMovement.RECEIPT, quantity=3) for stock in stocks])
+
+    def assert_changelist(self, name):
+        # Тему admin_interface шаблон запрашивает дважды на любой странице
+        with assert_no_repeated_queries(threshold=3):
+            return assert_view_budget(self.client, reverse(f'admin:warehouse_{name}_changelist'))
+
+    def test_stock_changelist(self):
+        self.assertContains(self.assert_changelist('stock'), 'BUDGET-4-')
+
+    def test_movement_changelist_labels_stock_rows_without_queries(self):
+        # Колонка stock — это Stock.__str__: товар и склад приходят из list_select_related
+        self.assertContains(self.assert_changelist('stockmovement'), 'BUDGET-4-')
+
+    def test_alert_changelist(self):
+        with self.assertLogs('apps.warehouse.alerts', 'WARNING'):
+            call_command('check_low_stock', stdout=StringIO())
+        self.assertContains(self.assert_changelist('lowstockalert'), 'BUDGET-4-')
+
+
+def availability(cells):
+    """Availability from {warehouse_id: {product_id: quantity}}; higher warehouse id — lower priority."""
+    result = Availability()
+    for warehouse_id, products in cells.items():
+        for product_id, quantity in products.items():
+            result.add(warehouse_id * 100 + product_id, warehouse_id, product_id, quantity, priority=-warehouse_id)
+    return result
+
+
+class FulfilmentPlannerTests(SimpleTestCase):
+
+    def test_single_warehouse_prefers_priority(self):
+        plan = FulfilmentPlanner(availability({1: {1: 5, 2: 5}, 2: {1: 5, 2: 5}})).plan({1: 2, 2: 1})
+
+        self.assertEqual(plan.shipments, {1: {1: 2, 2: 1}})
+        self.assertEqual(plan.stocks, {101: 2, 102: 1})
+        self.assertTrue(plan.complete and plan.optimal)
+
+    def test_fewer_shipments_than_greedy(self):
+        # Жадный выбор взял бы склад 1 (четыре товара) и еще два склада под 5 и 6
+        cells = {1: {1: 1, 2: 1, 3: 1, 4: 1}, 2: {1: 1, 3: 1, 5: 1}, 3: {2: 1, 4: 1, 6: 1}}
+        plan = FulfilmentPlanner(availability(cells)).plan({product_id: 1 for product_id in range(1, 7)})
+
+        self.assertEqual(set(plan.shipments), {2, 3})
+        self.assertTrue(plan.complete and plan.optimal)
+
+    def test_search_budget_keeps_the_greedy_plan(self):
+        cells = {1: {1: 1, 2: 1, 3: 1, 4: 1}, 2: {1: 1, 3: 1, 5: 1}, 3: {2: 1, 4: 1, 6: 1}}
+        plan = FulfilmentPlanner(availability(cells), max_combinations=1).plan(
+            {product_id: 1 for product_id in range(1, 7)}
+        )
+
+        self.assertEqual(len(plan.shipments), 3)
+        self.assertTrue(plan.complete)
+        self.assertFalse(plan.optimal)
+
+    def test_line_split_across_warehouses_and_shortage(self):
+        plan = FulfilmentPlanner(availability({1: {1: 3}, 2: {1: 4}})).plan({1: 6, 2: 1})
+
+        self.assertEqual(plan.shipments, {1: {1: 3}, 2: {1: 3}})
+        self.assertEqual(plan.shortages, {2: 1})
+        self.assertEqual((plan.demanded, plan.planned), (7, 6))
+
+    def test_plans_consume_stock(self):
+        planner = FulfilmentPlanner(availability({1: {1: 2}, 2: {1: 2}}))
+
+        first, second, third = (planner.plan({1: 2}) for _ in range(3))
+
+        self.assertEqual((first.shipments, second.shipments), ({1: {1: 2}}, {2: {1: 2}}))
+        self.assertEqual(third.shortages, {1: 2})
+
+
+class PlanBacklogTests(TestCase):
+
+    def test_oldest_order_first_and_own_reservations_count(self):
+        product = make_product('PLAN-1')
+        stock = Stock.objects.create(warehouse=Warehouse.objects.create(name='Main'), product=product, quantity=3)
+        older = make_order('older@example.com', [(product, 2)], status='paid')
+        newer = make_order('newer@example.com', [(product, 2)], status='confirmed')
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_order(newer)
+
+        with assert_max_queries(4):
+            plans, stats = plan_backlog()
+
+        by_order = {plan.order_id: plan for plan in plans}
+        # Резерв нового заказа принадлежит ему; старому остается одна свободная штука
+        self.assertEqual(by_order[newer.pk].stocks, {stock.pk: 2})
+        self.assertEqual(by_order[older.pk].stocks, {stock.pk: 1})
+        self.assertEqual(by_order[older.pk].shortages, {product.pk: 1})
+        self.assertEqual((stats.orders, stats.complete), (2, 1))
+
+
+class LowStockAlertTests(TestCase):
+
+    def setUp(self):
+        self.warehouse = Warehouse.objects.create(name='Main')
+        self.stock = Stock.objects.create(
+            warehouse=self.warehouse, product=make_product('ALERT-1'), quantity=10, reorder_level=3,
+        )
+        self.raised = []
+        stock_alerts_raised.connect(self.collect, sender=LowStockAlert)
+        self.addCleanup(stock_alerts_raised.disconnect, self.collect, sender=LowStockAlert)
+
+    def collect(self, sender, alerts, **kwargs):
+        self.raised.append([(alert.stock_id, alert.kind, alert.available) for alert in alerts])
+
+    def move(self, quantity, stock=None):
+        post_movements([StockMovement(stock=stock or self.stock, kind=StockMovement.ADJUSTMENT, quantity=quantity)])
+
+    def check(self, raised, resolved):
+        # Итог проверки пишется в лог только когда что-то изменилось
+        if raised or resolved:
+            with self.assertLogs('apps.warehouse.alerts', 'WARNING') as logs:
+                self.assertEqual(check_low_stock(), (raised, resolved))
+            self.assertEqual(logs.output, [f'WARNING:apps.warehouse.alerts:Stock alerts: {raised} raised, {resolved} resolved'])
+        else:
+            with self.assertNoLogs('apps.warehouse.alerts', 'WARNING'):
+                self.assertEqual(check_low_stock(), (0, 0))
+
+    def open_alerts(self):
+        return list(LowStockAlert.objects.filter(resolved_at__isnull=True).values_list('stock_id', 'kind'))
+
+    def test_repeated_checks_alert_once(self):
+        self.move(-8)
+
+        self.check(1, 0)
+        self.check(0, 0)
+        self.move(-1)
+        self.check(0, 0)
+
+        self.assertEqual(self.raised, [[(self.stock.pk, LowStockAlert.LOW, 2)]])
+        self.assertEqual(self.open_alerts(), [(self.stock.pk, LowStockAlert.LOW)])
+
+    def test_running_out_replaces_the_low_alert(self):
+        self.move(-8)
+        self.check(1, 0)
+        self.move(-2)
+
+        self.check(1, 1)
+        self.assertEqual(self.open_alerts(), [(self.stock.pk, LowStockAlert.OUT)])
+
+    def test_recovery_resolves_and_a_new_drop_alerts_again(self):
+        self.move(-8)
+        self.check(1, 0)
+        self.move(5)
+        self.check(0, 1)
+        self.assertEqual(self.open_alerts(), [])
+
+        self.move(-6)
+        self.check(1, 0)
+        self.assertEqual(LowStockAlert.objects.filter(stock=self.stock).count(), 2)
+
+    def test_reserved_stock_counts_and_rows_without_level_are_ignored(self):
+        Stock.objects.create(warehouse=self.warehouse, product=make_product('ALERT-2'), quantity=0)
+        order = make_order('alert@example.com', [(self.stock.product, 8)])
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_order(order)
+
+        self.check(1, 0)
+        self.assertEqual(self.open_alerts(), [(self.stock.pk, LowStockAlert.LOW)])
+
+    @override_settings(STOCK_ALERT_EMAILS=['buyer@example.com'])
+    def test_one_email_per_batch(self):
+        other = Stock.objects.create(
+            warehouse=self.warehouse, product=make_product('ALERT-3'), quantity=1, reorder_level=1,
+        )
+        self.move(-10)
+
+        self.check(2, 0)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Out of stock: ALERT-1 @ Main', mail.outbox[0].body)
+        self.assertIn('Low stock: ALERT-3 @ Main', mail.outbox[0].body)
+        self.check(0, 0)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(other.alerts.count(), 1)
+
+    def test_command_reports_the_run(self):
+        self.move(-8)
+        out = StringIO()
+
+        with self.assertLogs('apps.warehouse.alerts', 'WARNING'):
+            call_command('check_low_stock', stdout=out)
+
+        self.assertEqual(out.getvalue().strip(), 'Raised 1 alerts, resolved 0; 1 open.')
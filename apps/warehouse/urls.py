@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import stock_sync
+
+app_name = 'warehouse'
+
+urlpatterns = [
+    path('stock-sync/', stock_sync, name='stock_sync'),
+]
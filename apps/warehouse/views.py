@@ -1,3 +1,43 @@
-from django.shortcuts import render
+import codecs
+import hmac
 
-# Create your views here.
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .sync import FORMATS, StockSync, read_feed
+
+
+def _authorized(request):
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return False
+    return any(hmac.compare_digest(token.encode(), allowed.encode()) for allowed in settings.STOCK_SYNC_TOKENS)
+
+
+@csrf_exempt
+@require_POST
+def stock_sync(request):
+    """
+    Stock feed from the WMS/ERP: the request body is a CSV or JSON Lines
+    feed (see apps.warehouse.sync), streamed rather than loaded into memory.
+    The format comes from ?format= or the Content-Type
+    (application/x-ndjson, application/jsonl; anything else is CSV).
+    Authenticated with "Authorization: Bearer <token>" (STOCK_SYNC_TOKENS).
+    Responds with the diff summary; ?dry_run=1 changes nothing.
+    """
+    if not _authorized(request):
+        return JsonResponse({'error': 'Invalid or missing token.'}, status=403)
+    feed_format = request.GET.get('format') or ('jsonl' if 'json' in request.content_type else 'csv')
+    if feed_format not in FORMATS:
+        return JsonResponse({'error': f'Unknown format "{feed_format}".'}, status=400)
+
+    sync = StockSync(
+        dry_run=request.GET.get('dry_run') in ('1', 'true'),
+        reference=request.GET.get('reference', '')[:100] or f'Stock sync API {timezone.now():%Y-%m-%d %H:%M}',
+    )
+    lines = codecs.iterdecode(request, 'utf-8-sig')
+    result = sync.run(read_feed(lines, feed_format), first_line=1 if feed_format == 'jsonl' else 2)
+    return JsonResponse(result.as_dict())
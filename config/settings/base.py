@@ -58,6 +58,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.core.middleware.QueryInstrumentationMiddleware',  # Первым: видит и запросы сессии/аутентификации
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',  # <--- ВАЖНО: для перевода
@@ -67,6 +68,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'apps.core.middleware.ReplicaPinningMiddleware',  # Свои записи читаем с основной БД
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -233,4 +235,72 @@ CKEDITOR_5_CONFIGS = {
 
 # === Import-Export Settings ===
 IMPORT_EXPORT_USE_TRANSACTIONS = True
-IMPORT_EXPORT_SKIP_ADMIN_LOG = True  # Ускоряет загрузку больших файлов
\ No newline at end of file
+IMPORT_EXPORT_SKIP_ADMIN_LOG = True  # Ускоряет загрузку больших файлов
+
+
+# === Cache ===
+# CACHE_URL: locmemcache:// (по умолчанию, один процесс), filecache:///path,
+# redis://host:6379/1 или pymemcache://host:11211 — в проде нужен общий для всех воркеров
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+# Сколько живет закэшированная страница витрины для анонимов. Сброс — по тегам
+# (apps.core.cache.invalidate), таймаут лишь ограничивает объем кэша
+PAGE_CACHE_TIMEOUT = env.int('PAGE_CACHE_TIMEOUT', default=60 * 60)
+
+
+# === Images ===
+# Сколько фоновых процессов рендерят только что загруженные картинки (0 — прямо в запросе, после коммита)
+RENDITION_UPLOAD_WORKERS = env.int('RENDITION_UPLOAD_WORKERS', default=1)
+
+
+# === Warehouse ===
+# Сколько секунд живет резерв товара под неоплаченный заказ (0 — бессрочно)
+STOCK_RESERVATION_TTL = env.int('STOCK_RESERVATION_TTL', default=30 * 60)
+# Снимок остатков берет движения не моложе стольких секунд: транзакции, начатые раньше, успевают закоммититься
+STOCK_SNAPSHOT_SETTLE = env.int('STOCK_SNAPSHOT_SETTLE', default=60)
+# Токены WMS/ERP для POST /api/warehouse/stock-sync/ (через запятую); пусто — API закрыт
+STOCK_SYNC_TOKENS = env.list('STOCK_SYNC_TOKENS', default=[])
+# Кому слать письма о низких остатках (check_low_stock); пусто — только сигнал и лог
+STOCK_ALERT_EMAILS = env.list('STOCK_ALERT_EMAILS', default=[])
+
+
+# === Cart ===
+# Где живет корзина до оформления заказа:
+#   apps.orders.cart.DatabaseCart — сразу в Order/OrderItem (каждый клик — запись в БД)
+#   apps.orders.cart.SessionCart  — в сессии (пишется туда, куда указывает SESSION_ENGINE)
+#   apps.orders.cart.CacheCart    — в кэше CART_CACHE_ALIAS (в проде нужен общий кэш, не locmem)
+CART_BACKEND = env('CART_BACKEND', default='apps.orders.cart.DatabaseCart')
+CART_CACHE_ALIAS = 'default'
+CART_CACHE_TIMEOUT = 60 * 60 * 24 * 14
+
+
+# === Database replicas ===
+# Чтение каталога уходит на реплики из DATABASE_REPLICAS (алиасы в DATABASES), остальное — на default.
+# Пусто — все запросы на default.
+DATABASE_ROUTERS = ['apps.core.db.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_APPS = ['catalog']
+# Сколько секунд после записи посетитель читает с основной БД (должно перекрывать отставание реплик)
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=5)
+# Реплика, отстающая больше чем на REPLICA_MAX_LAG секунд, пропускается (только PostgreSQL; None — не проверять)
+REPLICA_MAX_LAG = env.float('REPLICA_MAX_LAG', default=None)
+REPLICA_CHECK_INTERVAL = env.int('REPLICA_CHECK_INTERVAL', default=10)
+
+
+# === Query instrumentation ===
+# Счетчик запросов по вьюхам, поиск N+1 и бюджеты (apps.core.middleware.QueryInstrumentationMiddleware)
+QUERY_INSTRUMENTATION = env.bool('QUERY_INSTRUMENTATION', default=False)
+# Столько одинаковых запросов (с точностью до параметров) за запрос — это уже N+1
+QUERY_N_PLUS_ONE_THRESHOLD = 5
+# Сколько запросов к БД допустимо на один HTTP-запрос; отдельные вьюхи — в QUERY_BUDGETS
+QUERY_BUDGET_DEFAULT = 30
+QUERY_BUDGETS = {
+    # Витрина: страница, счетчик и переводы — из кэша, на холодном кэше по запросу на каждое
+    'catalog:product_list': 8,
+    'catalog:category_detail': 10,
+    'catalog:product_search': 8,
+    'orders:add_to_cart': 10,
+    # Несколько запросов на каждые 5000 строк фида
+    'warehouse:stock_sync': 1000,
+}
@@ -17,6 +17,19 @@ DATABASES = {
     }
 }
 
+# Проверка маршрутизации на реплику локально: копия базы, например cp db.sqlite3 db-replica.sqlite3,
+# и DB_REPLICA_PATH=db-replica.sqlite3 в .env
+if env('DB_REPLICA_PATH', default=None):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / env('DB_REPLICA_PATH'),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = ['replica']
+
+# Локально всегда считаем запросы и ругаемся на N+1
+QUERY_INSTRUMENTATION = env.bool('QUERY_INSTRUMENTATION', default=True)
+
 # Вывод email в консоль (вместо отправки)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
@@ -15,9 +15,45 @@ DATABASES = {
         'PASSWORD': env('DB_PASSWORD'),
         'HOST': env('DB_HOST', default='localhost'),
         'PORT': env('DB_PORT', default='5432'),
+        # Постоянные соединения: не платим за TCP и аутентификацию в каждом запросе
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', default=60),
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', default=True),
     }
 }
 
+# === Пул соединений ===
+# DB_POOL=True: пул внутри процесса (apps/core/db/backends/postgresql_pool).
+# Соединение возвращается в пул после каждого запроса, поэтому CONN_MAX_AGE не нужен.
+if env.bool('DB_POOL', default=False):
+    DATABASES['default'].update({
+        'ENGINE': 'apps.core.db.backends.postgresql_pool',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAX_SIZE': env.int('DB_POOL_MAX_SIZE', default=10),
+            'TIMEOUT': env.float('DB_POOL_TIMEOUT', default=10.0),
+            'MAX_IDLE': env.float('DB_POOL_MAX_IDLE', default=300.0),
+            'CHECK_AFTER': env.float('DB_POOL_CHECK_AFTER', default=30.0),
+        },
+    })
+
+# === Реплики ===
+# DB_REPLICA_HOSTS=replica1,replica2: те же имя БД и пользователь, другой хост
+DATABASE_REPLICAS = []
+for number, host in enumerate(env.list('DB_REPLICA_HOSTS', default=[]), start=1):
+    DATABASES[f'replica{number}'] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+# DB_PGBOUNCER=True: за pgbouncer в режиме transaction серверные курсоры не живут между транзакциями.
+# Экспорт (.iterator()) тогда читает выборку целиком, а не порциями.
+if env.bool('DB_PGBOUNCER', default=False):
+    for database in DATABASES.values():
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Общий кэш для всех воркеров (страницы витрины, корзины, версии тегов). Пример: CACHE_URL=redis://redis:6379/1
+CACHES = {
+    'default': env.cache('CACHE_URL'),
+}
+
 # Безопасность (HTTPS)
 SECURE_SSL_REDIRECT = True
 SESSION_COOKIE_SECURE = True
@@ -31,5 +67,6 @@ SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 SECURE_HSTS_PRELOAD = True
 
 # Статика на продакшене (WhiteNoise)
-MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
+# Сразу после SecurityMiddleware: статика тоже получает HSTS и nosniff
+MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1, 'whitenoise.middleware.WhiteNoiseMiddleware')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
\ No newline at end of file
@@ -8,6 +8,7 @@ from django.conf.urls.i18n import i18n_patterns # Импортируем для
 urlpatterns = [
     path('i18n/', include('django.conf.urls.i18n')), # Переключатель языков
     path("ckeditor5/", include('django_ckeditor_5.urls')), # Редактор
+    path('api/warehouse/', include('apps.warehouse.urls')), # Синхронизация остатков из WMS
 ]
 
 # 2. Основные разделы сайта, которые будут иметь префикс /en/, /es/ или /ru/